@@ -0,0 +1,20 @@
+# gunicorn -c gunicorn.conf.py yatube.wsgi
+import gc
+import multiprocessing
+
+bind = "0.0.0.0:8000"
+workers = multiprocessing.cpu_count() * 2 + 1
+# Приложение загружается один раз в мастер-процессе, а воркеры
+# получают его через fork и делят память с мастером (copy-on-write).
+preload_app = True
+
+
+def when_ready(server):
+    """Прогрев до запуска воркеров (yatube.warmup) и gc.freeze(): сборщик
+    мусора в воркерах не трогает объекты мастера и не копирует их
+    страницы памяти.
+    """
+    from yatube.warmup import warm
+
+    server.log.info("Прогреты шаблоны: %d", len(warm()))
+    gc.freeze()
@@ -1,13 +1,115 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import ValidationError
+from django.shortcuts import reverse
 
-from .models import Comment, Follow, Group, Post
+from . import groups, jobs, search
+from .models import Comment, Follow, Group, Post, User
+from .paginators import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ("pk", "text", "pub_date", "author", "group", "image")
+def start_job(modeladmin, request, batch, *args, description):
+    """Запускает пакетную задачу вместо синхронной обработки в запросе."""
+    job = batch.start(*args, description=description)
+    url = reverse("admin:tasks_job_change", args=[job.pk])
+    modeladmin.message_user(
+        request, f"Задача «{description}» поставлена в очередь: {url}",
+        messages.SUCCESS)
+
+
+class BackgroundDeleteMixin:
+    def get_actions(self, request):
+        """Синхронное удаление каскадом блокирует большую таблицу
+        надолго, поэтому вместо него — пакетные задачи.
+        """
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(Group.objects.all(), required=False,
+                                   label="Группа")
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Общие настройки списков для таблиц на миллионы строк: оценка
+    числа строк вместо COUNT(*) и полнотекстовый поиск по индексу.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.search(queryset, search_term), False
+
+
+class PostAdmin(BackgroundDeleteMixin, LargeTableAdmin):
+    list_display = ("pk", "text", "pub_date", "author", "group", "image",
+                    "is_deleted")
+    list_select_related = ("author", "group")
     search_fields = ("text",)
-    list_filter = ("pub_date",)
+    list_filter = ("is_deleted",)
+    date_hierarchy = "pub_date"
+    autocomplete_fields = ("author", "group")
     empty_value_display = "-пусто-"
+    action_form = PostActionForm
+    actions = ("delete_in_background", "move_to_group", "purge_comments")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {"group", "author"}.isdisjoint(form.changed_data):
+            return
+        if change:
+            groups.remove_posts([(form.initial["group"],
+                                  form.initial["author"], obj.pub_date)])
+        groups.add_posts(groups.rows_of([obj]))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        groups.remove_posts(groups.rows_of([obj]))
+
+    def get_queryset(self, request):
+        """В админке видны и удалённые (is_deleted) посты."""
+        queryset = Post.all_objects.all()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def delete_in_background(self, request, queryset):
+        """Посты сразу скрываются флагом is_deleted, а строки вместе
+        с комментариями и картинками удаляются в фоне.
+        """
+        ids = list(queryset.values_list("pk", flat=True))
+        Post.all_objects.filter(pk__in=ids).update(is_deleted=True)
+        start_job(self, request, jobs.delete_posts, ids,
+                  description=f"Удаление постов: {len(ids)}")
+    delete_in_background.short_description = "Удалить выбранные посты в фоне"
+
+    def move_to_group(self, request, queryset):
+        try:
+            group = PostActionForm.base_fields["group"].clean(
+                request.POST.get("group"))
+        except ValidationError:
+            self.message_user(request, "Группа не найдена", messages.ERROR)
+            return
+        ids = list(queryset.values_list("pk", flat=True))
+        start_job(self, request, jobs.move_to_group, ids,
+                  group.pk if group else None,
+                  description=f"Перенос постов в «{group or '-пусто-'}»: "
+                              f"{len(ids)}")
+    move_to_group.short_description = "Перенести в выбранную группу"
+
+    def purge_comments(self, request, queryset):
+        ids = list(queryset.values_list("pk", flat=True))
+        start_job(self, request, jobs.purge_comments, ids,
+                  description=f"Удаление комментариев к постам: {len(ids)}")
+    purge_comments.short_description = "Удалить комментарии к постам"
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -16,18 +118,40 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ("pk", "post", "author", "text", "created")
+class CommentAdmin(LargeTableAdmin):
+    list_display = ("pk", "post_id", "author", "text", "created")
+    list_select_related = ("author",)
     search_fields = ("text",)
+    date_hierarchy = "created"
+    raw_id_fields = ("post",)
+    autocomplete_fields = ("author",)
     empty_value_display = "-пусто-"
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ("pk", "user", "author")
-    search_fields = ("user",)
+    list_select_related = ("user", "author")
+    search_fields = ("=user__username", "=author__username")
+    autocomplete_fields = ("user", "author")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = "-пусто-"
 
 
+class AuthorAdmin(BackgroundDeleteMixin, UserAdmin):
+    actions = ("delete_in_background",)
+
+    def delete_in_background(self, request, queryset):
+        ids = list(queryset.values_list("pk", flat=True))
+        start_job(self, request, jobs.delete_authors, ids,
+                  description="Удаление пользователей: " + ", ".join(
+                      queryset.values_list("username", flat=True)[:5]))
+    delete_in_background.short_description = (
+        "Удалить выбранных пользователей со всеми постами в фоне")
+
+
+admin.site.unregister(User)
+admin.site.register(User, AuthorAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
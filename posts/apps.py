@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def install_search(using, **kwargs):
+    from .search import install
+    install(connections[using])
 
 
 class PostsConfig(AppConfig):
     name = "posts"
+
+    def ready(self):
+        post_migrate.connect(install_search, sender=self)
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import partitions
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+
+def cutoff(days=None):
+    """Посты, опубликованные раньше этого момента, уходят в архив."""
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_chunk(before, limit):
+    """Переносит до limit самых старых постов, опубликованных раньше
+    before, вместе с комментариями в архивные таблицы.
+
+    Посты переносятся от старых к новым, поэтому всё в архиве старше
+    всего в горячей таблице и ленты можно листать сначала по одной,
+    затем по другой. Удалённые (is_deleted) посты не архивируются —
+    их вычищает задача удаления.
+    """
+    posts = list(Post.objects.filter(pub_date__lt=before).order_by(
+        "pub_date")[:limit])
+    if not posts:
+        return 0
+    pks = [post.pk for post in posts]
+    with transaction.atomic():
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(id=post.pk, text=post.text, pub_date=post.pub_date,
+                         author_id=post.author_id, group_id=post.group_id,
+                         image=post.image.name)
+            for post in posts])
+        comments = Comment.objects.filter(post_id__in=pks)
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(id=comment.pk, post_id=comment.post_id,
+                            author_id=comment.author_id, text=comment.text,
+                            created=comment.created)
+            for comment in comments.iterator()])
+        comments.delete()
+        Post.all_objects.filter(pk__in=pks).delete()
+    return len(posts)
+
+
+def archive(before, limit=None):
+    """Переносит в архив все посты старше before, по пачке в транзакции."""
+    moved = 0
+    while True:
+        chunk = archive_chunk(before, limit or settings.TASKS_CHUNK_SIZE)
+        if not chunk:
+            if moved:
+                partitions.refresh()
+            return moved
+        moved += chunk
@@ -0,0 +1,586 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.contrib.auth import login
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import DatabaseError, connection, connections
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from yatube import startup
+from yatube.profiling import sampler
+
+from . import events, partitions, trending
+from .models import Comment, Follow, Group, Post, PostScore, User
+
+scenarios = {}
+
+
+def scenario(name):
+    """Регистрирует сценарий для manage.py benchmark.
+
+    Сценарий получает словарь опций команды и возвращает список строк
+    результата (словарей); команда выводит их таблицей.
+    """
+    def decorator(func):
+        scenarios[name] = func
+        return func
+    return decorator
+
+
+def measure(func, repeat):
+    """Медиана времени вызова func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def seed_users(count, prefix="bench"):
+    start = User.objects.filter(username__startswith=prefix).count()
+    User.objects.bulk_create(
+        [User(username=f"{prefix}{start + i}") for i in range(count)])
+    return list(User.objects.filter(username__startswith=prefix))
+
+
+def seed_posts(count, authors, groups=(), batch_size=5000):
+    """Досоздаёт посты до count штук, распределяя их по авторам."""
+    existing = Post.objects.count()
+    for start in range(existing, count, batch_size):
+        Post.objects.bulk_create(
+            [Post(text=f"Пост {i}", author=authors[i % len(authors)],
+                  group=groups[i % len(groups)] if groups else None)
+             for i in range(start, min(start + batch_size, count))])
+
+
+def get(path, client=None):
+    client = client or Client()
+
+    def request():
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+    return request
+
+
+@scenario("trending")
+def trending_reads(options):
+    """Первая страница /trending/ против / при росте числа постов"""
+    authors = seed_users(50)
+    rows = []
+    for size in sorted(options["rows"]):
+        seed_posts(size, authors)
+        unscored = Post.objects.filter(score__isnull=True).values_list(
+            "pk", flat=True)
+        PostScore.objects.bulk_create(
+            [PostScore(post_id=pk, score=random.random())
+             for pk in unscored.iterator()])
+        rows.append({
+            "posts": size,
+            "trending.top() ms": measure(trending.top, options["repeat"]),
+            "/trending/ ms": measure(get("/trending/"), options["repeat"]),
+            "/ ms": measure(get("/"), options["repeat"]),
+        })
+    return rows
+
+
+@scenario("auth")
+def auth_cost(options):
+    """Запросы и время / для анонима и для вошедшего пользователя"""
+    authors = seed_users(10)
+    seed_posts(min(options["rows"]), authors)
+    modes = {
+        "db": {"SESSION_ENGINE": "django.contrib.sessions.backends.db",
+               "AUTHENTICATION_BACKENDS": [
+                   "django.contrib.auth.backends.ModelBackend"]},
+        "cached": {},
+    }
+    rows = []
+    for mode, overrides in modes.items():
+        with override_settings(**overrides):
+            for kind in ("anonymous", "authenticated"):
+                client = Client()
+                if kind == "authenticated":
+                    client.force_login(authors[0])
+                request = get("/", client)
+                request()
+                with CaptureQueriesContext(connection) as queries:
+                    request()
+                rows.append({"mode": mode, "user": kind,
+                             "queries": len(queries),
+                             "ms": measure(request, options["repeat"])})
+    return rows
+
+
+@scenario("hashing")
+def password_hashing(options):
+    """Проверок пароля в секунду на ядро: в потоке запроса и в пуле"""
+    cores = os.cpu_count() or 1
+    logins = max(options["repeat"], cores * 4)
+    rows = []
+    for algorithm in ("pbkdf2_sha256", "scrypt"):
+        hasher = get_hasher(algorithm)
+        for workers in (0, cores):
+            with override_settings(PASSWORD_HASHING_WORKERS=workers):
+                encoded = hasher.encode("password", "saltsalt")
+                started = time.perf_counter()
+                with ThreadPoolExecutor(cores) as threads:
+                    list(threads.map(
+                        lambda _: hasher.verify("password", encoded),
+                        range(logins)))
+                elapsed = time.perf_counter() - started
+            rows.append({"hasher": hasher.algorithm,
+                         "pool workers": workers,
+                         "logins/s": round(logins / elapsed, 1),
+                         "logins/s/core": round(logins / elapsed / cores, 1)})
+    return rows
+
+
+@scenario("context_processors")
+def context_processors(options):
+    """Стоимость каждого контекстного процессора и его значений"""
+    user = seed_users(1)[0]
+    factory = RequestFactory()
+    rows = []
+    for kind in ("anonymous", "authenticated"):
+        request = factory.get("/")
+        SessionMiddleware().process_request(request)
+        MessageMiddleware().process_request(request)
+        if kind == "authenticated":
+            login(request, user, settings.AUTHENTICATION_BACKENDS[0])
+        AuthenticationMiddleware().process_request(request)
+        for path in settings.TEMPLATES[0]["OPTIONS"]["context_processors"]:
+            processor = import_string(path)
+            thousand_calls_ms = measure(
+                lambda: [processor(request) for _ in range(1000)],
+                options["repeat"])
+            with CaptureQueriesContext(connection) as queries:
+                values = processor(request)
+                for value in values.values():
+                    str(value)
+            rows.append({"user": kind, "processor": path.rsplit(".", 1)[1],
+                         "call us": thousand_calls_ms,
+                         "queries when used": len(queries)})
+    return rows
+
+
+@scenario("admin")
+def admin_changelists(options):
+    """Списки постов и комментариев в админке: время и число запросов"""
+    authors = seed_users(50)
+    admin = User.objects.create_superuser(
+        username="bench_admin", email="admin@example.com", password=None)
+    client = Client()
+    client.force_login(admin)
+    pages = {
+        "posts": "/admin/posts/post/",
+        "posts search": "/admin/posts/post/?q=пост",
+        "posts by year": "/admin/posts/post/?pub_date__year=%d"
+                         % timezone.now().year,
+        "comments": "/admin/posts/comment/",
+    }
+    rows = []
+    for size in sorted(options["rows"]):
+        seed_posts(size, authors)
+        Comment.objects.bulk_create(
+            [Comment(post_id=pk, author=authors[pk % len(authors)],
+                     text=f"Комментарий {pk}")
+             for pk in Post.objects.filter(comments_post__isnull=True)
+             .values_list("pk", flat=True).iterator()])
+        for name, path in pages.items():
+            request = get(path, client)
+            with CaptureQueriesContext(connection) as queries:
+                request()
+            rows.append({"rows": size, "page": name,
+                         "queries": len(queries),
+                         "ms": measure(request, options["repeat"])})
+    return rows
+
+
+def spread_pub_dates(months):
+    """Раскладывает посты равномерно по последним months месяцам
+    (одним UPDATE: bulk_create ставит всем постам текущее время).
+    """
+    last = Post.all_objects.order_by("-pk").values_list("pk", flat=True)[0]
+    step = months * 30 * 24 * 60 * 60 / last
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE posts_post SET pub_date = strftime("
+            "'%%Y-%%m-%%d %%H:%%M:%%f', 'now', "
+            "'-' || CAST((%s - id) * %s AS INTEGER) || ' seconds')",
+            [last, step])
+        cursor.execute("UPDATE posts_post SET month = "
+                       "CAST(strftime('%%Y%%m', pub_date) AS INTEGER)", [])
+
+
+def index_page(number):
+    """Страница ленты / без рендеринга шаблона."""
+    post_list = Post.objects.order_by("-pub_date")
+    if settings.POST_PARTITIONS:
+        post_list = partitions.PartitionedSequence(post_list,
+                                                   partitions.catalog())
+    return Paginator(post_list, 10).page(number)
+
+
+@scenario("partitions")
+def partitioned_index(options):
+    """Первая и глубокая страница / : одна таблица против партиций по
+    месяцам (запустить с --rows 10000000 для сравнения на 10M строк)
+    """
+    authors = seed_users(50)
+    rows = []
+    for size in sorted(options["rows"]):
+        seed_posts(size, authors)
+        spread_pub_dates(36)
+        partitions.refresh()
+        deep = size // 10 // 2
+        for mode in (False, True):
+            with override_settings(POST_PARTITIONS=mode, CACHE_TIME=0):
+                for page in (1, deep):
+                    request = get(f"/?page={page}")
+                    rows.append({
+                        "posts": size,
+                        "storage": "partitions" if mode else "monolithic",
+                        "page": page,
+                        "query layer ms": measure(
+                            lambda: list(index_page(page)),
+                            options["repeat"]),
+                        "/ ms": measure(request, options["repeat"])})
+    return rows
+
+
+@scenario("sse")
+def sse_connections(options):
+    """Память на одно простаивающее SSE-соединение и время рассылки
+    одного события всем (в процессе, без сетевого сервера)
+    """
+    post = Post(pk=1, author_id=1)
+
+    async def run(count):
+        delivered = asyncio.Event()
+        received = []
+        closed = asyncio.Event()
+
+        async def receive():
+            await closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message.get("body", b"").startswith(b"event:"):
+                received.append(message)
+                if len(received) == count:
+                    delivered.set()
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        streams = [asyncio.ensure_future(events.stream(
+            {"type": "http", "query_string": b"feed=index"}, receive, send))
+            for _ in range(count)]
+        while len(events.bus) < count:
+            await asyncio.sleep(0.01)
+        per_connection = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.stop()
+        started = time.perf_counter()
+        events.post_created(post)
+        await delivered.wait()
+        fanout = (time.perf_counter() - started) * 1000
+        closed.set()
+        await asyncio.gather(*streams)
+        return per_connection, fanout
+
+    rows = []
+    for count in sorted(options["rows"]):
+        per_connection, fanout = asyncio.run(run(count))
+        rows.append({"connections": count,
+                     "KiB/connection": round(per_connection / 1024, 2),
+                     "fan-out ms": round(fanout, 3)})
+    return rows
+
+
+def flood(path, clients, stop):
+    """Шлёт POST-запросы на path из потока на каждого клиента, пока не
+    выставлен stop; возвращает счётчик ответов по кодам.
+    """
+    codes = {}
+    lock = threading.Lock()
+
+    def worker(client, number):
+        while not stop.is_set():
+            try:
+                code = client.post(path,
+                                   {"text": f"Спам {number}"}).status_code
+            except DatabaseError:
+                code = "locked"
+            with lock:
+                codes[code] = codes.get(code, 0) + 1
+        connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(client, number))
+               for number, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    return codes, threads
+
+
+@scenario("ratelimit")
+def write_flood(options):
+    """Задержка чтения / во время потока POST /new/ от спамеров:
+    без лимитов и с RATE_LIMITS
+    """
+    authors = seed_users(max(4, os.cpu_count() or 1), prefix="spam")
+    seed_posts(min(options["rows"]), authors)
+    clients = []
+    for author in authors:
+        client = Client()
+        client.force_login(author)
+        clients.append(client)
+    reader_client = Client()
+    read_errors = []
+
+    def reader():
+        try:
+            reader_client.get("/")
+        except DatabaseError:
+            read_errors.append(1)
+
+    rows = []
+    for mode, limits in (("off", {}), ("on", settings.RATE_LIMITS)):
+        with override_settings(RATE_LIMITS=limits, CACHE_TIME=0):
+            cache.clear()
+            idle = measure(reader, options["repeat"])
+            read_errors.clear()
+            stop = threading.Event()
+            codes, threads = flood("/new/", clients, stop)
+            try:
+                loaded = measure(reader, options["repeat"])
+            finally:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+            rows.append({"limits": mode, "writers": len(clients),
+                         "idle / ms": idle, "flooded / ms": loaded,
+                         "read errors": len(read_errors),
+                         "accepted": codes.get(302, 0),
+                         "rejected": codes.get(429, 0),
+                         "locked": codes.get("locked", 0)})
+    return rows
+
+
+@scenario("profiling")
+def profiling_overhead(options):
+    """Стоимость профилирования: / и страница поста без сэмплера, с
+    сэмплером при разных интервалах и под cProfile (?__profile=1);
+    режимы чередуются запрос за запросом, чтобы дрейф машины не
+    попадал в разницу между ними
+    """
+    authors = seed_users(10)
+    seed_posts(min(options["rows"]), authors)
+    staff = User.objects.create_user(username="bench_staff", is_staff=True)
+    client = Client()
+    client.force_login(staff)
+    post = Post.objects.order_by("-pk").first()
+    pages = {"/": "/", "post": f"/{post.author.username}/{post.pk}/"}
+    modes = {"off": ("", {"PROFILER_SAMPLING": False}),
+             "sampler 10ms": ("", {"PROFILER_SAMPLING": True,
+                                   "PROFILER_INTERVAL": 0.01}),
+             "sampler 1ms": ("", {"PROFILER_SAMPLING": True,
+                                  "PROFILER_INTERVAL": 0.001}),
+             "cProfile": ("?__profile=1", {"PROFILER_SAMPLING": False})}
+    rows = []
+    for name, path in pages.items():
+        timings = {mode: [] for mode in modes}
+        samples = dict.fromkeys(modes, 0)
+        for _ in range(options["repeat"]):
+            for mode, (query, overrides) in modes.items():
+                with override_settings(CACHE_TIME=0, **overrides):
+                    before = sampler.samples
+                    timings[mode].append(measure(get(path + query, client),
+                                                 1))
+                    if overrides["PROFILER_SAMPLING"]:
+                        samples[mode] += sampler.samples - before
+        baseline = statistics.median(timings["off"])
+        for mode, values in timings.items():
+            ms = statistics.median(values)
+            rows.append({"page": name, "mode": mode, "ms": round(ms, 3),
+                         "overhead %": round((ms / baseline - 1) * 100, 1),
+                         "samples": samples[mode]})
+    return rows
+
+
+def startup_probe(database, options=(), interpreter=()):
+    """Запускает python -m yatube.startup в новом процессе."""
+    output = subprocess.run(
+        [sys.executable, *interpreter, "-m", "yatube.startup",
+         "--database", database, *options],
+        cwd=settings.BASE_DIR, check=True, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, universal_newlines=True)
+    return output
+
+
+@scenario("startup")
+def startup_time(options):
+    """Холодный старт воркера: этапы до первого ответа / без прогрева и
+    с прогревом до fork, и самые дорогие импорты по -X importtime
+    """
+    authors = seed_users(10)
+    seed_posts(min(options["rows"]), authors)
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "startup.sqlite3")
+        target = sqlite3.connect(database)
+        connection.ensure_connection()
+        connection.connection.backup(target)
+        target.close()
+        for mode, args in (("cold", ()), ("preloaded", ("--warm",))):
+            runs = [json.loads(startup_probe(database, args).stdout)
+                    for _ in range(min(options["repeat"], 10))]
+            for phase in runs[0]["timings"]:
+                rows.append({"run": mode, "phase": phase, "ms": round(
+                    statistics.median(run["timings"][phase]
+                                      for run in runs), 1)})
+            rows.append({"run": mode, "phase": "deferred modules loaded",
+                         "ms": ", ".join(runs[0]["loaded"]) or "-"})
+        stderr = startup_probe(database,
+                               interpreter=("-X", "importtime")).stderr
+        costs = startup.import_costs(stderr)
+        for package, ms in sorted(costs.items(),
+                                  key=lambda item: -item[1])[:10]:
+            rows.append({"run": "imports", "phase": package,
+                         "ms": round(ms, 1)})
+        rows.append({"run": "imports", "phase": "project (budget {} ms)"
+                     .format(startup.IMPORT_BUDGET_MS),
+                     "ms": round(startup.project_cost(costs), 1)})
+    return rows
+
+
+def peak_memory(request):
+    """Пик выделенной памяти (tracemalloc) за один вызов, в КиБ."""
+    tracemalloc.start()
+    try:
+        request()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+@scenario("memory")
+def memory_per_request(options):
+    """Пик памяти на запрос для страниц со списками (длинные тексты
+    постов, пост с большим числом комментариев)
+    """
+    authors = seed_users(10, prefix="memory")
+    group = Group.objects.create(title="Память", slug="memory",
+                                 description="Сценарий memory")
+    text = "Длинный пост. " * 500
+    Post.objects.bulk_create(
+        [Post(text=text, author=authors[i % len(authors)], group=group)
+         for i in range(min(options["rows"]))])
+    post = Post.objects.order_by("-pk").first()
+    Comment.objects.bulk_create(
+        [Comment(post=post, author=authors[i % len(authors)],
+                 text="Комментарий " * 50)
+         for i in range(max(options["rows"]))])
+    Follow.objects.bulk_create([Follow(user=authors[0], author=author)
+                                for author in authors[1:]])
+    PostScore.objects.bulk_create(
+        [PostScore(post_id=pk, score=random.random())
+         for pk in Post.objects.values_list("pk", flat=True)])
+    client = Client()
+    client.force_login(authors[0])
+    pages = {
+        "index": "/",
+        "trending": "/trending/",
+        "group": f"/group/{group.slug}/",
+        "profile": f"/{authors[1].username}/",
+        "follow": "/follow/",
+        "post": f"/{post.author.username}/{post.pk}/",
+    }
+    rows = []
+    with override_settings(CACHE_TIME=0):
+        for name, path in pages.items():
+            request = get(path, client)
+            request()
+            with CaptureQueriesContext(connection) as queries:
+                request()
+            rows.append({"page": name, "queries": len(queries),
+                         "peak KiB": peak_memory(request),
+                         "ms": measure(request, options["repeat"])})
+    return rows
+
+
+def first_byte(client, path):
+    """Время до первого куска ответа и до конца ответа, в мс."""
+    started = time.perf_counter()
+    response = client.get(path)
+    assert response.status_code == 200, (path, response.status_code)
+    chunks = (iter(response.streaming_content) if response.streaming
+              else iter([response.content]))
+    next(chunks)
+    ttfb = time.perf_counter() - started
+    for _ in chunks:
+        pass
+    return ttfb * 1000, (time.perf_counter() - started) * 1000
+
+
+@scenario("ttfb")
+def time_to_first_byte(options):
+    """Время до первого байта, полное время и пик памяти для поста с
+    большим числом комментариев и ленты группы: render против
+    потоковой отдачи (STREAMING_PAGES)
+    """
+    authors = seed_users(10, prefix="ttfb")
+    group = Group.objects.create(title="Поток", slug="ttfb",
+                                 description="Сценарий ttfb")
+    post = Post.objects.create(text="Пост", author=authors[0], group=group)
+    Post.objects.bulk_create([Post(text="Пост группы " * 50,
+                                   author=authors[i % len(authors)],
+                                   group=group) for i in range(100)])
+    client = Client()
+    rows = []
+    existing = 0
+    for size in sorted(options["rows"]):
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=authors[i % len(authors)],
+                     text=f"Комментарий {i}")
+             for i in range(existing, size)])
+        existing = size
+        pages = {
+            f"post, {size} comments": f"/{authors[0].username}/{post.pk}/",
+            "group": f"/group/{group.slug}/",
+        }
+        for name, path in pages.items():
+            for streaming in (False, True):
+                with override_settings(STREAMING_PAGES=streaming):
+                    first_byte(client, path)
+                    timings = [first_byte(client, path)
+                               for _ in range(options["repeat"])]
+                    peak = peak_memory(lambda: first_byte(client, path))
+                rows.append({
+                    "page": name,
+                    "mode": "streaming" if streaming else "render",
+                    "ttfb ms": round(statistics.median(
+                        ttfb for ttfb, _ in timings), 3),
+                    "total ms": round(statistics.median(
+                        total for _, total in timings), 3),
+                    "peak KiB": peak})
+    return rows
@@ -0,0 +1,173 @@
+import json
+import threading
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import get_user
+
+from . import graph, groups
+
+
+class Subscriber:
+    def __init__(self, loop, channels):
+        # Публикация из обычных view без подписчиков обходится без asyncio,
+        # поэтому он импортируется только здесь, а не при старте процесса.
+        import asyncio
+
+        self.loop = loop
+        self.channels = channels
+        self.queue = asyncio.Queue(settings.SSE_QUEUE_SIZE)
+
+    def deliver(self, event):
+        """Вызывается в цикле событий подписчика; медленному клиенту
+        лишние события не доставляются, а не копятся в памяти.
+        """
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+
+class EventBus:
+    """Шина событий внутри процесса: синхронный код Django публикует
+    события из своих потоков, а SSE-соединения получают их в цикле
+    asyncio через call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channels):
+        import asyncio
+
+        subscriber = Subscriber(asyncio.get_event_loop(), channels)
+        with self._lock:
+            for channel in channels:
+                self._channels[channel].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            for channel in subscriber.channels:
+                self._channels[channel].discard(subscriber)
+                if not self._channels[channel]:
+                    del self._channels[channel]
+
+    def publish(self, channels, event):
+        with self._lock:
+            subscribers = set().union(*(self._channels.get(channel, ())
+                                        for channel in channels))
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+        return len(subscribers)
+
+    def __len__(self):
+        with self._lock:
+            return len(set().union(*self._channels.values()))
+
+
+bus = EventBus()
+
+
+def post_created(post):
+    channels = ["posts", f"author:{post.author_id}"]
+    if post.group_id:
+        channels.append(f"group:{post.group_id}")
+    bus.publish(channels, ("post", {"post": post.pk,
+                                    "author": post.author_id,
+                                    "group": post.group_id}))
+
+
+def comment_added(post_id):
+    bus.publish([f"post:{post_id}"], ("comment", {"post": post_id}))
+
+
+def _user(headers):
+    cookie = SimpleCookie(headers.get(b"cookie", b"").decode("latin-1"))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(morsel.value if morsel else None)
+    return get_user(SimpleNamespace(session=session))
+
+
+def channels_for(query, headers):
+    """Каналы подписки по параметрам /events/:
+    feed=index — все новые посты, feed=follow — посты авторов из
+    подписок, group=<slug> — посты группы, post=<id> — комментарии.
+    Возвращает None, если подписка требует входа.
+    """
+    channels = set()
+    for feed in query.get("feed", []):
+        if feed == "index":
+            channels.add("posts")
+        elif feed == "follow":
+            user = _user(headers)
+            if not user.is_authenticated:
+                return None
+            channels.update(f"author:{author_id}" for author_id
+                            in graph.following_ids(user.pk))
+    for slug in query.get("group", []):
+        group = groups.get_by_slug(slug)
+        if group:
+            channels.add(f"group:{group.pk}")
+    channels.update(f"post:{post_id}" for post_id in query.get("post", [])
+                    if post_id.isdigit())
+    return channels
+
+
+def _message(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def stream(scope, receive, send):
+    """ASGI-обработчик /events/: поток Server-Sent Events.
+
+    Соединение почти ничего не стоит, пока событий нет: это корутина и
+    очередь, без потока и без обращений к базе; раз в SSE_HEARTBEAT
+    секунд отправляется комментарий, чтобы прокси не закрывали его.
+    """
+    import asyncio
+
+    loop = asyncio.get_event_loop()
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    headers = dict(scope.get("headers", []))
+    channels = await loop.run_in_executor(None, channels_for, query, headers)
+    if channels is None:
+        await send({"type": "http.response.start", "status": 403,
+                    "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"Forbidden"})
+        return
+    subscriber = bus.subscribe(channels)
+    disconnect = asyncio.ensure_future(receive())
+    try:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"),
+                                (b"cache-control", b"no-cache"),
+                                (b"x-accel-buffering", b"no")]})
+        await send({"type": "http.response.body", "more_body": True,
+                    "body": f"retry: {settings.SSE_RETRY}\n\n".encode()})
+        while True:
+            event = asyncio.ensure_future(subscriber.queue.get())
+            done, _ = await asyncio.wait(
+                {event, disconnect}, timeout=settings.SSE_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                if disconnect.result()["type"] == "http.disconnect":
+                    event.cancel()
+                    return
+                disconnect = asyncio.ensure_future(receive())
+            if event in done:
+                body = _message(*event.result())
+            else:
+                event.cancel()
+                if done:
+                    continue
+                body = b": ping\n\n"
+            await send({"type": "http.response.body", "body": body,
+                        "more_body": True})
+    finally:
+        bus.unsubscribe(subscriber)
+        disconnect.cancel()
@@ -0,0 +1,121 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.cache import patch_cache_control
+
+from . import notifications, writebehind
+from .forms import CommentForm
+from .models import Post, User
+
+
+def _nav(request, params):
+    return {"unread_notifications": notifications.unread_count(request.user)}
+
+
+def _pending_posts(request, params):
+    return {"pending_posts": writebehind.pending_posts(request.user)}
+
+
+def _pending_comments(request, params):
+    return {"pending_comments": writebehind.pending_comments(
+        Post(pk=params["post"]), request.user)}
+
+
+def _comment_form(request, params):
+    return {"form": CommentForm()}
+
+
+def _no_params(query):
+    return {}
+
+
+def _menu_params(query):
+    if query["active"] not in MENU_ITEMS:
+        raise ValueError(query["active"])
+    return {"active": query["active"]}
+
+
+def _post_id(value):
+    post_id = int(value)
+    if post_id < 1:
+        raise ValueError(value)
+    return post_id
+
+
+def _username(value):
+    try:
+        User.username_validator(value)
+    except ValidationError:
+        raise ValueError(value) from None
+    if len(value) > User._meta.get_field("username").max_length:
+        raise ValueError(value)
+    return value
+
+
+def _post_params(query):
+    """Автор и пост карточки проверяются только по формату, без чтения
+    из базы: фрагмент запрашивается для каждой карточки ленты, а права
+    на правку всё равно проверяет post_edit.
+    """
+    return {"author": _username(query["author"]),
+            "post": _post_id(query["post"])}
+
+
+def _post_id_params(query):
+    return {"post": _post_id(query["post"])}
+
+
+MENU_ITEMS = ("index", "trending", "follow")
+
+# Персональные фрагменты страниц: имя -> (разбор параметров запроса
+# /fragments/<имя>/, дополнительный контекст). Шаблон фрагмента —
+# templates/fragments/<имя>.html.
+FRAGMENTS = {
+    "nav": (_no_params, _nav),
+    "menu": (_menu_params, None),
+    "post_actions": (_post_params, None),
+    "comment_form": (_post_params, _comment_form),
+    "pending_posts": (_no_params, _pending_posts),
+    "pending_comments": (_post_id_params, _pending_comments),
+}
+
+
+def parse_params(name, query):
+    """Параметры фрагмента из строки запроса.
+
+    Берутся только объявленные в FRAGMENTS параметры, поэтому ими
+    нельзя подменить user, request или csrf_token из контекстных
+    процессоров. Без параметра или с неверным значением — KeyError
+    или ValueError.
+    """
+    parse, _ = FRAGMENTS[name]
+    return parse(query)
+
+
+def context(name, request, params):
+    _, extra = FRAGMENTS[name]
+    return dict(params, **(extra(request, params) if extra else {}))
+
+
+def shared_page(view):
+    """Помечает страницу как одинаковую для всех пользователей.
+
+    С EDGE_FRAGMENTS всё персональное выносится во фрагменты
+    <esi:include>, и если при рендеринге страницы не было обращений к
+    сессии (то есть к пользователю), ответ разрешается кэшировать на
+    прокси (Cache-Control: public); прокси собирает страницу из общего
+    «каркаса» и фрагментов, запрошенных с куками пользователя.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        session = getattr(request, "session", None)
+        if (settings.EDGE_FRAGMENTS and response.status_code == 200
+                and not (session is not None and session.accessed)
+                and not response.cookies):
+            patch_cache_control(response, public=True,
+                                max_age=settings.CACHE_TIME)
+            response["Surrogate-Control"] = 'content="ESI/1.0"'
+        return response
+    return wrapper
@@ -0,0 +1,182 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Follow, User
+
+FOLLOWING_KEY = "graph:following:{}"
+FOLLOWERS_COUNT_KEY = "graph:followers_count:{}"
+SUGGESTIONS_KEY = "graph:suggestions:{}"
+
+
+def following_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь.
+
+    Список подписок одного пользователя невелик, поэтому он целиком
+    хранится в кэше и обновляется при подписке и отписке.
+    """
+    key = FOLLOWING_KEY.format(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(
+            user_id=user_id).values_list("author_id", flat=True))
+        cache.set(key, ids, settings.GRAPH_CACHE_TIME)
+    return ids
+
+
+def is_following(user_id, author_id):
+    if user_id is None:
+        return False
+    return author_id in following_ids(user_id)
+
+
+def is_mutual(user_id, other_id):
+    return (is_following(user_id, other_id)
+            and is_following(other_id, user_id))
+
+
+def following_count(user_id):
+    return len(following_ids(user_id))
+
+
+def followers_count(author_id):
+    """Число подписчиков хранится счётчиком, а не множеством id:
+    у популярного автора их могут быть миллионы.
+    """
+    key = FOLLOWERS_COUNT_KEY.format(author_id)
+    count = cache.get(key)
+    if count is None:
+        count = Follow.objects.filter(author_id=author_id).count()
+        cache.set(key, count, settings.GRAPH_CACHE_TIME)
+    return count
+
+
+def followers(author):
+    return User.objects.filter(
+        follower__author=author).order_by("-follower__pk")
+
+
+def following(user):
+    return User.objects.filter(
+        following__user=user).order_by("-following__pk")
+
+
+def mutuals(user):
+    return following(user).filter(follower__author=user)
+
+
+def suggestions(user_id, limit=10):
+    """Авторы, на которых подписаны те, на кого подписан пользователь,
+    в порядке убывания числа таких общих подписок.
+    """
+    key = SUGGESTIONS_KEY.format(user_id)
+    ranked = cache.get(key)
+    if ranked is None:
+        subscriptions = Follow.objects.filter(
+            user_id=user_id).values("author")
+        ranked = list(
+            Follow.objects.filter(user__in=subscriptions)
+            .exclude(author_id=user_id)
+            .exclude(author__in=subscriptions)
+            .values_list("author")
+            .annotate(overlap=Count("user"))
+            .order_by("-overlap", "author")[:limit])
+        cache.set(key, ranked, settings.GRAPH_CACHE_TIME)
+    users = User.objects.in_bulk([author_id for author_id, _ in ranked])
+    return [(users[author_id], overlap) for author_id, overlap in ranked
+            if author_id in users]
+
+
+def follow(user_id, author_ids):
+    """Подписывает пользователя на авторов одним запросом INSERT ...
+    ON CONFLICT DO NOTHING RETURNING.
+
+    Повторная подписка и гонка двух одновременных запросов упираются
+    в ограничение unique_follow и не создают дублей; RETURNING отдаёт
+    только действительно вставленные строки, поэтому счётчики, популярное
+    и уведомления не учитывают подписку дважды. Возвращает id авторов,
+    подписка на которых добавлена.
+    """
+    author_ids = sorted(set(author_ids) - {user_id})
+    if not author_ids:
+        return []
+    values = ", ".join(["(%s, %s)"] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {Follow._meta.db_table} (user_id, author_id)"
+            f" VALUES {values} ON CONFLICT DO NOTHING RETURNING author_id",
+            [value for author_id in author_ids
+             for value in (user_id, author_id)])
+        new_ids = {author_id for author_id, in cursor.fetchall()}
+    cached = cache.get(FOLLOWING_KEY.format(user_id))
+    stale = set(author_ids) - new_ids - (cached or set())
+    if cached is not None and stale:
+        forget([(user_id, author_id) for author_id in stale])
+    add_edges([(user_id, author_id) for author_id in new_ids])
+    return sorted(new_ids)
+
+
+def unfollow(user_id, author_ids):
+    """Отписывает пользователя от авторов. DELETE выполняется всегда:
+    кэш подписок мог устареть, если подписка появилась в другом
+    процессе. Возвращает id авторов, подписка на которых удалена.
+    """
+    author_ids = set(author_ids)
+    if not author_ids:
+        return []
+    with transaction.atomic():
+        old_ids = set(Follow.objects.filter(
+            user_id=user_id, author_id__in=author_ids
+        ).values_list("author_id", flat=True))
+        deleted, _ = Follow.objects.filter(
+            user_id=user_id, author_id__in=author_ids).delete()
+    edges = [(user_id, author_id) for author_id in old_ids]
+    if deleted == len(old_ids):
+        remove_edges(edges)
+    else:
+        forget([(user_id, author_id) for author_id in author_ids])
+    return sorted(old_ids)
+
+
+def forget(edges):
+    """Сбрасывает кэш, если он разошёлся с базой
+    (например, после отката транзакции).
+    """
+    keys = []
+    for user_id, author_id in edges:
+        keys += [FOLLOWING_KEY.format(user_id),
+                 SUGGESTIONS_KEY.format(user_id),
+                 FOLLOWERS_COUNT_KEY.format(author_id)]
+    cache.delete_many(keys)
+
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def add_edges(edges):
+    """Обновляет кэш после создания подписок (user_id, author_id)."""
+    _update(edges, 1)
+
+
+def remove_edges(edges):
+    """Обновляет кэш после удаления подписок (user_id, author_id)."""
+    _update(edges, -1)
+
+
+def _update(edges, delta):
+    by_user = {}
+    for user_id, author_id in edges:
+        by_user.setdefault(user_id, set()).add(author_id)
+        _incr(FOLLOWERS_COUNT_KEY.format(author_id), delta)
+    for user_id, author_ids in by_user.items():
+        key = FOLLOWING_KEY.format(user_id)
+        ids = cache.get(key)
+        if ids is not None:
+            ids = ids | author_ids if delta > 0 else ids - author_ids
+            cache.set(key, frozenset(ids), settings.GRAPH_CACHE_TIME)
+    cache.delete_many([SUGGESTIONS_KEY.format(user_id) for user_id in by_user])
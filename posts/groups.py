@@ -0,0 +1,146 @@
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ArchivedPost, Group, GroupPoster, GroupStats, Post
+
+_groups = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_by_slug(slug):
+    """Группа по slug из памяти процесса (None, если такой нет).
+
+    В базу запрос уходит не чаще раза в GROUP_CACHE_TIME секунд на
+    slug; изменения группы в этом процессе видны сразу, в остальных —
+    после истечения срока. Отсутствие группы не кэшируется: группа,
+    созданная в другом процессе, доступна сразу. Каждый вызов получает
+    свою копию, чтобы запросы не меняли общий объект.
+    """
+    now = time.monotonic()
+    entry = _groups.get(slug)
+    if entry is None or entry[0] < now:
+        group = Group.objects.filter(slug=slug).first()
+        if group is None:
+            return None
+        entry = (now + settings.GROUP_CACHE_TIME, group)
+        with _lock:
+            _groups.pop(slug, None)
+            while len(_groups) >= settings.GROUP_CACHE_MAX_ENTRIES:
+                _groups.popitem(last=False)
+            _groups[slug] = entry
+    return copy.copy(entry[1])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    with _lock:
+        _groups.clear()
+
+
+def rows_of(posts):
+    return [(post.group_id, post.author_id, post.pub_date) for post in posts]
+
+
+def _by_group(rows):
+    groups = defaultdict(list)
+    for group_id, author_id, pub_date in rows:
+        if group_id:
+            groups[group_id].append((author_id, pub_date))
+    return groups
+
+
+def add_posts(rows):
+    """Учитывает новые посты: rows — (group_id, author_id, pub_date)."""
+    with transaction.atomic():
+        for group_id, posts in _by_group(rows).items():
+            authors = Counter(author_id for author_id, _ in posts)
+            posters = {poster.author_id: poster for poster in
+                       GroupPoster.objects.select_for_update().filter(
+                           group_id=group_id, author_id__in=authors)}
+            for author_id, poster in posters.items():
+                poster.posts += authors[author_id]
+            GroupPoster.objects.bulk_update(posters.values(), ["posts"])
+            GroupPoster.objects.bulk_create(
+                [GroupPoster(group_id=group_id, author_id=author_id,
+                             posts=count)
+                 for author_id, count in authors.items()
+                 if author_id not in posters])
+            stats, _ = GroupStats.objects.select_for_update().get_or_create(
+                group_id=group_id)
+            stats.posts += len(posts)
+            stats.posters += len(authors) - len(posters)
+            newest = max(pub_date for _, pub_date in posts)
+            stats.last_post = max(stats.last_post or newest, newest)
+            stats.save()
+
+
+def remove_posts(rows):
+    """Учитывает удалённые посты (вызывается после удаления, в той же
+    транзакции): авторы, у которых в группе не осталось постов,
+    перестают считаться её участниками.
+    """
+    with transaction.atomic():
+        for group_id, posts in _by_group(rows).items():
+            authors = Counter(author_id for author_id, _ in posts)
+            posters = list(GroupPoster.objects.select_for_update().filter(
+                group_id=group_id, author_id__in=authors))
+            for poster in posters:
+                poster.posts = max(poster.posts - authors[poster.author_id],
+                                   0)
+            gone = [poster.pk for poster in posters if not poster.posts]
+            GroupPoster.objects.filter(pk__in=gone).delete()
+            GroupPoster.objects.bulk_update(
+                [poster for poster in posters if poster.posts], ["posts"])
+            stats = GroupStats.objects.select_for_update().filter(
+                group_id=group_id).first()
+            if stats is None:
+                continue
+            stats.posts = max(stats.posts - len(posts), 0)
+            stats.posters = max(stats.posters - len(gone), 0)
+            newest = max(pub_date for _, pub_date in posts)
+            if stats.last_post is None or newest >= stats.last_post:
+                stats.last_post = _last_post(group_id)
+            stats.save()
+
+
+def _last_post(group_id):
+    for model in (Post.all_objects, ArchivedPost.objects):
+        last = model.filter(group_id=group_id).aggregate(
+            last=Max("pub_date"))["last"]
+        if last:
+            return last
+    return None
+
+
+def rebuild():
+    """Пересчитывает все агрегаты по постам и архиву (для починки
+    после массовых изменений в обход add_posts/remove_posts).
+    """
+    stats, posters = {}, Counter()
+    for model in (Post.all_objects, ArchivedPost.objects):
+        rows = model.filter(group__isnull=False).values_list(
+            "group_id", "author_id").annotate(
+                posts=Count("pk"), last=Max("pub_date")).order_by()
+        for group_id, author_id, count, last in rows:
+            posters[group_id, author_id] += count
+            group = stats.setdefault(group_id, GroupStats(group_id=group_id))
+            group.posts += count
+            group.last_post = max(group.last_post or last, last)
+    for group_id, _ in posters:
+        stats[group_id].posters += 1
+    with transaction.atomic():
+        GroupStats.objects.all().delete()
+        GroupPoster.objects.all().delete()
+        GroupStats.objects.bulk_create(stats.values())
+        GroupPoster.objects.bulk_create(
+            [GroupPoster(group_id=group_id, author_id=author_id, posts=count)
+             for (group_id, author_id), count in posters.items()])
@@ -0,0 +1,165 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+
+from sorl.thumbnail import delete, get_thumbnail
+
+from tasks.queue import batch_task, task
+
+from . import archive, graph, groups, partitions, writebehind
+from .models import ArchivedComment, ArchivedPost, Comment, Follow, Post, User
+
+THUMBNAIL_GEOMETRY = "960x339"
+THUMBNAIL_OPTIONS = {"crop": "center", "upscale": True}
+
+
+@task(name="posts.warm_thumbnail")
+def warm_thumbnail(post_id):
+    """Готовит миниатюру для post_item.html заранее, чтобы её не
+    пришлось генерировать при первом показе ленты.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post and post.image:
+        get_thumbnail(post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+
+
+@task(name="posts.repair_follow_counters", priority=-10)
+def repair_follow_counters(user_ids):
+    """Пересчитывает закэшированные подписки и счётчики подписчиков."""
+    users = User.objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+    graph.forget([(user_id, user_id) for user_id in users])
+    for user_id in users:
+        graph.following_ids(user_id)
+        graph.followers_count(user_id)
+
+
+@task(name="posts.refresh_partitions", priority=-10)
+def refresh_partitions():
+    partitions.refresh()
+
+
+@task(name="posts.rebuild_group_stats", priority=-10)
+def rebuild_group_stats():
+    groups.rebuild()
+
+
+@task(name="posts.flush_write_behind", priority=5)
+def flush_write_behind():
+    writebehind.drain()
+
+
+def _delete_chunk(queryset, limit):
+    pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:limit])
+    queryset.model.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def _remove_images(names):
+    for name in names:
+        delete(name)
+
+
+def _delete_posts_chunk(queryset, limit):
+    """Удаляет пачку постов (живых или архивных), у которых уже нет
+    комментариев, а после коммита — их картинки вместе с миниатюрами.
+    """
+    posts = list(queryset.order_by("pk").only(
+        "group_id", "author_id", "pub_date", "image")[:limit])
+    queryset.model._base_manager.filter(
+        pk__in=[post.pk for post in posts]).delete()
+    groups.remove_posts(groups.rows_of(posts))
+    transaction.on_commit(partial(
+        _remove_images, [post.image.name for post in posts if post.image]))
+    return len(posts)
+
+
+def _delete_follows_chunk(queryset, limit):
+    edges = list(queryset.order_by("pk").values_list(
+        "pk", "user_id", "author_id")[:limit])
+    Follow.objects.filter(pk__in=[pk for pk, _, _ in edges]).delete()
+    graph.remove_edges([(user_id, author_id) for _, user_id, author_id
+                        in edges])
+    return len(edges)
+
+
+def _author_rows(user_ids):
+    return (
+        Comment.objects.filter(
+            Q(author_id__in=user_ids) | Q(post__author_id__in=user_ids)),
+        Post.all_objects.filter(author_id__in=user_ids),
+        ArchivedComment.objects.filter(
+            Q(author_id__in=user_ids) | Q(post__author_id__in=user_ids)),
+        ArchivedPost.objects.filter(author_id__in=user_ids),
+        Follow.objects.filter(
+            Q(user_id__in=user_ids) | Q(author_id__in=user_ids)),
+        User.objects.filter(pk__in=user_ids),
+    )
+
+
+def _count_author_rows(user_ids):
+    return sum(queryset.count() for queryset in _author_rows(user_ids))
+
+
+@batch_task(name="posts.delete_authors", total=_count_author_rows)
+def delete_authors(user_ids, limit):
+    """Удаляет пользователей со всеми их постами, комментариями и
+    подписками пачками, снизу вверх по каскаду: к моменту удаления
+    пользователя ссылающихся на него строк уже не остаётся.
+    """
+    (comments, posts, archived_comments, archived_posts, follows,
+     users) = _author_rows(user_ids)
+    return (_delete_chunk(comments, limit)
+            or _delete_posts_chunk(posts, limit)
+            or _delete_chunk(archived_comments, limit)
+            or _delete_posts_chunk(archived_posts, limit)
+            or _delete_follows_chunk(follows, limit)
+            or _delete_chunk(users, limit))
+
+
+def _count_post_rows(post_ids):
+    return (Comment.objects.filter(post_id__in=post_ids).count()
+            + Post.all_objects.filter(pk__in=post_ids).count())
+
+
+@batch_task(name="posts.delete_posts", total=_count_post_rows)
+def delete_posts(post_ids, limit):
+    return (_delete_chunk(Comment.objects.filter(post_id__in=post_ids), limit)
+            or _delete_posts_chunk(Post.all_objects.filter(pk__in=post_ids),
+                                   limit))
+
+
+@batch_task(name="posts.purge_comments",
+            total=lambda post_ids: Comment.objects.filter(
+                post_id__in=post_ids).count())
+def purge_comments(post_ids, limit):
+    return _delete_chunk(Comment.objects.filter(post_id__in=post_ids), limit)
+
+
+def _posts_to_move(post_ids, group_id):
+    return Post.objects.filter(pk__in=post_ids).exclude(group_id=group_id)
+
+
+@batch_task(name="posts.move_to_group",
+            total=lambda post_ids, group_id: _posts_to_move(
+                post_ids, group_id).count())
+def move_to_group(post_ids, group_id, limit):
+    posts = list(_posts_to_move(post_ids, group_id).order_by("pk").only(
+        "group_id", "author_id", "pub_date")[:limit])
+    moved = Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+        group_id=group_id)
+    groups.remove_posts(groups.rows_of(posts))
+    for post in posts:
+        post.group_id = group_id
+    groups.add_posts(groups.rows_of(posts))
+    return moved
+
+
+@batch_task(name="posts.archive_posts", priority=-10,
+            total=lambda before: Post.objects.filter(
+                pub_date__lt=before).count())
+def archive_posts(before, limit):
+    moved = archive.archive_chunk(before, limit)
+    if not moved:
+        partitions.refresh()
+    return moved
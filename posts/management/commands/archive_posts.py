@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import archive, jobs
+
+
+class Command(BaseCommand):
+    help = ("Переносит старые посты с комментариями в архивные таблицы "
+            "(по пачке в транзакции)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int,
+                            help="возраст постов (по умолчанию "
+                                 "ARCHIVE_AFTER_DAYS)")
+        parser.add_argument("--background", action="store_true",
+                            help="поставить задачу в очередь tasks")
+
+    def handle(self, *args, **options):
+        before = archive.cutoff(options["days"])
+        if options["background"]:
+            job = jobs.archive_posts.start(
+                before.isoformat(), description="Архивация постов")
+            self.stdout.write(f"Задача поставлена в очередь: {job}")
+            return
+        moved = archive.archive(before)
+        self.stdout.write(f"Перенесено в архив: {moved}")
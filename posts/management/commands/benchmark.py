@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from posts.benchmarks import scenarios
+
+
+class Command(BaseCommand):
+    help = ("Запускает сценарии нагрузочного тестирования на временной "
+            "тестовой базе")
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*",
+                            help="сценарии (по умолчанию все)")
+        parser.add_argument("--rows", type=int, nargs="+",
+                            default=[1000, 10000],
+                            help="размеры таблиц для сценариев")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--list", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name, func in sorted(scenarios.items()):
+                self.stdout.write(f"{name}: {(func.__doc__ or '').strip()}")
+            return
+        names = options["names"] or sorted(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Нет сценариев: {', '.join(unknown)}")
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            for name in names:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.write_table(scenarios[name](options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def write_table(self, rows):
+        if not rows:
+            return
+        columns = list(rows[0])
+        widths = [max(len(str(column)), *(len(str(row[column]))
+                                          for row in rows))
+                  for column in columns]
+        self.stdout.write("  ".join(str(column).ljust(width) for column, width
+                                    in zip(columns, widths)))
+        for row in rows:
+            self.stdout.write("  ".join(str(row[column]).ljust(width)
+                                        for column, width
+                                        in zip(columns, widths)))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import writebehind
+
+
+class Command(BaseCommand):
+    help = "Записывает в базу всё, что накопилось в очереди отложенной записи"
+
+    def handle(self, *args, **options):
+        flushed = writebehind.drain()
+        self.stdout.write(f"Записано: {flushed}")
@@ -0,0 +1,51 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from yatube.slowqueries import read
+
+
+class Command(BaseCommand):
+    help = ("Сводка журнала медленных запросов: самые дорогие запросы "
+            "по суммарному времени")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=settings.SLOW_QUERY_LOG)
+        parser.add_argument("--by", choices=("fingerprint", "view"),
+                            default="fingerprint",
+                            help="группировать по запросу или по view")
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument("--plans", action="store_true",
+                            help="показать план самого долгого запроса")
+        parser.add_argument("--width", type=int, default=100,
+                            help="ширина колонки с запросом")
+
+    def handle(self, *args, **options):
+        groups = defaultdict(list)
+        for entry in read(options["log"]):
+            groups[entry.get(options["by"])].append(entry)
+        if not groups:
+            self.stdout.write("Журнал пуст")
+            return
+        offenders = sorted(groups.items(), key=lambda item: -sum(
+            entry["ms"] for entry in item[1]))[:options["top"]]
+        for rank, (key, entries) in enumerate(offenders, 1):
+            timings = [entry["ms"] for entry in entries]
+            slowest = max(entries, key=lambda entry: entry["ms"])
+            other = "view" if options["by"] == "fingerprint" else "fingerprint"
+            common = Counter(entry.get(other) for entry in entries)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{rank}. {str(key)[:options['width']]}"))
+            self.stdout.write(
+                f"   запросов: {len(entries)}, всего: {sum(timings):.1f} мс, "
+                f"в среднем: {sum(timings) / len(timings):.1f} мс, "
+                f"максимум: {max(timings):.1f} мс")
+            self.stdout.write("   {}: {}".format(other, ", ".join(
+                f"{str(value)[:options['width']]} ({count})"
+                for value, count in common.most_common(3))))
+            if slowest["stack"]:
+                self.stdout.write(f"   стек: {slowest['stack'][-1]}")
+            if options["plans"]:
+                for step in slowest["plan"] or ["(плана нет)"]:
+                    self.stdout.write(f"     {step}")
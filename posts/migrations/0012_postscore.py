@@ -0,0 +1,22 @@
+# Generated by Django 2.2.6 on 2026-10-19 09:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_follow_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post')),
+                ('score', models.FloatField(db_index=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
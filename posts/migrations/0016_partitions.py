@@ -0,0 +1,39 @@
+# Generated by Django 2.2.6 on 2026-10-19 10:03
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractYear
+import posts.models
+
+
+def fill_month(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Post.objects.update(
+        month=ExtractYear("pub_date") * 100 + ExtractMonth("pub_date"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostPartition',
+            fields=[
+                ('month', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='month',
+            field=posts.models.MonthField(default=0, editable=False, verbose_name='Партиция'),
+        ),
+        migrations.RunPython(fill_month, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['month', '-pub_date'], name='post_month_idx'),
+        ),
+    ]
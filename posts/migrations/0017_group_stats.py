@@ -0,0 +1,63 @@
+# Generated by Django 2.2.6 on 2026-10-19 10:09
+
+from django.conf import settings
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    GroupStats = apps.get_model("posts", "GroupStats")
+    GroupPoster = apps.get_model("posts", "GroupPoster")
+    stats, posters = {}, Counter()
+    for name in ("Post", "ArchivedPost"):
+        rows = apps.get_model("posts", name).objects.filter(
+            group__isnull=False).values_list("group_id", "author_id").annotate(
+                posts=Count("id"), last=Max("pub_date")).order_by()
+        for group_id, author_id, count, last in rows:
+            posters[group_id, author_id] += count
+            group = stats.setdefault(group_id, GroupStats(group_id=group_id))
+            group.posts += count
+            group.last_post = max(group.last_post or last, last)
+    for group_id, _ in posters:
+        stats[group_id].posters += 1
+    GroupStats.objects.bulk_create(stats.values())
+    GroupPoster.objects.bulk_create(
+        [GroupPoster(group_id=group_id, author_id=author_id, posts=count)
+         for (group_id, author_id), count in posters.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('posters', models.PositiveIntegerField(default=0, verbose_name='Авторов')),
+                ('last_post', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Последний пост')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupPoster',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_posters', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posters', to='posts.Group')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='groupposter',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_poster'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.6 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliedWrite',
+            fields=[
+                ('key', models.CharField(max_length=32, primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.functions import Substr
 
 User = get_user_model()
 
@@ -13,15 +15,87 @@ class Group(models.Model):
         return f"{self.pk} {self.title}"
 
 
-class Post(models.Model):
+class MonthField(models.PositiveIntegerField):
+    """Месяц публикации в виде YYYYMM — ключ партиции поста.
+
+    Вычисляется из pub_date при каждой записи (в том числе в
+    bulk_create), поэтому новые посты всегда попадают в текущую
+    партицию. Поле должно идти в модели после pub_date.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("default", 0)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        when = model_instance.pub_date
+        value = when.year * 100 + when.month
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class CardQuerySet(models.QuerySet):
+    CARD_FIELDS = ("pub_date", "image", "author", "author__username",
+                   "group", "group__slug", "group__title")
+
+    def cards(self):
+        """Посты для карточек в лентах: только нужные карточке столбцы,
+        автор и группа одним JOIN, а вместо text — его начало длиной
+        POST_PREVIEW_LENGTH + 1 символ, обрезанное в базе (preview).
+        """
+        return self.select_related("author", "group").only(
+            *self.CARD_FIELDS).annotate(preview=Substr(
+                "text", 1, settings.POST_PREVIEW_LENGTH + 1))
+
+
+class CardMixin:
+    """Текст карточки: preview, если пост загружен через cards(),
+    иначе полный text.
+    """
+
+    @property
+    def card_text(self):
+        preview = getattr(self, "preview", None)
+        if preview is None:
+            return self.text
+        return preview[:settings.POST_PREVIEW_LENGTH]
+
+    @property
+    def is_truncated(self):
+        preview = getattr(self, "preview", None)
+        return (preview is not None
+                and len(preview) > settings.POST_PREVIEW_LENGTH)
+
+
+class PostManager(models.Manager.from_queryset(CardQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class Post(CardMixin, models.Model):
+    is_archived = False
+
     text = models.TextField()
-    pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
+    pub_date = models.DateTimeField("Дата публикации", auto_now_add=True,
+                                    db_index=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="author_posts")
     group = models.ForeignKey(Group, on_delete=models.CASCADE,
                               related_name="group_posts", blank=True,
                               null=True)
     image = models.ImageField(upload_to="posts/", blank=True, null=True)
+    is_deleted = models.BooleanField("Удалён", default=False)
+    month = MonthField("Партиция")
+
+    objects = PostManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["month", "-pub_date"],
+                         name="post_month_idx"),
+        ]
 
     def __str__(self):
         return self.text
@@ -33,7 +107,8 @@ class Comment(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="comments_author")
     text = models.TextField()
-    created = models.DateTimeField("Дата комментария", auto_now_add=True)
+    created = models.DateTimeField("Дата комментария", auto_now_add=True,
+                                   db_index=True)
 
 
 class Follow(models.Model):
@@ -41,3 +116,132 @@ class Follow(models.Model):
         User, on_delete=models.CASCADE, related_name="follower")
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="following")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"],
+                                    name="unique_follow"),
+        ]
+
+
+class PostScore(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE,
+                                primary_key=True, related_name="score")
+    score = models.FloatField(db_index=True)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class GroupStats(models.Model):
+    """Агрегаты группы для каталога /groups/, ведутся posts.groups
+    при создании, переносе и удалении постов (вместе с архивом).
+    """
+    group = models.OneToOneField(Group, on_delete=models.CASCADE,
+                                 primary_key=True, related_name="stats")
+    posts = models.PositiveIntegerField("Постов", default=0)
+    posters = models.PositiveIntegerField("Авторов", default=0)
+    last_post = models.DateTimeField("Последний пост", blank=True, null=True,
+                                     db_index=True)
+
+
+class GroupPoster(models.Model):
+    """Сколько постов автор написал в группе: по этим строкам
+    меняется GroupStats.posters, когда автор появляется или уходит.
+    """
+    group = models.ForeignKey(Group, on_delete=models.CASCADE,
+                              related_name="posters")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="group_posters")
+    posts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "author"],
+                                    name="unique_group_poster"),
+        ]
+
+
+class PostPartition(models.Model):
+    """Каталог партиций: число постов в каждом закрытом месяце.
+
+    Обновляется posts.partitions.refresh(); текущий месяц в каталог
+    не попадает и считается по индексу при каждом обращении.
+    """
+    month = models.PositiveIntegerField(primary_key=True)
+    rows = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class ArchivedPost(CardMixin, models.Model):
+    """Пост старше ARCHIVE_AFTER_DAYS, перенесённый из posts_post.
+
+    Хранится отдельной таблицей с тем же id, чтобы горячая таблица
+    постов и её индексы не росли вместе со всей историей.
+    """
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField()
+    pub_date = models.DateTimeField("Дата публикации", db_index=True)
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="archived_posts")
+    group = models.ForeignKey(Group, on_delete=models.CASCADE,
+                              related_name="archived_posts", blank=True,
+                              null=True)
+    image = models.ImageField(upload_to="posts/", blank=True, null=True)
+    archived = models.DateTimeField("Дата архивации", auto_now_add=True)
+
+    objects = CardQuerySet.as_manager()
+
+    def __str__(self):
+        return self.text
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(ArchivedPost, on_delete=models.CASCADE,
+                             related_name="comments_post")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="archived_comments")
+    text = models.TextField()
+    created = models.DateTimeField("Дата комментария")
+
+
+class Notification(models.Model):
+    """Уведомление пользователя; однотипные непрочитанные события
+    сворачиваются в одну строку («3 новых комментария к посту»),
+    см. posts.notifications.
+    """
+    COMMENT = "comment"
+    FOLLOW = "follow"
+    KINDS = (
+        (COMMENT, "Комментарий"),
+        (FOLLOW, "Подписчик"),
+    )
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE,
+                                  related_name="notifications")
+    kind = models.CharField("Тип", max_length=20, choices=KINDS)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             blank=True, null=True,
+                             related_name="notifications")
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL,
+                              blank=True, null=True, related_name="+")
+    count = models.PositiveIntegerField("Событий", default=1)
+    is_read = models.BooleanField("Прочитано", default=False)
+    updated = models.DateTimeField("Последнее событие")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recipient", "-updated"],
+                         name="notification_inbox_idx"),
+        ]
+
+
+class AppliedWrite(models.Model):
+    """Ключ записи очереди posts.writebehind, уже перенесённой в базу.
+
+    Пишется в той же транзакции, что и пост или комментарий, и
+    удаляется после удаления записи из очереди: если процесс упал
+    между фиксацией и удалением, повторный перенос запись пропустит.
+    """
+    key = models.CharField(max_length=32, primary_key=True)
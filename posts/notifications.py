@@ -0,0 +1,92 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification
+
+UNREAD_KEY = "notifications:unread:{}"
+
+
+def notify(kind, recipient_ids, actor_id, post_id=None, count=1):
+    """Добавляет count событий kind каждому из recipient_ids.
+
+    Если у получателя уже есть непрочитанное уведомление того же типа
+    (и к тому же посту), увеличивается его счётчик; иначе создаётся
+    новая строка. Для всех получателей сразу это один UPDATE и один
+    bulk INSERT, так что на событие приходится одна запись в базу.
+    Себе уведомления не отправляются.
+    """
+    recipient_ids = set(recipient_ids) - {actor_id}
+    if not recipient_ids:
+        return
+    now = timezone.now()
+    unread = Notification.objects.filter(
+        kind=kind, post_id=post_id, is_read=False,
+        recipient_id__in=recipient_ids)
+    with transaction.atomic():
+        existing = set(unread.values_list("recipient_id", flat=True))
+        if existing:
+            unread.update(count=F("count") + count, actor_id=actor_id,
+                          updated=now)
+        Notification.objects.bulk_create(
+            [Notification(recipient_id=recipient_id, kind=kind,
+                          post_id=post_id, actor_id=actor_id, count=count,
+                          updated=now)
+             for recipient_id in recipient_ids - existing])
+    for recipient_id in recipient_ids - existing:
+        try:
+            cache.incr(UNREAD_KEY.format(recipient_id))
+        except ValueError:
+            pass
+
+
+def comments_added(comments, post_authors):
+    """Уведомляет авторов постов о комментариях; post_authors — словарь
+    id поста -> id автора. Комментарии к одному посту сворачиваются.
+    """
+    counts = Counter()
+    actors = {}
+    for comment in comments:
+        if comment.author_id != post_authors[comment.post_id]:
+            counts[comment.post_id] += 1
+            actors[comment.post_id] = comment.author_id
+    for post_id, count in counts.items():
+        notify(Notification.COMMENT, [post_authors[post_id]],
+               actors[post_id], post_id, count)
+
+
+def followed(user_id, author_ids):
+    notify(Notification.FOLLOW, author_ids, user_id)
+
+
+def unread_count(user):
+    """Число непрочитанных уведомлений для шапки сайта; хранится в
+    кэше, а в базу запрос уходит только после истечения срока.
+    """
+    if not user.is_authenticated:
+        return 0
+    key = UNREAD_KEY.format(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = user.notifications.filter(is_read=False).count()
+        cache.set(key, count, settings.NOTIFICATIONS_CACHE_TIME)
+    return count
+
+
+def inbox(user):
+    return user.notifications.select_related(
+        "actor", "post__author").order_by("-updated")
+
+
+def mark_read(user, ids, until):
+    """Отмечает прочитанными показанные уведомления ids, если они не
+    обновлялись позже until: уведомления с других страниц и события,
+    появившиеся после показа страницы, остаются непрочитанными.
+    """
+    user.notifications.filter(pk__in=ids, is_read=False,
+                              updated__lte=until).update(is_read=True)
+    cache.delete(UNREAD_KEY.format(user.pk))
@@ -0,0 +1,99 @@
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """Paginator, которому число объектов передаётся заранее
+    (например, из кэшированного счётчика) вместо запроса COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @property
+    def count(self):
+        return self._count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц в админке.
+
+    Для нефильтрованного списка COUNT(*) заменяется на MAX(id): SQLite
+    берёт его из конца B-дерева за O(log n). Число может быть чуть
+    больше реального, если строки удалялись. Отфильтрованные списки
+    считаются честно — фильтры и поиск идут по индексам. Оценка
+    берётся через _base_manager: менеджер по умолчанию (у Post — с
+    is_deleted=False) превратил бы её в агрегат по всей таблице.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if query.where or query.distinct or query.combinator:
+            return super().count
+        estimate = self.object_list.model._base_manager.aggregate(
+            estimate=Max("pk"))["estimate"]
+        return estimate or 0
+
+
+class ChainedSequence:
+    """Несколько queryset подряд как одна последовательность для
+    Paginator: срез, попавший на стык, берётся из обоих.
+
+    Используется для лент, которые после горячей таблицы продолжаются
+    архивом: первые страницы читают только горячую таблицу.
+    """
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+
+    @cached_property
+    def counts(self):
+        return [queryset.count() for queryset in self.querysets]
+
+    def count(self):
+        return sum(self.counts)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+        items = []
+        for queryset, count in zip(self.querysets, self.counts):
+            if start < count and start < stop:
+                items += queryset[start:min(stop, count)]
+            start, stop = max(start - count, 0), stop - count
+            if stop <= 0:
+                break
+        return items
+
+
+class IteratedSequence:
+    """Queryset для {% for %} без кэша результатов: строки читаются
+    через iterator() пачками по chunk_size, так что в памяти
+    одновременно держится одна пачка объектов, а не весь список.
+
+    Длина (COUNT(*)) считается один раз: без __len__ тег for целиком
+    превратил бы последовательность в список.
+    """
+
+    def __init__(self, queryset, chunk_size):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    @cached_property
+    def count(self):
+        return self.queryset.count()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.queryset.iterator(chunk_size=self.chunk_size)
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Post, PostPartition
+
+CATALOG_KEY = "partitions:catalog"
+
+
+def month_of(when):
+    return when.year * 100 + when.month
+
+
+def refresh():
+    """Пересчитывает каталог закрытых месяцев.
+
+    Запускается задачей posts.refresh_partitions (например, раз в сутки
+    и после архивации): удаления и архивация меняют число постов в
+    старых месяцах, а до пересчёта страницы за ними могут сдвинуться
+    на несколько постов.
+    """
+    current = month_of(timezone.now())
+    counts = dict(Post.objects.filter(month__lt=current).values_list(
+        "month").annotate(rows=Count("pk")).order_by())
+    with transaction.atomic():
+        PostPartition.objects.exclude(month__in=counts).delete()
+        for month, rows in counts.items():
+            PostPartition.objects.update_or_create(
+                month=month, defaults={"rows": rows})
+    cache.delete(CATALOG_KEY)
+    return counts
+
+
+def catalog():
+    """Партиции от новых к старым: список (месяц, число постов).
+
+    Закрытые месяцы берутся из каталога (кэшируется), а месяцы новее
+    последнего из них — текущий и, если каталог ещё не пересчитан,
+    только что закрывшийся — считаются по индексу (month, pub_date).
+    """
+    closed = cache.get(CATALOG_KEY)
+    if closed is None:
+        closed = list(PostPartition.objects.order_by("-month").values_list(
+            "month", "rows"))
+        cache.set(CATALOG_KEY, closed, settings.PARTITIONS_CACHE_TIME)
+    recent = Post.objects.filter(month__gt=closed[0][0] if closed else 0)
+    return list(recent.values_list("month").annotate(
+        rows=Count("pk")).order_by("-month")) + closed
+
+
+class PartitionedSequence:
+    """Лента постов, которая читается по партициям от новых к старым.
+
+    Для среза пропускаются целые партиции по числам из каталога, а
+    посты выбираются запросами month = M ORDER BY pub_date DESC только
+    из тех партиций, что попали на страницу; обход останавливается,
+    как только страница заполнена. COUNT(*) по всей таблице не нужен.
+    """
+
+    def __init__(self, queryset, partitions):
+        self.queryset = queryset
+        self.partitions = partitions
+
+    def count(self):
+        return sum(rows for _, rows in self.partitions)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        need = (self.count() if key.stop is None else key.stop) - offset
+        items = []
+        for month, rows in self.partitions:
+            if need <= 0:
+                break
+            if offset >= rows:
+                offset -= rows
+                continue
+            chunk = list(self.queryset.filter(month=month)[
+                offset:offset + need])
+            items += chunk
+            need -= len(chunk)
+            offset = 0
+        return items
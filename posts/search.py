@@ -0,0 +1,85 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+TABLES = ("posts_post", "posts_comment")
+
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts"
+    " USING fts5(text, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_insert"
+    " AFTER INSERT ON {table} BEGIN"
+    " INSERT INTO {table}_fts(rowid, text) VALUES (new.id, new.text);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_delete"
+    " AFTER DELETE ON {table} BEGIN"
+    " INSERT INTO {table}_fts({table}_fts, rowid, text)"
+    " VALUES ('delete', old.id, old.text);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_update"
+    " AFTER UPDATE OF text ON {table} BEGIN"
+    " INSERT INTO {table}_fts({table}_fts, rowid, text)"
+    " VALUES ('delete', old.id, old.text);"
+    " INSERT INTO {table}_fts(rowid, text) VALUES (new.id, new.text);"
+    " END",
+)
+
+DROP_SQL = (
+    "DROP TRIGGER IF EXISTS {table}_fts_insert",
+    "DROP TRIGGER IF EXISTS {table}_fts_delete",
+    "DROP TRIGGER IF EXISTS {table}_fts_update",
+    "DROP TABLE IF EXISTS {table}_fts",
+)
+
+
+def install(using_connection):
+    """Создаёт FTS5-индекс по полю text и триггеры, которые его ведут.
+
+    SQLite удаляет триггеры вместе с таблицей, а миграции Django
+    пересоздают таблицу при изменении полей, поэтому функция вызывается
+    после каждой миграции и перестраивает индекс, если триггеры пропали.
+    """
+    if using_connection.vendor != "sqlite":
+        return
+    with using_connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'"
+                " AND name LIKE %s", [f"{table}_fts_%"])
+            if cursor.fetchone()[0] == len(CREATE_SQL) - 1:
+                continue
+            for statement in CREATE_SQL:
+                cursor.execute(statement.format(table=table))
+            cursor.execute(
+                f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def uninstall(using_connection):
+    if using_connection.vendor != "sqlite":
+        return
+    with using_connection.cursor() as cursor:
+        for table in TABLES:
+            for statement in DROP_SQL:
+                cursor.execute(statement.format(table=table))
+
+
+def fts_query(term):
+    """Превращает строку поиска в запрос FTS5: каждое слово ищется
+    как префикс, спецсимволы синтаксиса FTS экранируются кавычками.
+    """
+    return " ".join('"{}"*'.format(word.replace('"', '""'))
+                    for word in term.split())
+
+
+def search(queryset, term):
+    """Полнотекстовый поиск по полю text через индекс <table>_fts.
+
+    На базах без FTS5 (не SQLite) откатывается на icontains.
+    """
+    query = fts_query(term)
+    if not query:
+        return queryset
+    if connection.vendor != "sqlite":
+        return queryset.filter(text__icontains=term)
+    table = f"{queryset.model._meta.db_table}_fts"
+    return queryset.filter(pk__in=RawSQL(
+        f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [query]))
@@ -0,0 +1,95 @@
+from uuid import uuid4
+
+from django import shortcuts
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template import loader
+
+# Ключ контекста, по которому тег {% stream %} находит Streams
+STREAMS = "_streams"
+
+
+class Streams:
+    """Списки, отложенные тегом {% stream %} до отправки ответа.
+
+    Вместо списка в «каркас» страницы выводится уникальная метка;
+    chunks() режет каркас по меткам и между кусками рендерит элементы
+    по одному, отдавая каждый сразу.
+    """
+
+    def __init__(self):
+        self.token = uuid4().hex
+        self.lists = []
+
+    def add(self, items, template, name, context):
+        marker = f"<!--stream {self.token} {len(self.lists)}-->"
+        self.lists.append((marker, items, template, name,
+                           context.new(context.flatten())))
+        return marker
+
+    def chunks(self, page):
+        for marker, items, template, name, context in self.lists:
+            head, page = page.split(marker, 1)
+            yield head
+            for item in items:
+                with context.push({name: item}):
+                    yield template.render(context)
+        yield page
+
+
+class StreamingPage(StreamingHttpResponse):
+    """Ответ posts.streaming.render.
+
+    Поток можно прочитать повторно, как это делают assertContains и
+    .content в тестах: когда он дочитан до конца, следующее обращение
+    к streaming_content заново рендерит списки по сохранённому каркасу.
+    Сервер читает ответ один раз, и страница целиком в памяти не
+    собирается.
+    """
+
+    def __init__(self, streams, page, **kwargs):
+        self.streams = streams
+        self.page = page
+        self.consumed = False
+        super().__init__(self._chunks(), **kwargs)
+
+    def _chunks(self):
+        yield from self.streams.chunks(self.page)
+        self.consumed = True
+
+    @property
+    def streaming_content(self):
+        if self.consumed:
+            self.consumed = False
+            self._set_streaming_content(self._chunks())
+        return super().streaming_content
+
+    @streaming_content.setter
+    def streaming_content(self, value):
+        self._set_streaming_content(value)
+
+    @property
+    def content(self):
+        return self.getvalue()
+
+
+def render(request, template_name, context=None, content_type=None,
+           status=None):
+    """Как django.shortcuts.render, но с STREAMING_PAGES отдаёт
+    StreamingHttpResponse: каркас страницы (head, шапка и всё, кроме
+    списков {% stream %}) уходит первым куском, а элементы списков
+    рендерятся и читаются из базы уже во время отправки.
+
+    Каркас рендерится до возврата из view, поэтому контекст и шаблоны
+    попадают в ответ тестового клиента как обычно. Элементы списков не
+    должны первыми обращаться к сессии: заголовки (Vary: Cookie) к
+    этому времени уже отправлены.
+    """
+    if not settings.STREAMING_PAGES:
+        return shortcuts.render(request, template_name, context,
+                                content_type, status)
+    streams = Streams()
+    page = loader.render_to_string(
+        template_name, dict(context or {}, **{STREAMS: streams}), request)
+    return StreamingPage(streams, page, content_type=content_type,
+                         status=status)
@@ -0,0 +1,31 @@
+from urllib.parse import urlencode
+
+from django import template
+from django.conf import settings
+from django.shortcuts import reverse
+from django.utils.html import format_html
+
+from posts import fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, name, **params):
+    """Персональная часть страницы.
+
+    Обычно шаблон fragments/<name>.html рендерится на месте. С
+    EDGE_FRAGMENTS вместо него выводится <esi:include>, который прокси
+    заполнит ответом /fragments/<name>/ для конкретного пользователя,
+    а сама страница остаётся одинаковой для всех.
+    """
+    if settings.EDGE_FRAGMENTS:
+        src = reverse("fragment", args=[name])
+        if params:
+            src += "?" + urlencode(params)
+        return format_html('<esi:include src="{}"/>', src)
+    fragment_template = context.template.engine.get_template(
+        f"fragments/{name}.html")
+    with context.push(fragments.context(name, context.get("request"),
+                                        params)):
+        return fragment_template.render(context)
@@ -0,0 +1,53 @@
+from django import template
+from django.conf import settings
+
+from posts.paginators import IteratedSequence
+from posts.streaming import STREAMS
+
+register = template.Library()
+
+
+@register.filter
+def streamed(queryset):
+    """Перебор queryset в шаблоне пачками по COMMENTS_CHUNK_SIZE строк
+    (см. IteratedSequence): {% with comments=comments|streamed %}.
+    """
+    return IteratedSequence(queryset, settings.COMMENTS_CHUNK_SIZE)
+
+
+class StreamNode(template.Node):
+    def __init__(self, items, template_name, name):
+        self.items = items
+        self.template_name = template_name
+        self.name = name
+
+    def render(self, context):
+        items = self.items.resolve(context)
+        item_template = context.template.engine.get_template(
+            self.template_name.resolve(context))
+        streams = context.get(STREAMS)
+        if streams is not None:
+            return streams.add(items, item_template, self.name, context)
+        output = []
+        for item in items:
+            with context.push({self.name: item}):
+                output.append(item_template.render(context))
+        return "".join(output)
+
+
+@register.tag
+def stream(parser, token):
+    """{% stream items "item.html" as item %} — то же, что цикл for с
+    include шаблона item.html для каждого элемента, но на странице,
+    отданной через posts.streaming.render, элементы рендерятся уже во
+    время отправки ответа, по одному.
+
+    Внутри {% cache %} не используется: в кэш попала бы метка вместо
+    списка.
+    """
+    bits = token.split_contents()
+    if len(bits) != 5 or bits[3] != "as":
+        raise template.TemplateSyntaxError(
+            f"{bits[0]}: ожидается {{% {bits[0]} items \"шаблон\" as имя %}}")
+    return StreamNode(parser.compile_filter(bits[1]),
+                      parser.compile_filter(bits[2]), bits[4])
@@ -1,12 +1,28 @@
+import html
+import re
 import tempfile
 import time
+from datetime import timedelta
+from unittest import mock
 
+from django.core.cache import cache
+from django.db import DatabaseError, connection
 from django.shortcuts import reverse
-from django.test import Client, TestCase, override_settings
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from PIL import Image
 
-from .models import Follow, Group, Post, User
+from tasks.models import Job, Task
+from tasks.queue import run_pending
+
+from . import (archive, graph, groups, jobs, partitions, search, trending,
+               writebehind)
+from .models import (ArchivedComment, ArchivedPost, Comment, Follow, Group,
+                     GroupStats, Notification, Post, PostScore, User)
+from .paginators import ChainedSequence, EstimatedCountPaginator
 
 DUMMY_CACHE = {
     "default": {
@@ -244,3 +260,862 @@ class TestComments(TestCase):
         self.assertContains(response, "Проверка комментария",
                             msg_prefix="На странице поста не найден "
                             "комментарий!")
+
+
+class TestFollowGraph(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="TestUser", password="Qwerty")
+        self.friend = User.objects.create_user(
+            username="TestFriend", password="Qwerty")
+        self.author = User.objects.create_user(
+            username="TestAuthor", password="Qwerty")
+        self.client.force_login(self.user)
+
+    def test_follow_updates_cache(self):
+        self.assertEqual(graph.followers_count(self.friend.pk), 0)
+        self.client.get(reverse("profile_follow",
+                                kwargs={"username": self.friend}))
+        self.assertIn(self.friend.pk, graph.following_ids(self.user.pk),
+                      msg="Подписка не попала в кэш!")
+        self.assertEqual(graph.followers_count(self.friend.pk), 1,
+                         msg="Счётчик подписчиков не обновлён!")
+        self.client.get(reverse("profile_unfollow",
+                                kwargs={"username": self.friend}))
+        self.assertNotIn(self.friend.pk, graph.following_ids(self.user.pk),
+                         msg="Отписка не попала в кэш!")
+        self.assertEqual(graph.followers_count(self.friend.pk), 0,
+                         msg="Счётчик подписчиков не обновлён!")
+
+    def test_mutuals_and_suggestions(self):
+        Follow.objects.create(user=self.user, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.user)
+        Follow.objects.create(user=self.friend, author=self.author)
+        self.assertTrue(graph.is_mutual(self.user.pk, self.friend.pk))
+        self.assertEqual(list(graph.mutuals(self.user)), [self.friend],
+                         msg="Взаимные подписки определены неверно!")
+        self.assertEqual(graph.suggestions(self.user.pk), [(self.author, 1)],
+                         msg="Рекомендации составлены неверно!")
+
+    def test_follow_lists(self):
+        Follow.objects.create(user=self.friend, author=self.user)
+        response = self.client.get(reverse("followers",
+                                           kwargs={"username": self.user}))
+        self.assertContains(response, "@TestFriend",
+                            msg_prefix="Подписчик не отображается!")
+        response = self.client.get(reverse("following",
+                                           kwargs={"username": self.friend}))
+        self.assertContains(response, "@TestUser",
+                            msg_prefix="Подписка не отображается!")
+
+
+class TestFollowBatch(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="TestUser", password="Qwerty")
+        self.authors = [User.objects.create_user(username=f"TestAuthor{i}")
+                        for i in range(3)]
+        self.group = Group.objects.create(title="TestGroup", slug="test")
+        for author in self.authors[:2]:
+            Post.objects.create(text="Пост", author=author, group=self.group)
+        self.client.force_login(self.user)
+
+    def test_repeated_follow_is_idempotent(self):
+        url = reverse("profile_follow", kwargs={"username": self.authors[0]})
+        self.client.get(url)
+        cache.clear()
+        self.client.get(url)
+        self.assertEqual(self.user.follower.count(), 1,
+                         msg="Повторная подписка создала дубль!")
+
+    def test_unfollow_with_stale_cache(self):
+        graph.following_ids(self.user.pk)
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        self.client.get(reverse("profile_unfollow",
+                                kwargs={"username": self.authors[0]}))
+        self.assertEqual(self.user.follower.count(), 0,
+                         msg="Отписка не сработала при устаревшем кэше!")
+
+    def test_follow_with_stale_cache_is_not_counted(self):
+        graph.following_ids(self.user.pk)
+        self.assertEqual(graph.followers_count(self.authors[0].pk), 0)
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        self.client.get(reverse("profile_follow",
+                                kwargs={"username": self.authors[0]}))
+        self.assertEqual(graph.followers_count(self.authors[0].pk), 1,
+                         msg="Существующая подписка посчитана повторно!")
+        self.assertFalse(Notification.objects.exists(),
+                         msg="Уведомление о существующей подписке!")
+
+    def test_batch_follow_group(self):
+        response = self.client.post(reverse("follow_batch"), {
+            "group": self.group.slug, "follow": [self.authors[2].username]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["followed"]), 3)
+        self.assertEqual(self.user.follower.count(), 3,
+                         msg="Подписка на всех авторов группы не работает!")
+        response = self.client.post(reverse("follow_batch"), {
+            "unfollow": [author.username for author in self.authors]})
+        self.assertEqual(len(response.json()["unfollowed"]), 3)
+        self.assertEqual(self.user.follower.count(), 0)
+
+    def test_batch_requires_post(self):
+        response = self.client.get(reverse("follow_batch"))
+        self.assertEqual(response.status_code, 405)
+
+
+class TestWriteBehind(TransactionTestCase):
+    def setUp(self):
+        self.queue_file = tempfile.NamedTemporaryFile(suffix=".sqlite3")
+        self.settings = override_settings(
+            WRITE_BEHIND=True, WRITE_BEHIND_WORKER=False,
+            WRITE_BEHIND_QUEUE=self.queue_file.name)
+        self.settings.enable()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="TestUser", password="Qwerty")
+        self.post = Post.objects.create(text="Пост", author=self.user)
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.queue_file.close()
+
+    def test_read_your_writes(self):
+        self.client.post(reverse("new_post"), {"text": "Отложенный пост"})
+        self.client.post(reverse("add_comment", kwargs={
+            "username": self.user, "post_id": self.post.pk}),
+            {"text": "Отложенный комментарий"})
+        self.assertEqual(Post.objects.count(), 1,
+                         msg="Пост записан в базу синхронно!")
+        response = self.client.get(reverse("profile",
+                                           kwargs={"username": self.user}))
+        self.assertContains(response, "Отложенный пост",
+                            msg_prefix="Автор не видит свой пост!")
+        response = self.client.get(reverse("post", kwargs={
+            "username": self.user, "post_id": self.post.pk}))
+        self.assertContains(response, "Отложенный комментарий",
+                            msg_prefix="Автор не видит свой комментарий!")
+        self.assertEqual(writebehind.drain(), 2)
+        self.assertTrue(Post.objects.filter(text="Отложенный пост").exists())
+        self.assertTrue(self.post.comments_post.filter(
+            text="Отложенный комментарий").exists())
+        self.assertEqual(len(writebehind.get_queue()), 0)
+
+    def test_flushed_posts_are_published_with_pk(self):
+        self.client.post(reverse("new_post"), {"text": "С номером"})
+        with mock.patch.object(writebehind.events, "post_created") as created:
+            writebehind.drain()
+        post = Post.objects.get(text="С номером")
+        created.assert_called_once_with(post)
+        self.assertEqual(created.call_args[0][0].pk, post.pk,
+                         msg="Событие о посте отправлено без pk!")
+
+    def test_flushed_posts_are_trending(self):
+        self.client.post(reverse("new_post"), {"text": "В топе"})
+        writebehind.drain()
+        self.assertTrue(PostScore.objects.filter(
+            post__text="В топе").exists(),
+            msg="Пост из очереди не попал в популярное!")
+
+    def test_queue_survives_restart(self):
+        self.client.post(reverse("new_post"), {"text": "Пережил падение"})
+        restarted = writebehind.WriteQueue(self.queue_file.name)
+        self.assertEqual(writebehind.drain(restarted), 1,
+                         msg="Очередь потеряна после перезапуска!")
+        self.assertTrue(Post.objects.filter(text="Пережил падение").exists())
+
+    def test_failed_flush_keeps_entries(self):
+        queue = writebehind.WriteQueue(self.queue_file.name, lease=0)
+        self.client.post(reverse("new_post"), {"text": "Не потеряется"})
+        with mock.patch.object(Comment.objects, "bulk_create",
+                               side_effect=DatabaseError):
+            writebehind.flush(queue)
+        self.assertFalse(Post.objects.filter(text="Не потеряется").exists(),
+                         msg="Транзакция сброса не откатилась!")
+        self.assertEqual(len(queue), 1,
+                         msg="Запись потеряна после сбоя!")
+        writebehind.flush(queue)
+        self.assertTrue(Post.objects.filter(text="Не потеряется").exists())
+
+    def test_bad_entry_does_not_block_queue(self):
+        queue = writebehind.WriteQueue(self.queue_file.name, lease=0,
+                                       max_attempts=3)
+        queue.append(writebehind.POST, self.user.pk + 100,
+                     {"text": "Автор удалён", "group": None})
+        queue.append(writebehind.POST, self.user.pk,
+                     {"text": "Хорошая запись", "group": None})
+        writebehind.flush(queue)
+        self.assertTrue(Post.objects.filter(text="Хорошая запись").exists(),
+                        msg="Плохая запись не дала перенести остальные!")
+        for _ in range(2):
+            writebehind.flush(queue)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(len(queue.dead()), 1,
+                         msg="Запись не перенесена в dead после попыток!")
+
+    def test_crash_after_commit_does_not_duplicate(self):
+        queue = writebehind.WriteQueue(self.queue_file.name, lease=0)
+        self.client.post(reverse("new_post"), {"text": "Один раз"})
+        with mock.patch.object(writebehind.WriteQueue, "remove",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                writebehind.flush(queue)
+        writebehind.flush(queue)
+        self.assertEqual(Post.objects.filter(text="Один раз").count(), 1,
+                         msg="Запись перенесена повторно после падения!")
+        self.assertEqual(len(queue), 0)
+
+    def test_expired_claim_is_retried(self):
+        queue = writebehind.WriteQueue(self.queue_file.name, lease=0)
+        queue.append(writebehind.POST, self.user.pk,
+                     {"text": "Брошенная пачка", "group": None})
+        self.assertEqual(len(queue.claim(10)), 1)
+        self.assertEqual(writebehind.flush(queue), 1,
+                         msg="Пачка упавшего воркера не забрана повторно!")
+
+
+class TestTrending(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="TestUser", password="Qwerty")
+        self.author = User.objects.create_user(
+            username="TestAuthor", password="Qwerty")
+        self.quiet = Post.objects.create(text="Тихий пост", author=self.user)
+        self.hot = Post.objects.create(text="Горячий пост",
+                                       author=self.author)
+        trending.record_post(self.quiet)
+        trending.record_post(self.hot)
+        self.client.force_login(self.user)
+
+    def test_comments_raise_post(self):
+        for _ in range(2):
+            self.client.post(reverse("add_comment", kwargs={
+                "username": self.author, "post_id": self.hot.pk}),
+                {"text": "Комментарий"})
+        self.assertEqual(trending.top()[0], self.hot,
+                         msg="Комментарии не поднимают пост!")
+        response = self.client.get(reverse("trending"))
+        self.assertContains(response, "Горячий пост")
+
+    def test_follow_raises_author_posts(self):
+        self.client.get(reverse("profile_follow",
+                                kwargs={"username": self.author}))
+        self.assertEqual(trending.top()[0], self.hot,
+                         msg="Подписка не поднимает посты автора!")
+
+    def test_old_events_decay(self):
+        old = timezone.now() - timedelta(days=7)
+        trending.bump([self.quiet.pk], 100, old)
+        trending.bump([self.hot.pk], 1)
+        self.assertEqual(trending.top(), [self.hot, self.quiet],
+                         msg="Старые события не затухают!")
+
+
+class TestAdmin(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_superuser(
+            username="Admin", email="admin@test.ru", password="Qwerty")
+        self.post = Post.objects.create(text="Полнотекстовый поиск",
+                                        author=self.admin)
+        Post.objects.create(text="Другой пост", author=self.admin)
+        self.client.force_login(self.admin)
+
+    def test_search_uses_index(self):
+        self.assertEqual(list(search.search(Post.objects.all(), "полнотекст")),
+                         [self.post], msg="Поиск не находит пост!")
+        self.post.text = "Новый текст"
+        self.post.save()
+        self.assertFalse(search.search(Post.objects.all(), "полнотекст"),
+                         msg="Индекс не обновляется при изменении поста!")
+        self.assertEqual(list(search.search(Post.objects.all(), "нов")),
+                         [self.post])
+
+    def test_changelist_skips_full_count(self):
+        url = reverse("admin:posts_post_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"q": "полнотекстовый"})
+        self.assertContains(response, "Полнотекстовый поиск")
+        self.assertNotContains(response, "Другой пост")
+        self.assertFalse(
+            [query for query in queries if "COUNT(*)" in query["sql"]
+             and "WHERE" not in query["sql"]],
+            msg="Админка считает все строки таблицы!")
+        response = self.client.get(reverse("admin:posts_comment_changelist"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_estimated_count_reads_only_primary_key(self):
+        paginator = EstimatedCountPaginator(Post.all_objects.all(), 10)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count,
+                             Post.all_objects.order_by("pk").last().pk)
+        self.assertNotIn("WHERE", queries[0]["sql"],
+                         msg="Оценка числа строк фильтрует таблицу!")
+
+
+@override_settings(TASKS_ALWAYS_EAGER=True, TASKS_CHUNK_SIZE=2)
+class TestBulkJobs(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.admin = User.objects.create_superuser(
+            username="Admin", email="admin@test.ru", password="Qwerty")
+        self.spammer = User.objects.create_user(username="Spammer")
+        self.user = User.objects.create_user(username="TestUser")
+        self.group = Group.objects.create(title="Группа", slug="group")
+        self.spam = [Post.objects.create(text=f"Спам {i}", author=self.spammer)
+                     for i in range(3)]
+        self.post = Post.objects.create(text="Пост", author=self.user)
+        for post in self.spam + [self.post]:
+            Comment.objects.create(post=post, author=self.user, text="Ответ")
+        Comment.objects.create(post=self.post, author=self.spammer,
+                               text="Спам")
+        graph.follow(self.user.pk, [self.spammer.pk])
+        graph.follow(self.spammer.pk, [self.user.pk])
+        self.client.force_login(self.admin)
+
+    def test_delete_author_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("admin:auth_user_changelist"),
+                {"action": "delete_in_background",
+                 "_selected_action": [self.spammer.pk]}, follow=True)
+        self.assertContains(response, "поставлена в очередь")
+        self.assertFalse(User.objects.filter(username="Spammer").exists())
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertEqual(list(Comment.objects.values_list("text", flat=True)),
+                         ["Ответ"], msg="Удалены не все комментарии!")
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(graph.following_ids(self.user.pk), frozenset(),
+                         msg="Кэш подписок не очищен!")
+        self.assertEqual(graph.followers_count(self.user.pk), 0)
+        deletes = [query["sql"] for query in queries
+                   if query["sql"].startswith("DELETE")]
+        self.assertGreater(len(deletes), 4, msg="Удаление не разбито "
+                           "на пачки!")
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.progress), (Task.DONE, 100))
+        self.assertEqual(job.done, job.total)
+
+    def test_move_and_purge(self):
+        changelist = reverse("admin:posts_post_changelist")
+        ids = [post.pk for post in self.spam]
+        self.client.post(changelist, {"action": "move_to_group",
+                                      "group": self.group.pk,
+                                      "_selected_action": ids})
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 3)
+        self.client.post(changelist, {"action": "purge_comments",
+                                      "_selected_action": ids})
+        self.assertFalse(Comment.objects.filter(post_id__in=ids).exists())
+        self.assertEqual(self.post.comments_post.count(), 2)
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_each_chunk_is_a_task(self):
+        job = jobs.delete_posts.start([post.pk for post in self.spam])
+        self.assertEqual(job.total, 6)
+        self.assertEqual(run_pending(), 5, msg="Ожидалось по задаче на "
+                         "пачку и завершающая задача!")
+        job.refresh_from_db()
+        self.assertEqual(job.done, 6)
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+
+
+@override_settings(CACHES=DUMMY_CACHE)
+class TestArchive(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="TestUser")
+        self.group = Group.objects.create(title="Группа", slug="group")
+        self.posts = [Post.objects.create(text=f"Пост {i}", author=self.user,
+                                          group=self.group)
+                      for i in range(15)]
+        old = timezone.now() - timedelta(days=400)
+        for i, post in enumerate(self.posts[:5]):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=old + timedelta(minutes=i))
+            Comment.objects.create(post=post, author=self.user,
+                                   text=f"Старый комментарий {i}")
+
+    def test_archive_moves_old_posts(self):
+        self.assertEqual(archive.archive(archive.cutoff(), limit=2), 5)
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(ArchivedPost.objects.count(), 5)
+        self.assertEqual(ArchivedComment.objects.count(), 5)
+        self.assertFalse(Comment.objects.exists())
+        old = self.posts[0]
+        response = self.client.get(reverse("post", kwargs={
+            "username": self.user, "post_id": old.pk}))
+        self.assertContains(response, "Старый комментарий 0")
+        self.assertNotContains(response, "Добавить комментарий:")
+
+    def test_profile_and_group_continue_into_archive(self):
+        archive.archive(archive.cutoff())
+        for url in (reverse("profile", kwargs={"username": self.user}),
+                    reverse("group", kwargs={"slug": self.group.slug})):
+            first = self.client.get(url)
+            second = self.client.get(url, {"page": 2})
+            self.assertEqual(first.context["paginator"].count, 15)
+            self.assertEqual([post.text for post in first.context["page"]],
+                             [f"Пост {i}" for i in range(14, 4, -1)])
+            self.assertEqual([post.text for post in second.context["page"]],
+                             [f"Пост {i}" for i in range(4, -1, -1)],
+                             msg="Лента не продолжается архивом!")
+
+    def test_chained_sequence_slices_across_tables(self):
+        archive.archive(archive.cutoff())
+        chain = ChainedSequence(Post.objects.order_by("-pub_date"),
+                                ArchivedPost.objects.order_by("-pub_date"))
+        self.assertEqual(len(chain), 15)
+        self.assertEqual([post.text for post in chain[8:12]],
+                         ["Пост 6", "Пост 5", "Пост 4", "Пост 3"])
+        self.assertEqual(chain[14].text, "Пост 0")
+
+    def test_soft_delete_hides_post_at_once(self):
+        admin = User.objects.create_superuser(
+            username="Admin", email="admin@test.ru", password="Qwerty")
+        self.client.force_login(admin)
+        post = self.posts[-1]
+        trending.record_post(post)
+        self.client.post(reverse("admin:posts_post_changelist"),
+                         {"action": "delete_in_background",
+                          "_selected_action": [post.pk]})
+        self.assertTrue(Post.all_objects.filter(pk=post.pk).exists(),
+                        msg="Пост удалён синхронно!")
+        self.assertNotContains(self.client.get(reverse("index")), post.text)
+        self.assertNotIn(post, trending.top())
+        run_pending()
+        self.assertFalse(Post.all_objects.filter(pk=post.pk).exists())
+
+
+@override_settings(CACHES=DUMMY_CACHE)
+class TestPartitions(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="TestUser")
+        now = timezone.now()
+        for i in range(25):
+            post = Post.objects.create(text=f"Пост {i}", author=self.user)
+            post.pub_date = now - timedelta(days=12 * (24 - i))
+            post.save()
+
+    def test_writes_go_to_current_partition(self):
+        post = Post.objects.create(text="Новый пост", author=self.user)
+        self.assertEqual(post.month, partitions.month_of(timezone.now()))
+        self.assertEqual(Post.objects.values("month").distinct().count(),
+                         len(partitions.catalog()))
+
+    def test_pages_match_monolithic_table(self):
+        partitions.refresh()
+        posts = Post.objects.order_by("-pub_date")
+        chain = partitions.PartitionedSequence(posts, partitions.catalog())
+        self.assertEqual(len(chain), 25)
+        for start in range(0, 25, 10):
+            self.assertEqual(chain[start:start + 10],
+                             list(posts[start:start + 10]))
+        with override_settings(POST_PARTITIONS=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("index"), {"page": 2})
+        self.assertEqual([post.text for post in response.context["page"]],
+                         [f"Пост {i}" for i in range(14, 4, -1)])
+        self.assertFalse(
+            [query for query in queries
+             if 'SELECT COUNT(*) AS "__count" FROM "posts_post"'
+             in query["sql"]],
+            msg="Лента считает все посты!")
+
+    def test_stale_catalog_still_fills_page(self):
+        partitions.refresh()
+        oldest = Post.objects.order_by("pub_date")[:3]
+        Post.objects.filter(pk__in=[post.pk for post in oldest]).delete()
+        chain = partitions.PartitionedSequence(
+            Post.objects.order_by("-pub_date"), partitions.catalog())
+        self.assertEqual(len(chain[10:20]), 10)
+        self.assertEqual(chain[20:30][-1].text, "Пост 3")
+
+
+@override_settings(CACHES=DUMMY_CACHE)
+class TestGroups(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="TestUser", password="Qwerty")
+        self.other = User.objects.create_user(
+            username="TestOther", password="Qwerty")
+        self.group = Group.objects.create(title="Кошки", slug="cats",
+                                          description="Про кошек")
+        self.empty = Group.objects.create(title="Пустая", slug="empty",
+                                          description="Без постов")
+        for user, text in ((self.user, "Первый"), (self.user, "Второй"),
+                           (self.other, "Третий")):
+            self.client.force_login(user)
+            self.client.post(reverse("new_post"),
+                             {"text": text, "group": self.group.pk})
+
+    def stats(self):
+        return GroupStats.objects.get(group=self.group)
+
+    def test_directory_reads_aggregates(self):
+        stats = self.stats()
+        self.assertEqual((stats.posts, stats.posters), (3, 2))
+        self.assertEqual(stats.last_post,
+                         Post.objects.get(text="Третий").pub_date)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("groups"))
+        self.assertContains(response, "Записей: 3")
+        self.assertContains(response, "Пустая")
+        self.assertFalse([query for query in queries
+                          if "GROUP BY" in query["sql"]],
+                         msg="Каталог групп агрегирует посты!")
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_delete_and_move_update_aggregates(self):
+        third = Post.objects.get(text="Третий")
+        jobs.delete_posts.start([third.pk])
+        stats = self.stats()
+        self.assertEqual((stats.posts, stats.posters), (2, 1),
+                         msg="Ушедший автор не вычтен!")
+        self.assertEqual(stats.last_post,
+                         Post.objects.get(text="Второй").pub_date)
+        jobs.move_to_group.start(
+            list(Post.objects.values_list("pk", flat=True)), self.empty.pk)
+        self.assertEqual((self.stats().posts, self.stats().posters), (0, 0))
+        moved = GroupStats.objects.get(group=self.empty)
+        self.assertEqual((moved.posts, moved.posters), (2, 1))
+        incremental = list(GroupStats.objects.order_by("pk").values_list(
+            "group", "posts", "posters", "last_post"))
+        groups.rebuild()
+        self.assertEqual(
+            [row for row in incremental if row[1]],
+            list(GroupStats.objects.order_by("pk").values_list(
+                "group", "posts", "posters", "last_post")))
+
+    def test_slug_lookup_is_cached(self):
+        url = reverse("group", kwargs={"slug": "cats"})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries
+                          if 'FROM "posts_group"' in query["sql"]],
+                         msg="Группа снова читается из базы!")
+        self.group.title = "Коты"
+        self.group.save()
+        self.assertContains(self.client.get(url), "Коты")
+        response = self.client.get(reverse("group",
+                                           kwargs={"slug": "missing"}))
+        self.assertEqual(response.status_code, 404)
+        # Группа создана в другом процессе: сигнал сюда не дошёл
+        with mock.patch("django.db.models.signals.post_save.send"):
+            Group.objects.create(title="Новая", slug="missing")
+        response = self.client.get(reverse("group",
+                                           kwargs={"slug": "missing"}))
+        self.assertEqual(response.status_code, 200,
+                         msg="Отсутствие группы закэшировано!")
+
+    @override_settings(GROUP_CACHE_MAX_ENTRIES=1)
+    def test_slug_cache_evicts_one_entry(self):
+        Group.objects.create(title="Собаки", slug="dogs")
+        groups.get_by_slug("cats")
+        groups.get_by_slug("dogs")
+        self.assertEqual(list(groups._groups), ["dogs"])
+        group = groups.get_by_slug("dogs")
+        group.title = "Изменена"
+        self.assertEqual(groups.get_by_slug("dogs").title, "Собаки",
+                         msg="Запросы получают общий объект группы!")
+
+
+class EdgeProxy:
+    """Заменитель кэширующего ESI-прокси для тестов: хранит ответы
+    с Cache-Control: public по пути и подставляет в них фрагменты,
+    запрошенные с куками конкретного пользователя.
+    """
+    INCLUDE = re.compile(r'<esi:include src="([^"]+)"/>')
+
+    def __init__(self):
+        self.shells = {}
+        self.hits = self.misses = 0
+
+    def get(self, client, path):
+        shell = self.shells.get(path)
+        if shell is None:
+            self.misses += 1
+            response = client.get(path)
+            shell = response.content.decode()
+            if "public" in response.get("Cache-Control", ""):
+                self.shells[path] = shell
+        else:
+            self.hits += 1
+        return self.INCLUDE.sub(
+            lambda match: client.get(html.unescape(match.group(1)))
+            .content.decode(), shell)
+
+
+@override_settings(CACHES=DUMMY_CACHE)
+class TestEdgeFragments(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="TestAuthor", password="Qwerty")
+        self.reader = User.objects.create_user(
+            username="TestReader", password="Qwerty")
+        self.post = Post.objects.create(text="Общий пост", author=self.author)
+        self.clients = {"anonymous": Client()}
+        for user in (self.author, self.reader):
+            self.clients[user.username] = Client()
+            self.clients[user.username].force_login(user)
+        self.paths = [reverse("index"), reverse("post", kwargs={
+            "username": self.author, "post_id": self.post.pk})]
+        self.edit = reverse("post_edit", kwargs={
+            "username": self.author, "post_id": self.post.pk})
+
+    @override_settings(EDGE_FRAGMENTS=True)
+    def test_shell_is_shared_and_fragments_personal(self):
+        proxy = EdgeProxy()
+        for _ in range(3):
+            for name, client in self.clients.items():
+                for path in self.paths:
+                    page = proxy.get(client, path)
+                    self.assertIn("Общий пост", page)
+                    self.assertEqual(f"Пользователь: {name}" in page,
+                                     name != "anonymous")
+                    self.assertEqual(self.edit in page,
+                                     name == "TestAuthor")
+        self.assertEqual(proxy.misses, len(self.paths))
+        self.assertGreaterEqual(proxy.hits / (proxy.hits + proxy.misses),
+                                0.85, msg="Страницы не кэшируются прокси!")
+        for shell in proxy.shells.values():
+            self.assertNotIn("TestReader", shell)
+            self.assertNotIn("csrfmiddlewaretoken", shell)
+        page = proxy.get(self.clients["TestReader"], self.paths[1])
+        self.assertIn("csrfmiddlewaretoken", page,
+                      msg="Форма комментария без CSRF-токена!")
+
+    def test_inline_mode_renders_same_fragments(self):
+        response = self.clients["TestAuthor"].get(self.paths[1])
+        self.assertNotIn("public", response.get("Cache-Control", ""))
+        self.assertNotContains(response, "<esi:include")
+        self.assertContains(response, "Пользователь: TestAuthor")
+        self.assertContains(response, self.edit)
+        self.assertContains(response, "csrfmiddlewaretoken")
+
+    def test_fragment_params_are_validated(self):
+        client = self.clients["TestReader"]
+        for name, query, status in (
+                ("pending_comments", {}, 400),
+                ("comment_form", {}, 400),
+                ("comment_form", {"author": "TestAuthor", "post": "x"}, 400),
+                ("post_actions", {"author": "Test Author", "post": 1}, 400),
+                ("menu", {"active": "admin"}, 400),
+                ("comment_form", {"author": "TestAuthor",
+                                  "post": self.post.pk}, 200)):
+            response = client.get(reverse("fragment", args=[name]), query)
+            self.assertEqual(response.status_code, status,
+                             msg=f"{name} {query}: неверный код ответа!")
+
+    def test_fragment_params_do_not_override_context(self):
+        response = self.clients["TestReader"].get(
+            reverse("fragment", args=["nav"]),
+            {"user": "x", "csrf_token": "x"})
+        self.assertContains(response, "Пользователь: TestReader")
+        response = self.clients["TestReader"].get(
+            reverse("fragment", args=["comment_form"]),
+            {"author": "TestAuthor", "post": self.post.pk, "csrf_token": "x"})
+        self.assertNotContains(response, 'value="x"')
+        self.assertContains(response, "csrfmiddlewaretoken")
+
+    def test_post_fragments_do_not_query_posts(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.clients["TestAuthor"].get(
+                reverse("fragment", args=["post_actions"]),
+                {"author": "TestAuthor", "post": self.post.pk})
+        self.assertContains(response, self.edit)
+        self.assertFalse([query for query in queries
+                          if "posts_post" in query["sql"]],
+                         msg="Фрагмент карточки читает пост из базы!")
+
+
+class TestNotifications(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="TestAuthor", password="Qwerty")
+        self.post = Post.objects.create(text="Пост", author=self.author)
+        self.clients = {}
+        for name in ("TestAuthor", "TestFirst", "TestSecond"):
+            client = Client()
+            client.force_login(User.objects.get_or_create(username=name)[0])
+            self.clients[name] = client
+        self.comment_url = reverse("add_comment", kwargs={
+            "username": "TestAuthor", "post_id": self.post.pk})
+
+    def comment(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            self.clients[name].post(self.comment_url, {"text": "Текст"})
+        return [query for query in queries
+                if "posts_notification" in query["sql"]
+                and not query["sql"].startswith("SELECT")]
+
+    def test_comments_are_coalesced(self):
+        for name in ("TestFirst", "TestSecond", "TestFirst"):
+            writes = self.comment(name)
+            self.assertEqual(len(writes), 1,
+                             msg="Больше одной записи на событие!")
+        self.assertEqual(self.comment("TestAuthor"), [])
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.count,
+                          notification.actor.username),
+                         (self.author, 3, "TestFirst"))
+        self.clients["TestFirst"].get(reverse(
+            "profile_follow", kwargs={"username": "TestAuthor"}))
+        self.clients["TestSecond"].get(reverse(
+            "profile_follow", kwargs={"username": "TestAuthor"}))
+        self.assertEqual(self.author.notifications.count(), 2)
+        response = self.clients["TestAuthor"].get(reverse("notifications"))
+        self.assertContains(response, "3 новых комментариев")
+        self.assertContains(response, "2 новых подписчиков")
+
+    def test_unread_counter_is_cached(self):
+        client = self.clients["TestAuthor"]
+        self.comment("TestFirst")
+        self.assertContains(client.get(reverse("index")),
+                            '<span class="badge badge-primary">1</span>')
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse("index"))
+        self.assertFalse([query for query in queries
+                          if "posts_notification" in query["sql"]],
+                         msg="Счётчик уведомлений читается из базы!")
+        self.clients["TestSecond"].get(reverse(
+            "profile_follow", kwargs={"username": "TestAuthor"}))
+        self.assertContains(client.get(reverse("index")),
+                            '<span class="badge badge-primary">2</span>')
+        client.get(reverse("notifications"))
+        self.assertNotContains(client.get(reverse("index")), "badge")
+        self.comment("TestSecond")
+        self.assertContains(client.get(reverse("index")),
+                            '<span class="badge badge-primary">1</span>',
+                            msg_prefix="Прочитанное уведомление дополнено!")
+
+    def test_only_shown_page_is_marked_read(self):
+        Notification.objects.bulk_create([
+            Notification(recipient=self.author, kind=Notification.COMMENT,
+                         post=Post.objects.create(text="Пост",
+                                                  author=self.author),
+                         updated=timezone.now())
+            for _ in range(21)])
+        self.clients["TestAuthor"].get(reverse("notifications"))
+        self.assertEqual(self.author.notifications.filter(
+            is_read=False).count(), 1,
+            msg="Прочитанными отмечены уведомления с других страниц!")
+
+
+@override_settings(POST_PREVIEW_LENGTH=20, COMMENTS_CHUNK_SIZE=2)
+class TestMemoryFootprint(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="TestUser")
+        self.group = Group.objects.create(title="Группа", slug="group")
+        self.text = "Начало поста. " + "Продолжение. " * 100 + "Конец поста"
+        self.post = Post.objects.create(text=self.text, author=self.user,
+                                        group=self.group)
+        self.short = Post.objects.create(text="Короткий пост",
+                                         author=self.user)
+        trending.record_post(self.post)
+
+    def test_lists_load_preview_instead_of_text(self):
+        follower = User.objects.create_user(username="TestFollower")
+        Follow.objects.create(user=follower, author=self.user)
+        self.client.force_login(follower)
+        for url in (reverse("index"), reverse("trending"),
+                    reverse("group", kwargs={"slug": self.group.slug}),
+                    reverse("profile", kwargs={"username": self.user}),
+                    reverse("follow_index")):
+            response = self.client.get(url)
+            post = next(post for post in response.context["page"]
+                        if post.pk == self.post.pk)
+            self.assertIn("text", post.get_deferred_fields(),
+                          msg=f"{url}: в ленту загружен полный текст!")
+            self.assertContains(response, "Начало поста.")
+            self.assertContains(response, "Читать дальше", count=1,
+                                msg_prefix=url)
+            self.assertNotContains(response, "Конец поста")
+
+    def test_post_page_shows_full_text_and_streams_comments(self):
+        Comment.objects.bulk_create(
+            [Comment(post=self.post, author=self.user, text=f"Мнение {i}")
+             for i in range(5)])
+        url = reverse("post", kwargs={"username": self.user,
+                                      "post_id": self.post.pk})
+        self.client.get(url)
+        with mock.patch("django.db.models.query.QuerySet.iterator",
+                        autospec=True,
+                        side_effect=lambda queryset, chunk_size: iter(
+                            list(queryset))) as iterator:
+            with self.assertNumQueries(9):
+                response = self.client.get(url)
+                response.content
+        self.assertEqual(iterator.call_args[1], {"chunk_size": 2},
+                         msg="Комментарии читаются не пачками!")
+        self.assertContains(response, "Конец поста")
+        self.assertNotContains(response, "Читать дальше")
+        for i in range(5):
+            self.assertContains(response, f"Мнение {i}")
+        self.assertContains(response, "Комментариев: 5")
+
+
+class TestStreaming(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="TestUser")
+        self.client.force_login(self.user)
+        self.group = Group.objects.create(title="Группа", slug="group")
+        self.post = Post.objects.create(text="Пост", author=self.user,
+                                        group=self.group)
+        Comment.objects.bulk_create(
+            [Comment(post=self.post, author=self.user, text=f"Мнение {i}")
+             for i in range(3)])
+        self.url = reverse("post", kwargs={"username": self.user,
+                                           "post_id": self.post.pk})
+
+    def test_shell_is_sent_before_lists(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertFalse([query for query in queries
+                          if 'FROM "posts_comment"' in query["sql"]
+                          and "COUNT" not in query["sql"]],
+                         msg="Комментарии читаются до отправки каркаса!")
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.context["post"], self.post)
+        self.assertTemplateUsed(response, "base.html")
+        chunks = iter(response.streaming_content)
+        head = next(chunks).decode()
+        self.assertIn("<title>", head)
+        self.assertIn("Пользователь: TestUser", head)
+        self.assertNotIn("Мнение", head,
+                         msg="Комментарии рендерятся до отправки каркаса!")
+        page = head + b"".join(chunks).decode()
+        self.assertLess(page.index("Мнение 2"), page.index("Мнение 0"))
+        self.assertIn("Комментариев: 3", page)
+        self.assertContains(response, "Мнение 1")
+        self.assertContains(response, "Мнение 1")
+
+    def test_lists_match_buffered_render(self):
+        for url in (self.url,
+                    reverse("group", kwargs={"slug": self.group.slug}),
+                    reverse("profile", kwargs={"username": self.user}),
+                    reverse("trending")):
+            streamed = self.client.get(url)
+            with override_settings(STREAMING_PAGES=False):
+                buffered = self.client.get(url)
+            self.assertTrue(streamed.streaming)
+            self.assertFalse(buffered.streaming)
+            csrf = re.compile(r'value="[^"]+"')
+            self.assertEqual(csrf.sub("", streamed.content.decode()),
+                             csrf.sub("", buffered.content.decode()),
+                             msg=f"{url}: потоковая страница отличается!")
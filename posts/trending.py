@@ -0,0 +1,94 @@
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from .models import CardQuerySet, Post, PostScore
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def weight_at(weight, when):
+    """Вклад события в счёт поста в логарифмической шкале.
+
+    Затухающий счёт sum(w * exp(-(now - t) / tau)) при любом now
+    упорядочивает посты так же, как sum(w * exp((t - EPOCH) / tau)),
+    поэтому хранится только логарифм второй суммы: старые события
+    не нужно пересчитывать, а новые просто добавляются к счёту.
+    """
+    age = (when - EPOCH).total_seconds()
+    return math.log(weight) + age / settings.TRENDING_DECAY
+
+
+def _log_add(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def bump(post_ids, weight, when=None):
+    """Добавляет событие с весом weight к счёту каждого поста."""
+    post_ids = set(post_ids)
+    if not post_ids:
+        return
+    now = timezone.now()
+    delta = weight_at(weight, when or now)
+    with transaction.atomic():
+        scores = PostScore.objects.select_for_update().in_bulk(post_ids)
+        for score in scores.values():
+            score.score = _log_add(score.score, delta)
+            score.updated = now
+        PostScore.objects.bulk_update(scores.values(), ["score", "updated"])
+        PostScore.objects.bulk_create(
+            [PostScore(post_id=post_id, score=delta)
+             for post_id in post_ids - set(scores)], ignore_conflicts=True)
+
+
+def record_post(post):
+    bump([post.pk], settings.TRENDING_WEIGHTS["post"], post.pub_date)
+
+
+def record_comments(post_ids):
+    for post_id in post_ids:
+        bump([post_id], settings.TRENDING_WEIGHTS["comment"])
+
+
+def record_follows(author_ids):
+    """Подписка на автора поднимает его последние посты.
+
+    Последние посты всех авторов выбираются одним запросом с оконной
+    функцией, а не отдельным запросом на каждого автора.
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return
+    table = Post._meta.db_table
+    placeholders = ", ".join(["%s"] * len(author_ids))
+    recent = Post.objects.filter(pk__in=RawSQL(
+        f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        f"PARTITION BY author_id ORDER BY pub_date DESC) AS position "
+        f"FROM {table} WHERE author_id IN ({placeholders})) AS ranked "
+        f"WHERE position <= %s",
+        [*author_ids, settings.TRENDING_FOLLOW_POSTS]))
+    bump(recent.values_list("pk", flat=True),
+         settings.TRENDING_WEIGHTS["follow"])
+
+
+def top(limit=None):
+    """Самые обсуждаемые посты: чтение идёт по индексу на score и не
+    зависит от размера таблицы.
+    """
+    scores = PostScore.objects.filter(post__is_deleted=False).select_related(
+        "post__author", "post__group").only(
+        "post", *(f"post__{name}" for name in CardQuerySet.CARD_FIELDS)
+    ).annotate(preview=Substr("post__text", 1,
+                              settings.POST_PREVIEW_LENGTH + 1)
+               ).order_by("-score")
+    posts = []
+    for score in scores[:limit or settings.TRENDING_SIZE]:
+        score.post.preview = score.preview
+        posts.append(score.post)
+    return posts
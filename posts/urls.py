@@ -4,7 +4,12 @@ from . import views
 
 urlpatterns = [
     path("follow/", views.follow_index, name="follow_index"),
+    path("follow/batch/", views.follow_batch, name="follow_batch"),
     path("", views.index, name="index"),
+    path("trending/", views.trending_index, name="trending"),
+    path("groups/", views.group_index, name="groups"),
+    path("notifications/", views.notification_inbox, name="notifications"),
+    path("fragments/<slug:name>/", views.fragment, name="fragment"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
     path("new/", views.new_post, name="new_post"),
     path("<username>/<int:post_id>/comment/",
@@ -17,4 +22,6 @@ urlpatterns = [
          name="profile_follow"),
     path("<str:username>/unfollow/",
          views.profile_unfollow, name="profile_unfollow"),
+    path("<str:username>/followers/", views.followers, name="followers"),
+    path("<str:username>/following/", views.following, name="following"),
 ]
@@ -1,40 +1,86 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
 
+from yatube.ratelimit import ratelimit
+
+from . import (events, fragments, graph, groups, jobs, notifications,
+               partitions, streaming, trending, writebehind)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import ArchivedPost, Follow, Group, Post, User
+from .paginators import ChainedSequence, CountedPaginator
 
 
+@fragments.shared_page
 def index(request):
-    post_list = Post.objects.order_by("-pub_date").all()
+    post_list = Post.objects.cards().order_by("-pub_date")
+    if settings.POST_PARTITIONS:
+        post_list = partitions.PartitionedSequence(post_list,
+                                                   partitions.catalog())
     paginator = Paginator(post_list, 10)
     page_number = request.GET.get("page")
     page = paginator.get_page(page_number)
-    return render(request, "index.html", {"page": page, "paginator": paginator,
-                                          "cache_timeout":
-                                          settings.CACHE_TIME})
+    return render(request, "index.html", {
+        "page": page, "paginator": paginator,
+        "cache_timeout": settings.CACHE_TIME})
+
+
+@fragments.shared_page
+def trending_index(request):
+    paginator = Paginator(trending.top(), 10)
+    page_number = request.GET.get("page")
+    page = paginator.get_page(page_number)
+    return streaming.render(request, "trending.html", {
+        "page": page, "paginator": paginator})
+
+
+def group_index(request):
+    group_list = Group.objects.select_related("stats").order_by(
+        F("stats__last_post").desc(nulls_last=True), "title")
+    paginator = Paginator(group_list, 20)
+    page_number = request.GET.get("page")
+    page = paginator.get_page(page_number)
+    return render(request, "groups.html", {"page": page,
+                                           "paginator": paginator})
 
 
+@fragments.shared_page
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.group_posts.order_by("-pub_date")
+    group = groups.get_by_slug(slug)
+    if group is None:
+        raise Http404
+    post_list = ChainedSequence(
+        group.group_posts.cards().order_by("-pub_date"),
+        group.archived_posts.cards().order_by("-pub_date"))
     paginator = Paginator(post_list, 10)
     page_number = request.GET.get("page")
     page = paginator.get_page(page_number)
-    return render(request, "group.html", {"group": group, "page": page,
-                                          "paginator": paginator})
+    return streaming.render(request, "group.html", {
+        "group": group, "page": page, "paginator": paginator})
 
 
 @login_required
+@ratelimit("new_post")
 def new_post(request):
     if request.method == "POST":
         form = PostForm(request.POST)
         if form.is_valid():
+            if writebehind.enabled():
+                writebehind.enqueue_post(request.user, form)
+                return redirect("index")
             new_post = form.save(commit=False)
             new_post.author = request.user
             new_post.save()
+            trending.record_post(new_post)
+            groups.add_posts(groups.rows_of([new_post]))
+            events.post_created(new_post)
             return redirect("index")
     form = PostForm()
     return render(request, "new_post.html", {"form": form})
@@ -42,24 +88,36 @@ def new_post(request):
 
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts_author = author.author_posts.order_by("-pub_date")
+    posts_author = ChainedSequence(
+        author.author_posts.cards().order_by("-pub_date"),
+        author.archived_posts.cards().order_by("-pub_date"))
     paginator = Paginator(posts_author, 10)
     page_number = request.GET.get("page")
     page = paginator.get_page(page_number)
-    following = author.following.filter(user=request.user.id).exists()
-    return render(request, "profile.html", {"author": author, "page": page,
-                                            "paginator": paginator,
-                                            "following": following})
+    following = graph.is_following(request.user.id, author.pk)
+    return streaming.render(request, "profile.html", {
+        "author": author, "page": page, "paginator": paginator,
+        "following": following,
+        "pending_posts": (writebehind.pending_posts(request.user)
+                          if request.user == author else []),
+        "followers_count": graph.followers_count(author.pk),
+        "following_count": graph.following_count(author.pk),
+        "mutual": following and graph.is_following(author.pk,
+                                                   request.user.id)})
 
 
+@fragments.shared_page
 def post_view(request, username, post_id):
     author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, author=author, pk=post_id)
+    post = (Post.objects.filter(author=author, pk=post_id).first()
+            or get_object_or_404(ArchivedPost, author=author, pk=post_id))
     form = CommentForm()
-    comments = post.comments_post.order_by("-created")
-    return render(request, "post.html", {"author": author, "post": post,
-                                         "form": form,
-                                         "comments": comments})
+    comments = post.comments_post.select_related("author").only(
+        "post", "text", "created", "author", "author__username"
+    ).order_by("-created")
+    return streaming.render(request, "post.html", {
+        "author": author, "post": post, "form": form,
+        "comments": comments})
 
 
 @login_required
@@ -68,17 +126,38 @@ def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author=author, pk=post_id)
     if request.user != author:
         return redirect("post", username=post.author, post_id=post_id)
+    old_rows = groups.rows_of([post])
     form = PostForm(request.POST or None,
                     files=request.FILES or None, instance=post)
     if request.method == "POST":
         if form.is_valid():
             post = form.save(commit=False)
             post.save()
+            if "group" in form.changed_data:
+                groups.remove_posts(old_rows)
+                groups.add_posts(groups.rows_of([post]))
+            if "image" in form.changed_data and post.image:
+                jobs.warm_thumbnail.delay(post.pk)
             return redirect("post", username=post.author, post_id=post.id)
     return render(request, "new_post.html", {"form": form, "post": post,
                                              "edit": True})
 
 
+@never_cache
+def fragment(request, name):
+    """Персональный фрагмент страницы для <esi:include>
+    (см. posts.fragments и тег {% fragment %}).
+    """
+    if name not in fragments.FRAGMENTS:
+        raise Http404
+    try:
+        params = fragments.parse_params(name, request.GET)
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest()
+    return render(request, f"fragments/{name}.html", fragments.context(
+        name, request, params))
+
+
 def page_not_found(request, exception):
     return render(request, "misc/404.html", {"path": request.path}, status=404)
 
@@ -88,16 +167,25 @@ def server_error(request):
 
 
 @login_required
+@ratelimit("add_comment")
 def add_comment(request, username, post_id):
     author = get_object_or_404(User, username=username)
     post = get_object_or_404(Post, pk=post_id)
     if request.method == "POST":
         form = CommentForm(request.POST)
         if form.is_valid():
+            if writebehind.enabled():
+                writebehind.enqueue_comment(request.user, post, form)
+                return redirect("post", username=post.author,
+                                post_id=post.id)
             new_comment = form.save(commit=False)
             new_comment.author = request.user
             new_comment.post = post
             new_comment.save()
+            trending.record_comments([post.pk])
+            notifications.comments_added([new_comment],
+                                         {post.pk: post.author_id})
+            events.comment_added(post.pk)
             return redirect("post", username=post.author, post_id=post.id)
     form = CommentForm()
     return redirect("post", username=author.username, post_id=post.id)
@@ -105,29 +193,93 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    following = Follow.objects.all().values("author")
-    post_list = Post.objects.filter(author__in=following).order_by("-pub_date")
+    following = Follow.objects.filter(user=request.user).values("author")
+    post_list = Post.objects.cards().filter(
+        author__in=following).order_by("-pub_date")
     paginator = Paginator(post_list, 10)
     page_number = request.GET.get("page")
     page = paginator.get_page(page_number)
-    return render(request, "follow.html", {"page": page,
-                                           "paginator": paginator})
+    return streaming.render(request, "follow.html", {
+        "page": page, "paginator": paginator,
+        "suggestions": graph.suggestions(request.user.id)})
 
 
 @login_required
+@ratelimit("follow", methods=("GET", "POST"))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(
-        user=request.user, author=author).exists()
-    if request.user != author and follow is False:
-        follows = Follow.objects.create(user=request.user, author=author)
-        follows.save()
+    followed = graph.follow(request.user.pk, [author.pk])
+    trending.record_follows(followed)
+    notifications.followed(request.user.pk, followed)
     return redirect("follow_index")
 
 
 @login_required
+@ratelimit("follow", methods=("GET", "POST"))
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    following = Follow.objects.filter(user=request.user, author=author)
-    following.delete()
+    graph.unfollow(request.user.pk, [author.pk])
     return redirect("follow_index")
+
+
+@login_required
+@require_POST
+@ratelimit("follow")
+def follow_batch(request):
+    follow_ids = set(User.objects.filter(
+        username__in=request.POST.getlist("follow")
+    ).values_list("pk", flat=True))
+    slug = request.POST.get("group")
+    if slug:
+        group = get_object_or_404(Group, slug=slug)
+        follow_ids.update(group.group_posts.values_list(
+            "author_id", flat=True).distinct())
+    unfollow_ids = set(User.objects.filter(
+        username__in=request.POST.getlist("unfollow")
+    ).values_list("pk", flat=True))
+    try:
+        with transaction.atomic():
+            followed = graph.follow(request.user.pk, follow_ids)
+            unfollowed = graph.unfollow(request.user.pk, unfollow_ids)
+            trending.record_follows(followed)
+            notifications.followed(request.user.pk, followed)
+    except DatabaseError:
+        graph.forget([(request.user.pk, author_id)
+                      for author_id in follow_ids | unfollow_ids])
+        raise
+    return JsonResponse({"followed": followed, "unfollowed": unfollowed})
+
+
+@login_required
+def notification_inbox(request):
+    shown = timezone.now()
+    paginator = Paginator(notifications.inbox(request.user), 20)
+    page_number = request.GET.get("page")
+    page = paginator.get_page(page_number)
+    response = render(request, "notifications.html", {"page": page,
+                                                      "paginator": paginator})
+    notifications.mark_read(request.user,
+                            [notification.pk for notification in page],
+                            shown)
+    return response
+
+
+def _follow_list(request, username, users, count, title):
+    author = get_object_or_404(User, username=username)
+    paginator = CountedPaginator(users(author), 20, count(author.pk))
+    page_number = request.GET.get("page")
+    page = paginator.get_page(page_number)
+    return render(request, "follow_list.html", {"author": author,
+                                                "page": page,
+                                                "paginator": paginator,
+                                                "title": title})
+
+
+def followers(request, username):
+    return _follow_list(request, username, graph.followers,
+                        graph.followers_count, "Подписчики")
+
+
+def following(request, username):
+    return _follow_list(request, username, graph.following,
+                        graph.following_count, "Подписки")
@@ -0,0 +1,329 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from . import events, groups, notifications, trending
+from .models import AppliedWrite, Comment, Group, Post
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    author_id INTEGER NOT NULL,
+    post_id INTEGER,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS dead (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    author_id INTEGER NOT NULL,
+    post_id INTEGER,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT NOT NULL,
+    failed REAL NOT NULL
+)
+"""
+
+POST = "post"
+COMMENT = "comment"
+
+
+class WriteQueue:
+    """Очередь отложенных записей в отдельном файле SQLite.
+
+    Запись попадает в очередь одной вставкой в журнал WAL и не
+    конкурирует за блокировку основной базы. Перед записью в базу
+    пачка помечается «арендой» воркера; если воркер упал, аренда
+    истекает через lease секунд и пачку забирает другой воркер.
+
+    Запись, которую не удалось перенести, остаётся арендованной до
+    истечения аренды (так повтор откладывается на lease секунд), а
+    после max_attempts неудач переносится в таблицу dead.
+    """
+
+    def __init__(self, path, lease=60, max_attempts=5):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            columns = {row[1] for row in connection.execute(
+                "PRAGMA table_info(entries)")}
+            if "attempts" not in columns:
+                connection.execute("ALTER TABLE entries ADD COLUMN"
+                                   " attempts INTEGER NOT NULL DEFAULT 0")
+            self._local.connection = connection
+        return connection
+
+    def append(self, kind, author_id, payload, post_id=None):
+        """Добавляет запись; ключ key в payload защищает от повторного
+        переноса (см. AppliedWrite).
+        """
+        payload = dict(payload, key=uuid.uuid4().hex)
+        self.connection.execute(
+            "INSERT INTO entries (kind, author_id, post_id, payload, created)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (kind, author_id, post_id, json.dumps(payload), time.time()))
+
+    def pending(self, kind, author_id, post_id=None):
+        query = ("SELECT id, payload, created FROM entries"
+                 " WHERE kind = ? AND author_id = ?")
+        params = [kind, author_id]
+        if post_id is not None:
+            query += " AND post_id = ?"
+            params.append(post_id)
+        rows = self.connection.execute(query + " ORDER BY id DESC", params)
+        return [(pk, json.loads(payload), created)
+                for pk, payload, created in rows]
+
+    def claim(self, limit):
+        token = uuid.uuid4().hex
+        now = time.time()
+        self.connection.execute(
+            "UPDATE entries SET claimed_by = ?, claimed_at = ? WHERE id IN ("
+            " SELECT id FROM entries WHERE claimed_at IS NULL"
+            " OR claimed_at < ? ORDER BY id LIMIT ?)",
+            (token, now, now - self.lease, limit))
+        rows = self.connection.execute(
+            "SELECT id, kind, author_id, post_id, payload FROM entries"
+            " WHERE claimed_by = ? ORDER BY id", (token,))
+        return [(pk, kind, author_id, post_id, json.loads(payload))
+                for pk, kind, author_id, post_id, payload in rows]
+
+    def release(self, ids):
+        self._execute_many(
+            "UPDATE entries SET claimed_by = NULL, claimed_at = NULL"
+            " WHERE id IN ({})", ids)
+
+    def remove(self, ids):
+        self._execute_many("DELETE FROM entries WHERE id IN ({})", ids)
+
+    def fail(self, entry_id, error):
+        """Учитывает неудачную попытку; запись, исчерпавшая попытки,
+        переносится в dead.
+        """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE entries SET attempts = attempts + 1 WHERE id = ?",
+                (entry_id,))
+            connection.execute(
+                "INSERT INTO dead (id, kind, author_id, post_id, payload,"
+                " created, attempts, error, failed)"
+                " SELECT id, kind, author_id, post_id, payload, created,"
+                " attempts, ?, ? FROM entries WHERE id = ? AND attempts >= ?",
+                (error, time.time(), entry_id, self.max_attempts))
+            connection.execute(
+                "DELETE FROM entries WHERE id = ? AND attempts >= ?",
+                (entry_id, self.max_attempts))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def dead(self):
+        return self.connection.execute(
+            "SELECT id, kind, author_id, error FROM dead ORDER BY id"
+        ).fetchall()
+
+    def _execute_many(self, query, ids):
+        ids = list(ids)
+        if ids:
+            self.connection.execute(
+                query.format(", ".join("?" * len(ids))), ids)
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+_worker = None
+
+
+def enabled():
+    return settings.WRITE_BEHIND
+
+
+def get_queue():
+    path = settings.WRITE_BEHIND_QUEUE
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = WriteQueue(path, settings.WRITE_BEHIND_LEASE,
+                                       settings.WRITE_BEHIND_MAX_ATTEMPTS)
+        return _queues[path]
+
+
+def enqueue_post(author, form):
+    group = form.cleaned_data.get("group")
+    get_queue().append(POST, author.pk, {
+        "text": form.cleaned_data["text"],
+        "group": group.pk if group else None,
+    })
+    ensure_worker()
+
+
+def enqueue_comment(author, post, form):
+    get_queue().append(COMMENT, author.pk, {
+        "text": form.cleaned_data["text"],
+    }, post_id=post.pk)
+    ensure_worker()
+
+
+def pending_posts(author):
+    """Ещё не записанные посты автора: так автор сразу видит свои
+    записи, хотя в базу они попадут только после сброса очереди.
+    """
+    if not enabled() or not author.is_authenticated:
+        return []
+    entries = get_queue().pending(POST, author.pk)
+    groups = Group.objects.in_bulk(
+        {payload["group"] for _, payload, _ in entries} - {None})
+    return [Post(text=payload["text"], author=author,
+                 group=groups.get(payload["group"]))
+            for _, payload, _ in entries]
+
+
+def pending_comments(post, author):
+    if not enabled() or not author.is_authenticated:
+        return []
+    return [Comment(text=payload["text"], author=author, post=post)
+            for _, payload, _ in
+            get_queue().pending(COMMENT, author.pk, post.pk)]
+
+
+def _apply(entries):
+    """Переносит записи в базу одной транзакцией и возвращает созданные
+    посты и комментарии. Записи, ключ которых уже есть в AppliedWrite,
+    пропускаются: они перенесены до падения процесса.
+    """
+    keys = [payload.get("key") for *_, payload in entries]
+    applied = set(AppliedWrite.objects.filter(
+        key__in=[key for key in keys if key]).values_list("key", flat=True))
+    entries = [entry for entry, key in zip(entries, keys)
+               if key not in applied]
+    posts, comments = [], []
+    post_ids = {post_id for _, kind, _, post_id, _ in entries
+                if kind == COMMENT}
+    post_authors = dict(Post.objects.filter(
+        pk__in=post_ids).values_list("pk", "author_id"))
+    for _, kind, author_id, post_id, payload in entries:
+        if kind == POST:
+            posts.append(Post(text=payload["text"], author_id=author_id,
+                              group_id=payload["group"]))
+        elif post_id in post_authors:
+            comments.append(Comment(text=payload["text"],
+                                    author_id=author_id, post_id=post_id))
+    with transaction.atomic():
+        # По одному, а не bulk_create: на SQLite bulk_create не
+        # заполняет pk, а он нужен событию post_created
+        for post in posts:
+            post.save()
+        Comment.objects.bulk_create(comments)
+        groups.add_posts(groups.rows_of(posts))
+        AppliedWrite.objects.bulk_create(
+            [AppliedWrite(key=payload["key"]) for *_, payload in entries
+             if payload.get("key")])
+    return posts, comments, post_authors
+
+
+def flush(queue=None, limit=None):
+    """Переносит пачку записей из очереди в базу одной транзакцией.
+
+    Записи удаляются из очереди только после фиксации транзакции,
+    поэтому при падении процесса ничего не теряется: пачка останется
+    в очереди и будет перенесена повторно после истечения аренды, а
+    уже перенесённые записи AppliedWrite не даст записать дважды.
+    Если пачка не записалась, её записи переносятся по одной, чтобы
+    одна плохая запись (например, автор удалён) не держала очередь.
+    Возвращает число забранных из очереди записей.
+    """
+    queue = queue or get_queue()
+    entries = queue.claim(limit or settings.WRITE_BEHIND_BATCH)
+    if not entries:
+        return 0
+    try:
+        batches = [(entries, _apply(entries))]
+    except Exception:
+        batches = []
+        for entry in entries:
+            try:
+                batches.append(([entry], _apply([entry])))
+            except Exception as error:
+                logger.exception("Write-behind entry %s failed", entry[0])
+                queue.fail(entry[0], repr(error))
+    for batch, (posts, comments, post_authors) in batches:
+        queue.remove(pk for pk, *_ in batch)
+        AppliedWrite.objects.filter(key__in=[
+            payload.get("key") for *_, payload in batch]).delete()
+        for post in posts:
+            trending.record_post(post)
+        trending.record_comments(comment.post_id for comment in comments)
+        notifications.comments_added(comments, post_authors)
+        for post in posts:
+            events.post_created(post)
+        for post_id in {comment.post_id for comment in comments}:
+            events.comment_added(post_id)
+    return len(entries)
+
+
+def drain(queue=None):
+    total = 0
+    while True:
+        flushed = flush(queue)
+        if not flushed:
+            return total
+        total += flushed
+
+
+class Worker(threading.Thread):
+    daemon = True
+
+    def __init__(self, interval):
+        super().__init__(name="write-behind")
+        self.interval = interval
+        self.wake = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                drain()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+
+def ensure_worker():
+    global _worker
+    if not settings.WRITE_BEHIND_WORKER:
+        return
+    with _queues_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = Worker(settings.WRITE_BEHIND_INTERVAL)
+            _worker.start()
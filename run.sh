@@ -5,4 +5,4 @@ cp pytest.ini /app/pytest.ini
 cp -a tests/ /app/tests
 
 cd /app
-pytest --tb=line 1>&2
+pytest --tb=line -n auto 1>&2
@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from .models import Job, Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("pk", "name", "status", "priority", "attempts",
+                    "run_at", "finished")
+    list_filter = ("status", "name")
+    search_fields = ("=name",)
+    empty_value_display = "-пусто-"
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "description", "name", "status", "progress_display",
+                    "created", "finished")
+    list_filter = ("status", "name")
+    readonly_fields = ("name", "payload", "status", "total", "done",
+                       "created", "finished")
+
+    def progress_display(self, job):
+        return f"{job.progress}% ({job.done} из {job.total})"
+    progress_display.short_description = "Прогресс"
+
+
+admin.site.register(Task, TaskAdmin)
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from .queue import task
+
+
+@task(name="tasks.send_email", priority=10, max_attempts=5)
+def send_email(subject, body, from_email, to, cc, bcc, reply_to,
+               alternatives):
+    message = EmailMultiAlternatives(
+        subject, body, from_email, to, cc=cc, bcc=bcc, reply_to=reply_to,
+        alternatives=[tuple(item) for item in alternatives],
+        connection=get_connection(settings.TASKS_EMAIL_BACKEND))
+    message.send()
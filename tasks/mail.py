@@ -0,0 +1,17 @@
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .jobs import send_email
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, который не отправляет письма сам, а ставит их
+    в очередь задач. Отправкой занимается TASKS_EMAIL_BACKEND в воркере.
+    """
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            send_email.delay(
+                message.subject, message.body, message.from_email,
+                message.to, message.cc, message.bcc, message.reply_to,
+                getattr(message, "alternatives", []))
+        return len(email_messages)
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks import queue
+
+
+class Command(BaseCommand):
+    help = "Запускает воркер фоновых задач"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int,
+                            default=settings.TASKS_WORKERS)
+        parser.add_argument("--pool", choices=("thread", "process"),
+                            default="thread")
+        parser.add_argument("--poll", type=float,
+                            default=settings.TASKS_POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true",
+                            help="выполнить готовые задачи и выйти")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        if options["pool"] == "process":
+            connections.close_all()
+            pool = ProcessPoolExecutor(workers)
+        else:
+            pool = ThreadPoolExecutor(workers)
+        running = set()
+        try:
+            with pool:
+                while True:
+                    free = workers - len(running)
+                    if free:
+                        running.update(pool.submit(queue.execute, pk)
+                                       for pk in queue.claim(free))
+                    if not running:
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll"])
+                        continue
+                    finished, running = wait(running, options["poll"],
+                                             FIRST_COMPLETED)
+                    for future in finished:
+                        queue.metrics.record(*future.result())
+        except KeyboardInterrupt:
+            pass
+        for row in queue.metrics.report():
+            self.stdout.write(
+                "{name}: done={done} retried={retried} failed={failed} "
+                "time={seconds}s".format(**row))
@@ -0,0 +1,59 @@
+from django.db import models
+
+
+class Task(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(max_length=200)
+    payload = models.TextField(default="{}")
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField("Запуск не раньше")
+    created = models.DateTimeField("Дата создания", auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "-priority", "run_at"],
+                         name="task_ready_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.pk} {self.name}"
+
+
+class Job(models.Model):
+    """Пакетная задача: обрабатывается пачками по одной задаче Task
+    на пачку, здесь хранятся её аргументы и прогресс.
+    """
+    name = models.CharField(max_length=200)
+    payload = models.TextField(default="{}")
+    description = models.CharField("Описание", max_length=200, blank=True)
+    status = models.CharField(max_length=10, choices=Task.STATUSES,
+                              default=Task.QUEUED)
+    total = models.PositiveIntegerField("Всего", default=0)
+    done = models.PositiveIntegerField("Обработано", default=0)
+    created = models.DateTimeField("Дата создания", auto_now_add=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.pk} {self.description or self.name}"
+
+    @property
+    def progress(self):
+        if self.status == Task.DONE or not self.total:
+            return 100 if self.status == Task.DONE else 0
+        return min(99, self.done * 100 // self.total)
@@ -0,0 +1,220 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class Metrics:
+    """Счётчики выполнения задач в пределах процесса воркера."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def record(self, name, outcome, seconds):
+        with self._lock:
+            self.counts[name, outcome] += 1
+            self.seconds[name] += seconds
+
+    def report(self):
+        with self._lock:
+            names = sorted({name for name, _ in self.counts})
+            return [
+                {"name": name,
+                 "done": self.counts[name, Task.DONE],
+                 "retried": self.counts[name, Task.QUEUED],
+                 "failed": self.counts[name, Task.FAILED],
+                 "seconds": round(self.seconds[name], 3)}
+                for name in names
+            ]
+
+
+metrics = Metrics()
+
+
+class TaskFunction:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self.name, args, kwargs)
+
+    def schedule(self, args=(), kwargs=None, priority=None, countdown=0):
+        return enqueue(self.name, args, kwargs, priority, countdown)
+
+
+def task(name=None, priority=0, max_attempts=3):
+    """Регистрирует функцию как задачу: вызвать её в фоне можно
+    через func.delay(...). Аргументы должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        registry[task_name] = TaskFunction(func, task_name, priority,
+                                           max_attempts)
+        return registry[task_name]
+    return decorator
+
+
+class BatchTaskFunction:
+    def __init__(self, func, name, total):
+        self.func = func
+        self.name = name
+        self.total = total
+
+    def start(self, *args, description="", **kwargs):
+        """Создаёт Job и ставит в очередь обработку первой пачки."""
+        job = Job.objects.create(
+            name=self.name, description=description,
+            payload=json.dumps({"args": list(args), "kwargs": kwargs}),
+            total=self.total(*args, **kwargs) if self.total else 0)
+        enqueue(self.name, [job.pk])
+        if settings.TASKS_ALWAYS_EAGER:
+            job.refresh_from_db()
+        return job
+
+    def step(self, job_id):
+        """Обрабатывает одну пачку и ставит в очередь следующую.
+
+        Каждая пачка выполняется отдельной задачей в своей короткой
+        транзакции, поэтому база не блокируется надолго, а упавшая
+        пачка повторяется, не откатывая уже сделанное.
+        """
+        job = Job.objects.get(pk=job_id)
+        payload = json.loads(job.payload)
+        Job.objects.filter(pk=job_id, status=Task.QUEUED).update(
+            status=Task.RUNNING)
+        while True:
+            processed = self.func(*payload["args"],
+                                  limit=settings.TASKS_CHUNK_SIZE,
+                                  **payload["kwargs"])
+            if not processed:
+                Job.objects.filter(pk=job_id).update(
+                    status=Task.DONE, finished=timezone.now())
+                return
+            Job.objects.filter(pk=job_id).update(done=F("done") + processed)
+            if not settings.TASKS_ALWAYS_EAGER:
+                enqueue(self.name, [job_id])
+                return
+
+
+def batch_task(name, total=None, priority=-5):
+    """Регистрирует пакетную задачу для больших объёмов данных.
+
+    Функция получает аргументы из start() и limit, обрабатывает не
+    больше limit объектов и возвращает их число; 0 означает, что работа
+    закончена. total(*args, **kwargs) оценивает объём работы для
+    отображения прогресса.
+    """
+    def decorator(func):
+        batch = BatchTaskFunction(func, name, total)
+        registry[name] = TaskFunction(batch.step, name, priority,
+                                      max_attempts=5)
+        return batch
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, priority=None, countdown=0):
+    func = registry[name]
+    payload = {"args": list(args), "kwargs": kwargs or {}}
+    if settings.TASKS_ALWAYS_EAGER:
+        return func(*payload["args"], **payload["kwargs"])
+    return Task.objects.create(
+        name=name, payload=json.dumps(payload),
+        priority=func.priority if priority is None else priority,
+        max_attempts=func.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=countdown))
+
+
+def claim(limit):
+    """Забирает до limit готовых задач, начиная с самых приоритетных.
+
+    Задача переводится в RUNNING условным UPDATE, поэтому одну и ту же
+    задачу не смогут выполнить два воркера одновременно. Задачи,
+    зависшие в RUNNING дольше TASKS_TIMEOUT (воркер упал), снова
+    попадают в очередь.
+    """
+    now = timezone.now()
+    Task.objects.filter(
+        status=Task.RUNNING,
+        started__lt=now - timedelta(seconds=settings.TASKS_TIMEOUT),
+    ).update(status=Task.QUEUED)
+    candidates = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now,
+    ).order_by("-priority", "run_at").values_list("pk", flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        if Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+                status=Task.RUNNING, started=now):
+            claimed.append(pk)
+    return claimed
+
+
+def retry_delay(attempts):
+    return settings.TASKS_RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+def execute(pk):
+    """Выполняет одну задачу; при ошибке ставит её на повтор
+    с экспоненциальной задержкой или помечает как упавшую.
+    Возвращает (имя, статус, длительность) для учёта в metrics.
+    """
+    close_old_connections()
+    task = Task.objects.get(pk=pk)
+    payload = json.loads(task.payload)
+    started = time.monotonic()
+    task.attempts += 1
+    try:
+        with transaction.atomic():
+            registry[task.name](*payload["args"], **payload["kwargs"])
+    except Exception:
+        task.last_error = traceback.format_exc()
+        if task.attempts < task.max_attempts:
+            task.status = Task.QUEUED
+            task.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(task.attempts))
+        else:
+            task.status = Task.FAILED
+            logger.exception("Task %s failed", task)
+    else:
+        task.status = Task.DONE
+    task.finished = timezone.now()
+    task.save(update_fields=["attempts", "status", "run_at", "finished",
+                             "last_error"])
+    close_old_connections()
+    return task.name, task.status, time.monotonic() - started
+
+
+def run_pending(limit=None):
+    """Синхронно выполняет все готовые задачи (для тестов и cron)."""
+    done = 0
+    while True:
+        batch = claim(limit or settings.TASKS_BATCH)
+        if not batch:
+            return done
+        for pk in batch:
+            metrics.record(*execute(pk))
+        done += len(batch)
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Task
+
+calls = []
+
+
+@queue.task(name="tasks.tests.record")
+def record(value):
+    calls.append(value)
+
+
+@queue.task(name="tasks.tests.flaky", max_attempts=2)
+def flaky():
+    raise RuntimeError("Ошибка")
+
+
+class TestTasks(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_and_run(self):
+        record.delay("a")
+        self.assertEqual(calls, [], msg="Задача выполнилась синхронно!")
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(calls, ["a"])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode(self):
+        record.delay("b")
+        self.assertEqual(calls, ["b"], msg="В тестовом режиме задача "
+                         "должна выполняться сразу!")
+        self.assertFalse(Task.objects.exists())
+
+    def test_priority_order(self):
+        record.schedule(["low"], priority=-1)
+        record.schedule(["high"], priority=5)
+        record.schedule(["normal"])
+        queue.run_pending(limit=1)
+        self.assertEqual(calls, ["high", "normal", "low"],
+                         msg="Задачи выполняются не по приоритету!")
+
+    @override_settings(TASKS_RETRY_BACKOFF=10)
+    def test_retry_with_backoff(self):
+        task = flaky.delay()
+        queue.run_pending()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertGreater(task.run_at,
+                           timezone.now() + timedelta(seconds=5),
+                           msg="Повтор не отложен!")
+        self.assertIn("RuntimeError", task.last_error)
+        Task.objects.update(run_at=timezone.now())
+        queue.run_pending()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED,
+                         msg="Задача не помечена упавшей после попыток!")
+        self.assertEqual(task.attempts, 2)
+
+    def test_stale_running_task_is_requeued(self):
+        task = record.delay("c")
+        Task.objects.update(status=Task.RUNNING,
+                            started=timezone.now() - timedelta(days=1))
+        queue.run_pending()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+
+    @override_settings(
+        EMAIL_BACKEND="tasks.mail.QueuedEmailBackend",
+        TASKS_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_email_is_sent_by_worker(self):
+        mail.send_mail("Тема", "Текст", "from@yatube.ru", ["to@yatube.ru"])
+        self.assertEqual(len(mail.outbox), 0,
+                         msg="Письмо отправлено в запросе!")
+        queue.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Тема")
@@ -1,4 +1,50 @@
+import sqlite3
+
+import pytest
+from django.db import connections
+from django.test import TransactionTestCase
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database_snapshots(django_db_setup, django_db_blocker):
+    """Снимок тестовой базы сразу после миграций.
+
+    После теста с transaction=True база восстанавливается из снимка
+    через sqlite3 backup, а не очищается командой flush: flush удаляет
+    строки из каждой таблицы и заново создаёт contenttypes и права.
+    Для баз не в памяти SQLite остаётся обычный flush.
+    """
+    snapshots = {}
+    with django_db_blocker.unblock():
+        for alias in connections:
+            connection = connections[alias]
+            if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+                connection.ensure_connection()
+                snapshots[alias] = sqlite3.connect(':memory:')
+                connection.connection.backup(snapshots[alias])
+    flush = TransactionTestCase._fixture_teardown
+
+    def restore(test_case):
+        if set(test_case._databases_names(include_mirrors=False)) - set(snapshots):
+            return flush(test_case)
+        for alias in test_case._databases_names(include_mirrors=False):
+            connections[alias].ensure_connection()
+            database = connections[alias].connection
+            # Как и flush без reset_sequences, id не начинаются заново:
+            # иначе кэш по id из прошлого теста достался бы новым строкам
+            sequences = database.execute('SELECT name, seq FROM sqlite_sequence').fetchall()
+            snapshots[alias].backup(database)
+            database.execute('DELETE FROM sqlite_sequence')
+            database.executemany('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', sequences)
+            database.commit()
+
+    TransactionTestCase._fixture_teardown = restore
+    yield
+    TransactionTestCase._fixture_teardown = flush
+    for snapshot in snapshots.values():
+        snapshot.close()
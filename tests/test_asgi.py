@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from posts import events
+
+
+class Connection:
+
+    def __init__(self, path, query=b'', headers=(), method='GET', body=b''):
+        self.scope = {'type': 'http', 'method': method, 'path': path,
+                      'query_string': query, 'headers': list(headers)}
+        self.body = body
+        self.requested = False
+        self.sent = asyncio.Queue()
+        self.closed = asyncio.Event()
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': self.body}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        await self.sent.put(message)
+
+    async def next(self):
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+
+def cookie_header(client):
+    return b'cookie', '; '.join(
+        f'{name}={morsel.value}' for name, morsel in client.cookies.items()
+    ).encode()
+
+
+class TestServerSentEvents:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_is_pushed(self, user_client):
+        from yatube.asgi import application
+
+        async def scenario():
+            connection = Connection('/events/', b'feed=index')
+            task = asyncio.ensure_future(application(
+                connection.scope, connection.receive, connection.send))
+            start = await connection.next()
+            await connection.next()
+            await asyncio.get_event_loop().run_in_executor(
+                None, lambda: user_client.post('/new/', {'text': 'Живой пост'}))
+            event = await connection.next()
+            connection.closed.set()
+            await task
+            return start, event
+
+        start, event = asyncio.run(scenario())
+        assert start['status'] == 200
+        assert (b'content-type', b'text/event-stream') in start['headers'], \
+            'Проверьте, что /events/ отдаёт text/event-stream'
+        assert event['body'].startswith(b'event: post\n'), \
+            'Проверьте, что новый пост отправляется подписчикам ленты'
+        assert not len(events.bus), \
+            'Проверьте, что после отключения клиент отписывается от событий'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_requires_login(self, client):
+        from yatube.asgi import application
+
+        async def scenario():
+            connection = Connection('/events/', b'feed=follow')
+            await application(connection.scope, connection.receive,
+                              connection.send)
+            return await connection.next()
+
+        assert asyncio.run(scenario())['status'] == 403, \
+            'Проверьте, что лента подписок недоступна анониму'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_channels(self, user_client, django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        user_client.get(f'/{author.username}/follow/')
+        channels = events.channels_for({'feed': ['follow']},
+                                       dict([cookie_header(user_client)]))
+        assert channels == {f'author:{author.pk}'}, \
+            'Проверьте, что лента подписок слушает авторов из подписок'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_other_paths_are_served_by_django(self):
+        from yatube.asgi import application
+
+        async def scenario():
+            connection = Connection('/')
+            await application(connection.scope, connection.receive,
+                              connection.send)
+            messages = []
+            while not connection.sent.empty():
+                messages.append(connection.sent.get_nowait())
+            return messages
+
+        messages = asyncio.run(scenario())
+        assert messages[0]['status'] == 200
+        body = b''.join(message.get('body', b'') for message in messages)
+        assert 'Последние обновления' in body.decode(), \
+            'Проверьте, что обычные страницы отдаются через ASGI'
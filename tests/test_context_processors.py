@@ -0,0 +1,26 @@
+import datetime as dt
+from unittest import mock
+
+from yatube import context_processors
+
+
+class TestYearContextProcessor:
+
+    def test_year_is_current(self):
+        assert context_processors.year(None) == {'year': dt.datetime.now().year}, \
+            'Проверьте, что контекстный процессор `year` возвращает текущий год'
+
+    def test_year_is_computed_once_per_day(self):
+        context_processors.year(None)
+        with mock.patch.object(context_processors.dt, 'datetime') as datetime:
+            context_processors.year(None)
+        assert not datetime.now.called, \
+            'Проверьте, что год не вычисляется заново на каждый запрос'
+
+    def test_year_is_refreshed_next_day(self):
+        context_processors.year(None)
+        expires = context_processors._year['expires']
+        with mock.patch.object(context_processors.time, 'time', return_value=expires):
+            with mock.patch.object(context_processors.dt, 'datetime', wraps=dt.datetime) as datetime:
+                context_processors.year(None)
+        assert datetime.now.called, 'Проверьте, что год пересчитывается после полуночи'
@@ -0,0 +1,97 @@
+import time
+from unittest import mock
+
+import pytest
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from yatube import flatpages
+
+
+@pytest.fixture
+def flatpage():
+    page = FlatPage.objects.create(url='/about-author/', title='Об авторе', content='Текст об авторе')
+    page.sites.add(Site.objects.get_current())
+    return page
+
+
+class TestCachedFlatpages:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_is_cached(self, client, flatpage):
+        response = client.get('/about-author/')
+        assert response.status_code == 200, 'Страница `/about-author/` не найдена'
+        assert 'Текст об авторе' in response.content.decode()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/about-author/')
+        assert 'Текст об авторе' in response.content.decode()
+        assert not [query for query in queries if 'django_flatpage' in query['sql']], \
+            'Проверьте, что повторный показ страницы не обращается к базе'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_conditional_get(self, client, flatpage):
+        response = client.get('/about-author/')
+        etag = response['ETag']
+        response = client.get('/about-author/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, 'Проверьте, что страница поддерживает условный GET по ETag'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_gzip(self, client, flatpage):
+        response = client.get('/about-author/', HTTP_ACCEPT_ENCODING='gzip')
+        assert response['Content-Encoding'] == 'gzip', 'Проверьте, что страница отдаётся сжатой'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_invalidated_on_save(self, client, flatpage):
+        client.get('/about-author/')
+        flatpage.content = 'Новый текст'
+        flatpage.save()
+        response = client.get('/about-author/')
+        assert 'Новый текст' in response.content.decode(), \
+            'Проверьте, что кэш страницы сбрасывается при сохранении'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_gzip_has_own_etag(self, client, flatpage):
+        plain = client.get('/about-author/')
+        compressed = client.get('/about-author/', HTTP_ACCEPT_ENCODING='gzip')
+        assert plain['ETag'] != compressed['ETag'], \
+            'Проверьте, что у сжатого и несжатого тела разные ETag'
+        response = client.get('/about-author/', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_respects_gzip_q_value(self, client, flatpage):
+        for header, expected in (('gzip;q=0', False), ('deflate, gzip; q=0.5', True),
+                                 ('*', True), ('*;q=0', False), ('br', False)):
+            response = client.get('/about-author/', HTTP_ACCEPT_ENCODING=header)
+            assert (response.get('Content-Encoding') == 'gzip') is expected, \
+                f'Проверьте разбор Accept-Encoding: {header}'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_changed_elsewhere_expires(self, client, flatpage, settings):
+        client.get('/about-author/')
+        # Правка в другом процессе: сигнал и версия кэша этого процесса
+        # её не видят, кэш Django истекает сам
+        FlatPage.objects.filter(pk=flatpage.pk).update(content='Новый текст')
+        cache.clear()
+        cache.set(flatpages.VERSION_KEY, 1, None)
+        later = time.monotonic() + settings.FLATPAGES_CACHE_TIME + 1
+        with mock.patch('yatube.flatpages.time.monotonic', return_value=later):
+            response = client.get('/about-author/')
+        assert 'Новый текст' in response.content.decode(), \
+            'Проверьте, что страница в памяти процесса истекает через FLATPAGES_CACHE_TIME'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_flatpage_user_sees_own_nav(self, user_client, user, flatpage):
+        user_client.get('/about-author/')
+        response = user_client.get('/about-author/')
+        assert user.username in response.content.decode(), \
+            'Проверьте, что вошедший пользователь не получает страницу, закэшированную для анонимов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_missing_flatpage(self, client):
+        response = client.get('/about/missing/')
+        assert response.status_code == 404
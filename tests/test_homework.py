@@ -101,8 +101,8 @@ class TestPost:
         assert 'text' in admin_model.search_fields, \
             'Добавьте `text` для поиска модели административного сайта'
 
-        assert 'pub_date' in admin_model.list_filter, \
-            'Добавьте `pub_date` для фильтрации модели административного сайта'
+        assert admin_model.date_hierarchy == 'pub_date', \
+            'Добавьте фильтрацию модели административного сайта по `pub_date` через `date_hierarchy`'
 
         assert hasattr(admin_model, 'empty_value_display'), \
             'Добавьте дефолтное значение `-пусто-` для пустого поля'
@@ -0,0 +1,99 @@
+import pstats
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.http import StreamingHttpResponse
+
+from yatube.profiling import ProfilingMiddleware, sampler
+
+
+@pytest.fixture
+def staff_client(client, django_user_model):
+    staff = django_user_model.objects.create_user(username='Staff', is_staff=True)
+    client.force_login(staff)
+    return client
+
+
+class TestProfiling:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_staff_gets_profile(self, staff_client):
+        response = staff_client.get('/?__profile=1')
+        assert response['Content-Type'].startswith('text/plain')
+        content = response.content.decode()
+        assert 'function calls' in content and 'views.py' in content, \
+            'Проверьте, что ?__profile=1 отдаёт отчёт cProfile'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_raw_profile_loads_into_pstats(self, staff_client, tmp_path):
+        response = staff_client.get('/?__profile=raw')
+        path = tmp_path / 'request.prof'
+        path.write_bytes(response.content)
+        stats = pstats.Stats(str(path))
+        assert any(name == 'index' for _, _, name in stats.stats), \
+            'Проверьте, что сырые данные читаются pstats'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_is_staff_only(self, user_client):
+        response = user_client.get('/?__profile=1')
+        assert response.status_code == 200
+        assert 'function calls' not in response.content.decode(), \
+            'Проверьте, что профиль доступен только сотрудникам'
+        assert user_client.get('/__profile__/samples/').status_code == 302
+
+    def test_sampler_collects_collapsed_stacks(self):
+        sampler.reset()
+        entered, release = threading.Event(), threading.Event()
+
+        def busy_view():
+            sampler.enter(SimpleNamespace(path='/busy/'))
+            entered.set()
+            release.wait()
+            sampler.leave()
+
+        thread = threading.Thread(target=busy_view)
+        thread.start()
+        entered.wait()
+        for _ in range(3):
+            sampler.sample()
+        release.set()
+        thread.join()
+        stacks = sampler.collapsed().splitlines()
+        assert stacks == [stacks[0]] and stacks[0].startswith('/busy/;'), \
+            'Проверьте, что стек записывается в формате collapsed stacks'
+        assert stacks[0].endswith(':busy_view;threading:wait;threading:wait 3')
+
+    def test_sampler_follows_streamed_content(self, rf, settings):
+        settings.PROFILER_SAMPLING = True
+        settings.PROFILER_INTERVAL = 60
+        active = []
+
+        def chunks():
+            for chunk in ('каркас', 'элемент'):
+                active.append(threading.get_ident() in sampler._active)
+                yield chunk
+
+        middleware = ProfilingMiddleware(lambda request: StreamingHttpResponse(chunks()))
+        response = middleware(rf.get('/'))
+        assert b''.join(response.streaming_content) == 'каркасэлемент'.encode()
+        settings.PROFILER_SAMPLING = False
+        assert active == [True, True], \
+            'Проверьте, что сэмплер видит рендеринг потокового ответа'
+        assert threading.get_ident() not in sampler._active
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sampler_follows_requests(self, staff_client, settings):
+        settings.PROFILER_SAMPLING = True
+        settings.PROFILER_INTERVAL = 0.001
+        sampler.reset()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and 'index;' not in sampler.collapsed():
+            staff_client.get('/')
+        settings.PROFILER_SAMPLING = False
+        response = staff_client.get('/__profile__/samples/?reset=1')
+        assert response.status_code == 200
+        assert any(line.startswith('index;') for line in response.content.decode().splitlines()), \
+            'Проверьте, что сэмплер собирает стеки по view'
+        assert not sampler.collapsed()
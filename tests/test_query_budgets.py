@@ -0,0 +1,233 @@
+"""Бюджеты производительности для каждого адреса posts/urls.py и
+users/urls.py.
+
+Число запросов к базе не должно зависеть от объёма данных (N постов,
+комментариев, подписок) и не должно превышать QUERY_BUDGETS. Время и
+пик памяти сравниваются с tests/baselines/views.json с допусками;
+UPDATE_PERF_BASELINES=1 перезаписывает файл текущими значениями (запускать
+без -n: процессы xdist пишут один и тот же файл).
+
+Время запроса сравнивается не в абсолютных миллисекундах: рядом с ним
+замеряется эталонная нагрузка (reference), и сохранённое время
+масштабируется на то, во сколько раз эталон стал медленнее: так тест
+не зависит от машины. Под xdist (run.sh запускает pytest -n auto)
+процессы делят ядра, и настенное время растёт от вытеснения, поэтому
+там замеряется процессорное время потока.
+"""
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+
+from posts.models import Comment, Follow, Group, Post
+from posts.urls import urlpatterns as posts_urls
+from users.urls import urlpatterns as users_urls
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines', 'views.json')
+UPDATE = os.environ.get('UPDATE_PERF_BASELINES') == '1'
+# Допуски к сохранённым значениям: время шумит сильнее, чем память
+TIME_TOLERANCE = 3.0
+TIME_SLACK_MS = 20
+MEMORY_TOLERANCE = 1.5
+MEMORY_SLACK_KIB = 64
+SIZES = (3, 9)
+REPEAT = 5
+
+# Эталонная нагрузка: чистый Python, около миллисекунды
+REFERENCE_LOOPS = 20000
+# Под xdist — процессорное время потока вместо настенного
+CLOCK = time.thread_time if os.environ.get('PYTEST_XDIST_WORKER') else time.perf_counter
+
+# Имя адреса -> (метод, адрес, данные формы); user — вошедший
+# пользователь, он же автор поста world.post
+CASES = {
+    'index': ('get', lambda world: '/', None),
+    'trending': ('get', lambda world: '/trending/', None),
+    'groups': ('get', lambda world: '/groups/', None),
+    'group': ('get', lambda world: f'/group/{world.group.slug}/', None),
+    'follow_index': ('get', lambda world: '/follow/', None),
+    'notifications': ('get', lambda world: '/notifications/', None),
+    'fragment': ('get', lambda world: '/fragments/nav/', None),
+    'new_post': ('get', lambda world: '/new/', None),
+    'profile': ('get', lambda world: f'/{world.user.username}/', None),
+    'post': ('get', lambda world: f'/{world.user.username}/{world.post.id}/', None),
+    'post_edit': ('get', lambda world: f'/{world.user.username}/{world.post.id}/edit/', None),
+    'followers': ('get', lambda world: f'/{world.user.username}/followers/', None),
+    'following': ('get', lambda world: f'/{world.user.username}/following/', None),
+    'add_comment': ('post', lambda world: f'/{world.user.username}/{world.post.id}/comment/',
+                    {'text': 'Комментарий'}),
+    'profile_follow': ('get', lambda world: f'/{world.stranger().username}/follow/', None),
+    'profile_unfollow': ('get', lambda world: f'/{world.authors[-1].username}/unfollow/', None),
+    'follow_batch': ('post', lambda world: '/follow/batch/', {'group': 'budget'}),
+    'signup': ('get', lambda world: '/auth/signup/', None),
+    'login': ('get', lambda world: '/auth/login/', None),
+}
+# Повторный запрос к этим адресам выполняет другую работу
+CHANGES_DATA = {'add_comment', 'profile_follow', 'profile_unfollow', 'follow_batch'}
+
+# Сколько запросов к базе может сделать адрес при холодном кэше (вместе
+# с BEGIN и SAVEPOINT транзакций)
+QUERY_BUDGETS = {
+    'index': 4,
+    'trending': 3,
+    'groups': 4,
+    'group': 5,
+    'follow_index': 5,
+    'notifications': 4,
+    'fragment': 2,
+    'new_post': 3,
+    'profile': 8,
+    'post': 11,
+    'post_edit': 5,
+    'followers': 5,
+    'following': 5,
+    'add_comment': 8,
+    'profile_follow': 8,
+    'profile_unfollow': 5,
+    'follow_batch': 14,
+    'signup': 2,
+    'login': 2,
+}
+
+
+class World:
+    """Пользователь с постом в группе и растущим окружением: авторы с
+    постами в той же группе, подписки в обе стороны, комментарии и
+    незнакомцы, которые тоже пишут в группу, но без подписок.
+    """
+
+    def __init__(self, user, django_user_model):
+        self.user = user
+        self.users = django_user_model
+        self.group = Group.objects.create(title='Бюджет', slug='budget', description='Бюджет')
+        self.post = Post.objects.create(text='Пост с комментариями', author=user, group=self.group)
+        self.authors = []
+        self.strangers = 0
+
+    def grow(self, size):
+        for i in range(len(self.authors), size):
+            author = self.users.objects.create_user(username=f'TestAuthor{i}')
+            self.authors.append(author)
+            Post.objects.create(text=f'Пост автора {i}', author=author, group=self.group)
+            Follow.objects.create(user=self.user, author=author)
+            Follow.objects.create(user=author, author=self.user)
+            Comment.objects.create(post=self.post, author=author, text=f'Комментарий {i}')
+            Post.objects.create(text=f'Пост незнакомца {i}', author=self.stranger(), group=self.group)
+
+    def stranger(self):
+        self.strangers += 1
+        return self.users.objects.create_user(username=f'TestStranger{self.strangers}')
+
+
+def url_names():
+    return {pattern.name for pattern in posts_urls + users_urls if isinstance(pattern, URLPattern)}
+
+
+def request(client, world, name):
+    method, url, data = CASES[name]
+    response = getattr(client, method)(url(world), data or {})
+    assert response.status_code in (200, 302), f'{name}: код ответа {response.status_code}'
+    return response.getvalue()
+
+
+def count_queries(client, world, name):
+    """Запросы при холодном кэше. Страница открывается заранее, чтобы в
+    счёт не попало то, что процесс делает один раз; адреса, меняющие
+    данные, второй раз сработали бы иначе, вместо них открывается главная.
+    """
+    if name in CHANGES_DATA:
+        client.get('/')
+    else:
+        request(client, world, name)
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        request(client, world, name)
+    return len(queries)
+
+
+@pytest.fixture
+def world(user, django_user_model):
+    cache.clear()
+    return World(user, django_user_model)
+
+
+def reference():
+    return sum(i * i for i in range(REFERENCE_LOOPS))
+
+
+def timed(function):
+    started = CLOCK()
+    function()
+    return (CLOCK() - started) * 1000
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+    with open(BASELINES, encoding='utf-8') as baselines:
+        return json.load(baselines)
+
+
+def test_every_url_has_a_budget():
+    assert url_names() == set(CASES) == set(QUERY_BUDGETS), \
+        'Проверьте, что для каждого адреса posts/urls.py и users/urls.py задан бюджет'
+
+
+class TestQueryBudgets:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('name', sorted(CASES))
+    def test_queries_do_not_grow_with_data(self, user_client, world, name):
+        counts = []
+        for size in SIZES:
+            world.grow(size)
+            counts.append(count_queries(user_client, world, name))
+        assert counts[0] == counts[-1], \
+            f'{name}: число запросов растёт с объёмом данных ({counts}), похоже на N+1'
+        assert counts[-1] <= QUERY_BUDGETS[name], \
+            f'{name}: {counts[-1]} запросов при бюджете {QUERY_BUDGETS[name]}'
+
+
+class TestTimeAndMemoryBudgets:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('name', sorted(set(CASES) - CHANGES_DATA))
+    def test_within_baseline(self, user_client, world, name):
+        world.grow(SIZES[-1])
+        request(user_client, world, name)
+        timings, references = [], []
+        for _ in range(REPEAT):
+            references.append(timed(reference))
+            timings.append(timed(lambda: request(user_client, world, name)))
+        tracemalloc.start()
+        try:
+            request(user_client, world, name)
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+        measured = {'ms': round(statistics.median(timings), 2), 'kib': round(peak, 1),
+                    'reference_ms': round(statistics.median(references), 3)}
+        baselines = load_baselines()
+        if UPDATE:
+            baselines[name] = measured
+            os.makedirs(os.path.dirname(BASELINES), exist_ok=True)
+            with open(BASELINES, 'w', encoding='utf-8') as output:
+                json.dump(baselines, output, indent=2, sort_keys=True)
+                output.write('\n')
+            return
+        assert name in baselines, \
+            f'{name}: нет сохранённых значений, запустите с UPDATE_PERF_BASELINES=1'
+        baseline = baselines[name]
+        slowdown = max(1.0, measured['reference_ms'] / baseline['reference_ms'])
+        assert measured['ms'] <= baseline['ms'] * slowdown * TIME_TOLERANCE + TIME_SLACK_MS, \
+            f'{name}: {measured["ms"]} мс при сохранённых {baseline["ms"]} мс ' \
+            f'(эталон медленнее в {slowdown:.1f} раза)'
+        assert measured['kib'] <= baseline['kib'] * MEMORY_TOLERANCE + MEMORY_SLACK_KIB, \
+            f'{name}: пик памяти {measured["kib"]} КиБ при сохранённых {baseline["kib"]} КиБ'
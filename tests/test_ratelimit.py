@@ -0,0 +1,102 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from yatube.ratelimit import check
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+class TestRateLimit:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_user_limit(self, user_client, client, django_user_model, settings):
+        settings.RATE_LIMITS = {'new_post': {'user': (3, 60)}}
+        for _ in range(3):
+            assert user_client.get('/new/').status_code == 200
+            response = user_client.post('/new/', {'text': 'Пост'})
+            assert response.status_code == 302
+        response = user_client.post('/new/', {'text': 'Лишний пост'})
+        assert response.status_code == 429, \
+            'Проверьте, что число постов от пользователя ограничено'
+        assert response['Retry-After'] == '60'
+        assert not django_user_model.objects.filter(author_posts__text='Лишний пост').exists()
+        other = django_user_model.objects.create_user(username='Other')
+        client.force_login(other)
+        assert client.post('/new/', {'text': 'Пост'}).status_code == 302, \
+            'Проверьте, что лимит считается для каждого пользователя отдельно'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_ip_limit_covers_anonymous(self, client, settings):
+        settings.RATE_LIMITS = {'signup': {'ip': (2, 60)}}
+        data = {'username': 'x', 'password1': '1', 'password2': '2'}
+        assert client.post('/auth/signup/', data).status_code == 200
+        assert client.post('/auth/signup/', data).status_code == 200
+        assert client.post('/auth/signup/', data).status_code == 429, \
+            'Проверьте, что регистрации с одного IP ограничены'
+        other = client.post('/auth/signup/', data, REMOTE_ADDR='10.0.0.2')
+        assert other.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rejected_request_is_not_counted(self, user, django_user_model, settings):
+        settings.RATE_LIMITS = {'follow': {'user': (2, 60), 'ip': (3, 60)}}
+        request = RequestFactory().post('/follow/batch/')
+        request.user = user
+        for _ in range(5):
+            check('follow', request)
+        request.user = django_user_model.objects.create_user(username='Other')
+        assert check('follow', request) is None, \
+            'Проверьте, что запрос, отклонённый лимитом пользователя, не расходует лимит IP'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_requests_do_not_exceed_limit(self, user, settings):
+        settings.RATE_LIMITS = {'follow': {'user': (5, 60)}}
+        request = RequestFactory().post('/follow/batch/')
+        request.user = user
+        barrier = threading.Barrier(20)
+        results = []
+
+        class SlowCache:
+            """Кэш, в котором чтение отдаёт управление другим потокам."""
+
+            def __getattr__(self, name):
+                method = getattr(cache, name)
+                if name.startswith('get'):
+                    def slow(*args, **kwargs):
+                        value = method(*args, **kwargs)
+                        time.sleep(0.01)
+                        return value
+                    return slow
+                return method
+
+        def worker():
+            barrier.wait()
+            results.append(check('follow', request))
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        with mock.patch('yatube.ratelimit.cache', SlowCache()):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert results.count(None) == 5, \
+            'Проверьте, что одновременные запросы не превышают лимит'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_check_does_not_query_db(self, user, settings):
+        settings.RATE_LIMITS = {'follow': {'user': (100, 60), 'ip': (100, 60)}}
+        request = RequestFactory().post('/follow/batch/')
+        request.user = user
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(10):
+                assert check('follow', request) is None
+        assert not queries, 'Проверьте, что лимиты не обращаются к базе'
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.fixture
+def slow_log(settings, tmp_path):
+    settings.SLOW_QUERY_THRESHOLD = 0
+    settings.SLOW_QUERY_LOG = str(tmp_path / 'slow.jsonl')
+    return tmp_path / 'slow.jsonl'
+
+
+def entries(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestSlowQueryLog:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_queries_are_logged_with_plan_and_view(self, user_client, user, slow_log):
+        response = user_client.get(f'/{user.username}/')
+        assert response.status_code == 200
+        logged = [entry for entry in entries(slow_log) if entry['view'] == 'profile']
+        assert logged, 'Проверьте, что запросы записываются в журнал вместе с view'
+        select = next(entry for entry in logged if 'posts_post' in entry['sql'])
+        assert select['plan'], 'Проверьте, что для SELECT записывается EXPLAIN'
+        assert any('posts/views.py' in frame for frame in select['stack']), \
+            'Проверьте, что в записи есть стек из кода проекта'
+        assert '%s' not in select['fingerprint']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_threshold_filters_fast_queries(self, client, settings, slow_log):
+        settings.SLOW_QUERY_THRESHOLD = 60 * 1000
+        client.get('/')
+        assert not slow_log.exists() or not slow_log.read_text(), \
+            'Проверьте, что быстрые запросы не попадают в журнал'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_log_size_is_bounded(self, client, settings, slow_log):
+        settings.SLOW_QUERY_LOG_MAX_BYTES = 4096
+        settings.SLOW_QUERY_LOG_BACKUPS = 2
+        for _ in range(20):
+            client.get('/')
+        files = list(slow_log.parent.iterdir())
+        assert len(files) <= 3, 'Проверьте, что журнал ротируется'
+        assert all(path.stat().st_size <= 2 * 4096 for path in files)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_report_lists_top_offenders(self, user_client, user, slow_log, capsys):
+        for _ in range(3):
+            user_client.get(f'/{user.username}/')
+        call_command('slowqueries', '--top', '3', '--plans')
+        output = capsys.readouterr().out
+        assert '1. SELECT' in output
+        assert 'запросов:' in output and 'profile' in output, \
+            'Проверьте, что отчёт группирует запросы и показывает view'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_streamed_queries_are_logged(self, client, post, slow_log):
+        from posts.models import Comment
+        Comment.objects.create(post=post, author=post.author, text='Комментарий')
+        response = client.get(f'/{post.author.username}/{post.id}/')
+        assert response.streaming
+        assert 'Комментарий' in b''.join(response.streaming_content).decode()
+        logged = [entry for entry in entries(slow_log)
+                  if entry['view'] == 'post' and 'FROM "posts_comment"' in entry['sql']
+                  and 'COUNT' not in entry['sql']]
+        assert logged, \
+            'Проверьте, что запросы, выполненные при потоковой отдаче, тоже попадают в журнал'
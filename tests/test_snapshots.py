@@ -0,0 +1,18 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+from django.test import TransactionTestCase
+
+
+class TestDatabaseSnapshots:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_teardown_restores_migrated_database(self, user):
+        TransactionTestCase._fixture_teardown(TransactionTestCase)
+        assert not get_user_model().objects.exists(), \
+            'Проверьте, что после теста база возвращается к снимку'
+        assert Site.objects.exists() and ContentType.objects.exists(), \
+            'Проверьте, что данные миграций остаются в базе'
+        assert get_user_model().objects.create(username='TestNext').pk > user.pk, \
+            'Проверьте, что id не начинаются заново, как и после flush'
@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+from yatube import startup
+
+
+def probe(*interpreter):
+    return subprocess.run(
+        [sys.executable, *interpreter, '-m', 'yatube.startup', '--path', '', '--warm'],
+        cwd=settings.BASE_DIR, env=dict(os.environ), check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+class TestStartup:
+
+    def test_heavy_modules_are_deferred(self):
+        result = json.loads(probe().stdout)
+        assert 'warm' in result['timings']
+        assert result['loaded'] == [], \
+            'Проверьте, что тяжёлые модули импортируются при первом использовании, а не при старте'
+
+    def test_project_imports_fit_budget(self):
+        costs = startup.import_costs(probe('-X', 'importtime').stderr)
+        assert costs.get('posts'), 'Проверьте разбор вывода -X importtime'
+        assert startup.project_cost(costs) < startup.IMPORT_BUDGET_MS, \
+            'Проверьте, что импорт модулей проекта укладывается в бюджет'
@@ -0,0 +1,38 @@
+import os
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from posts.models import Post
+from yatube.storage import MemoryStorage
+
+
+class TestMemoryStorage:
+
+    def test_files_are_shared_between_instances(self):
+        storage = MemoryStorage()
+        name = storage.save('posts/memory.png', ContentFile(b'first'))
+        other = MemoryStorage().save('posts/memory.png', ContentFile(b'second'))
+        assert name != other, 'Проверьте, что одинаковые имена не перезаписывают файл'
+        assert MemoryStorage().open(name).read() == b'first'
+        assert {os.path.basename(name), os.path.basename(other)} <= set(storage.listdir('posts')[1])
+        assert storage.url(name) == f'/media/{name}'
+        storage.delete(name)
+        assert not storage.exists(name)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_image_is_not_written_to_disk(self, user_client, user, settings):
+        assert isinstance(default_storage._wrapped, MemoryStorage), \
+            'Проверьте, что в тестах картинки постов хранятся в памяти'
+        post = Post.objects.create(text='Пост с картинкой', author=user)
+        buffer = BytesIO()
+        Image.new('RGB', (50, 50), 'white').save(buffer, 'PNG')
+        image = SimpleUploadedFile('memory.png', buffer.getvalue(), content_type='image/png')
+        user_client.post(f'/{user.username}/{post.id}/edit/', {'text': 'Пост с картинкой', 'image': image})
+        post.refresh_from_db()
+        assert post.image and default_storage.exists(post.image.name)
+        assert not os.path.exists(os.path.join(settings.MEDIA_ROOT, post.image.name))
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
 
 
 class UsersConfig(AppConfig):
     name = "users"
+
+    def ready(self):
+        from .backends import user_saved
+        post_save.connect(user_saved, sender=get_user_model())
+        post_delete.connect(user_saved, sender=get_user_model())
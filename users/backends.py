@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+VERSION_KEY = "users:version:{}"
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version(user_id):
+    return cache.get(VERSION_KEY.format(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который держит загруженных пользователей в памяти
+    процесса USER_CACHE_TIMEOUT секунд; хранится не больше
+    USER_CACHE_MAX_ENTRIES последних пользователей.
+
+    AuthenticationMiddleware вызывает get_user на каждый запрос; с кэшем
+    пользователь не читается из базы, а проверка хэша сессии (смена
+    пароля разлогинивает) по-прежнему выполняется django.contrib.auth.
+    При сохранении пользователя увеличивается его версия в кэше Django,
+    и запись с другой версией читается заново. С общим бэкендом кэша
+    это сразу видят все процессы (снятые is_active и is_staff действуют
+    немедленно), с LocMemCache — только этот, остальные через таймаут.
+    """
+
+    def get_user(self, user_id):
+        now = time.monotonic()
+        version = _version(user_id)
+        with _lock:
+            entry = _users.get(user_id)
+            if entry is not None:
+                _users.move_to_end(user_id)
+        if entry is None or entry[0] <= now or entry[1] != version:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            entry = (now + settings.USER_CACHE_TIMEOUT, version, type(user),
+                     user._state.db,
+                     [field.attname for field in user._meta.concrete_fields],
+                     [getattr(user, field.attname)
+                      for field in user._meta.concrete_fields])
+            with _lock:
+                _users[user_id] = entry
+                while len(_users) > settings.USER_CACHE_MAX_ENTRIES:
+                    _users.popitem(last=False)
+        # Каждому запросу — новый объект: у copy.copy общие с кэшем
+        # _state и кэш связанных объектов
+        _, _, model, db, field_names, values = entry
+        return model.from_db(db, field_names, values)
+
+
+def forget_user(user_id):
+    key = VERSION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def user_saved(sender, instance, **kwargs):
+    forget_user(instance.pk)
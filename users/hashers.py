@@ -0,0 +1,77 @@
+import base64
+
+from django.contrib.auth.hashers import (BasePasswordHasher,
+                                         PBKDF2PasswordHasher, mask_hash)
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+from . import hashing
+
+
+class ScryptPasswordHasher(BasePasswordHasher):
+    """Memory-hard хэшер на hashlib.scrypt из стандартной библиотеки.
+
+    Пароли в старом формате PBKDF2 перехэшируются этим хэшером при
+    следующем успешном входе (он стоит первым в PASSWORD_HASHERS).
+    """
+
+    algorithm = "scrypt"
+    work_factor = 2 ** 14
+    block_size = 8
+    parallelism = 1
+    dklen = 64
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and "$" not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        digest = hashing.run(hashing.scrypt, password.encode(),
+                             salt.encode(), n, r, p, self.dklen)
+        digest = base64.b64encode(digest).decode("ascii")
+        return f"{self.algorithm}${n}${r}${p}${salt}${digest}"
+
+    def decode(self, encoded):
+        algorithm, n, r, p, salt, digest = encoded.split("$", 5)
+        assert algorithm == self.algorithm
+        return {"algorithm": algorithm, "n": int(n), "r": int(r),
+                "p": int(p), "salt": salt, "hash": digest}
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(password, decoded["salt"], decoded["n"],
+                                decoded["r"], decoded["p"])
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _("algorithm"): decoded["algorithm"],
+            _("work factor"): decoded["n"],
+            _("block size"): decoded["r"],
+            _("parallelism"): decoded["p"],
+            _("salt"): mask_hash(decoded["salt"]),
+            _("hash"): mask_hash(decoded["hash"]),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (decoded["n"], decoded["r"], decoded["p"]) != (
+            self.work_factor, self.block_size, self.parallelism)
+
+    def harden_runtime(self, password, encoded):
+        pass
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 для проверки старых паролей, вычисляемый в пуле процессов."""
+
+    def encode(self, password, salt, iterations=None):
+        assert password is not None
+        assert salt and "$" not in salt
+        iterations = iterations or self.iterations
+        digest = hashing.run(hashing.pbkdf2, self.digest().name,
+                             password.encode(), salt.encode(), iterations, 0)
+        digest = base64.b64encode(digest).decode("ascii").strip()
+        return f"{self.algorithm}${iterations}${salt}${digest}"
@@ -0,0 +1,52 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+_pool = None
+_pool_key = None
+_slots = None
+_lock = threading.Lock()
+
+
+def scrypt(password, salt, n, r, p, dklen):
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=dklen)
+
+
+def pbkdf2(algorithm, password, salt, iterations, dklen):
+    return hashlib.pbkdf2_hmac(algorithm, password, salt, iterations,
+                               dklen or None)
+
+
+def _get_pool():
+    global _pool, _pool_key, _slots
+    workers = settings.PASSWORD_HASHING_WORKERS
+    with _lock:
+        if _pool_key != (os.getpid(), workers):
+            if _pool is not None and _pool_key[0] == os.getpid():
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_key = (os.getpid(), workers)
+            _slots = threading.BoundedSemaphore(
+                workers * settings.PASSWORD_HASHING_QUEUE)
+        return _pool, _slots
+
+
+def run(func, *args):
+    """Выполняет хэширование в пуле процессов.
+
+    Пул ограничен PASSWORD_HASHING_WORKERS процессами, а очередь к нему —
+    PASSWORD_HASHING_QUEUE заданиями на процесс: при всплеске входов
+    лишние запросы ждут свободного места, а не занимают все ядра.
+    При PASSWORD_HASHING_WORKERS = 0 хэш считается в текущем потоке.
+    """
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return func(*args)
+    pool, slots = _get_pool()
+    with slots:
+        return pool.submit(func, *args).result()
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from yatube import settings as project_settings
+
+from . import backends, views
+from .backends import CachedModelBackend
+
+User = get_user_model()
+
+
+class TestCachedAuth(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="TestUser", password="Qwerty")
+        self.client.force_login(self.user)
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("new_post"))
+        return [query["sql"] for query in queries
+                if "auth_user" in query["sql"]
+                or "django_session" in query["sql"]]
+
+    def test_warm_request_has_no_auth_queries(self):
+        self.auth_queries()
+        self.assertEqual(self.auth_queries(), [],
+                         msg="Сессия и пользователь читаются из базы!")
+
+    def test_cached_user_objects_are_not_shared(self):
+        backend = CachedModelBackend()
+        first = backend.get_user(self.user.pk)
+        second = backend.get_user(self.user.pk)
+        self.assertIsNot(first._state, second._state,
+                         msg="Запросы получают общее состояние пользователя!")
+        self.assertEqual(second.username, "TestUser")
+
+    @override_settings(USER_CACHE_MAX_ENTRIES=1)
+    def test_cache_is_bounded(self):
+        other = User.objects.create_user(username="TestOther")
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        backend.get_user(other.pk)
+        self.assertEqual(list(backends._users), [other.pk],
+                         msg="Кэш пользователей не ограничен по размеру!")
+
+    def test_change_in_other_process_invalidates_cache(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # Другой процесс сохранил пользователя: его сигнал увеличил
+        # версию в общем кэше, а запись этого процесса осталась
+        entry = backends._users[self.user.pk]
+        backends.forget_user(self.user.pk)
+        backends._users[self.user.pk] = entry
+        self.assertIsNone(backend.get_user(self.user.pk),
+                          msg="Отключённый в другом процессе пользователь "
+                              "остался в кэше!")
+
+    def test_profile_change_invalidates_cache(self):
+        self.auth_queries()
+        self.user.first_name = "Иван"
+        self.user.save()
+        response = self.client.get(reverse("new_post"))
+        self.assertEqual(response.context["user"].first_name, "Иван",
+                         msg="Кэш пользователя не сброшен после изменения!")
+
+    def test_password_change_logs_out(self):
+        self.auth_queries()
+        self.user.set_password("NewPassword")
+        self.user.save()
+        response = self.client.get(reverse("new_post"))
+        self.assertEqual(response.status_code, 302,
+                         msg="После смены пароля сессия осталась активной!")
+
+
+@override_settings(PASSWORD_HASHERS=project_settings.PASSWORD_HASHERS)
+class TestPasswordHashing(TestCase):
+    def setUp(self):
+        views.auth_bucket._buckets.clear()
+        self.client = Client()
+
+    def test_scrypt_is_default(self):
+        user = User.objects.create_user(username="TestUser",
+                                        password="Qwerty")
+        self.assertTrue(user.password.startswith("scrypt$"))
+        self.assertTrue(user.check_password("Qwerty"))
+        self.assertFalse(user.check_password("qwerty"))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_inline_hashing_matches_pool(self):
+        encoded = make_password("Qwerty", "saltsalt")
+        with override_settings(PASSWORD_HASHING_WORKERS=1):
+            self.assertEqual(make_password("Qwerty", "saltsalt"), encoded,
+                             msg="Хэш из пула отличается от хэша в потоке!")
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        user = User.objects.create(
+            username="TestUser",
+            password=make_password("Qwerty", hasher="pbkdf2_sha256"))
+        self.client.post(reverse("login"), {"username": "TestUser",
+                                            "password": "Qwerty"})
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$"),
+                        msg="Пароль не перехэширован при входе!")
+
+    def test_login_rate_limit(self):
+        capacity = views.auth_bucket.capacity
+        for _ in range(capacity):
+            response = self.client.post(reverse("login"), {
+                "username": "nobody", "password": "wrong"})
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse("login"), {
+            "username": "nobody", "password": "wrong"})
+        self.assertEqual(response.status_code, 429,
+                         msg="Перебор паролей не ограничен!")
+        response = self.client.get(reverse("login"))
+        self.assertEqual(response.status_code, 200)
@@ -1,10 +1,38 @@
+from django.conf import settings
+from django.contrib.auth import views as auth_views
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView
 
+from yatube.ratelimit import (TokenBucket, client_ip, ratelimit,
+                              too_many_requests)
+
 from .forms import CreationForm
 
+auth_bucket = TokenBucket(*settings.AUTH_RATE_LIMIT)
+
+
+class RateLimitMixin:
+    """Ограничивает число попыток входа с одного IP: каждая из них
+    считает дорогой хэш пароля. Регистрации ограничены
+    RATE_LIMITS["signup"].
+    """
+
+    bucket = auth_bucket
 
+    def dispatch(self, request, *args, **kwargs):
+        if request.method == "POST" and not self.bucket.allow(
+                client_ip(request)):
+            return too_many_requests(request)
+        return super().dispatch(request, *args, **kwargs)
+
+
+@method_decorator(ratelimit("signup"), name="dispatch")
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy("login")
     template_name = "signup.html"
+
+
+class LoginView(RateLimitMixin, auth_views.LoginView):
+    pass
@@ -0,0 +1,113 @@
+"""
+ASGI config for yatube project.
+
+Django 2.2 не умеет ASGI, поэтому приложение здесь собрано вручную:
+/events/ (Server-Sent Events) обслуживается асинхронно, а все остальные
+запросы передаются обычному WSGI-приложению в пуле потоков. Запуск:
+uvicorn yatube.asgi:application (или любой другой ASGI-сервер).
+"""
+
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+
+wsgi_application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from posts import events  # noqa: E402
+
+executor = ThreadPoolExecutor(settings.ASGI_THREADS)
+
+
+def environ_for(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = (f"{environ[key]},{value}" if key in environ
+                            else value)
+    return environ
+
+
+async def wsgi(scope, receive, send):
+    """Выполняет WSGI-приложение в пуле потоков; тело ответа
+    отправляется по частям, по мере того как WSGI-итератор их отдаёт.
+    """
+    loop = asyncio.get_event_loop()
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(name.lower().encode("latin-1"),
+                               value.encode("latin-1"))
+                              for name, value in headers]
+
+    result = await loop.run_in_executor(
+        executor, wsgi_application, environ_for(scope, body), start_response)
+    chunks = iter(result)
+    try:
+        await send({"type": "http.response.start", **started})
+        while True:
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+            if chunk is None:
+                break
+            await send({"type": "http.response.body", "body": chunk,
+                        "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        close = getattr(result, "close", None)
+        if close:
+            await loop.run_in_executor(executor, close)
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(scope, receive, send)
+    if scope["path"] == "/events/":
+        return await events.stream(scope, receive, send)
+    return await wsgi(scope, receive, send)
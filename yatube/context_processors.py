@@ -1,6 +1,20 @@
 import datetime as dt
+import time
+
+_year = {"value": None, "expires": 0}
+
+
+def _current_year():
+    """Год пересчитывается раз в сутки, а не на каждый рендер."""
+    now = time.time()
+    if now >= _year["expires"]:
+        today = dt.datetime.now()
+        tomorrow = dt.datetime.combine(today.date() + dt.timedelta(days=1),
+                                       dt.time())
+        _year["value"] = today.year
+        _year["expires"] = tomorrow.timestamp()
+    return _year["value"]
 
 
 def year(request):
-    year = dt.datetime.now().year
-    return {"year": year}
+    return {"year": _current_year()}
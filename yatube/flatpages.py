@@ -0,0 +1,147 @@
+import copy
+import gzip
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.flatpages.views import render_flatpage
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, HttpResponsePermanentRedirect
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+VERSION_KEY = "flatpages:version"
+PAGE_KEY = "flatpages:{version}:{site_id}:{url}"
+
+_pages = {}
+_lock = threading.Lock()
+MISSING = object()
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def _get_page(url, site_id, version):
+    """Страница и её отрендеренное для анонимов тело.
+
+    Сначала ищется в памяти процесса, затем в кэше Django, и только
+    потом в базе. При сохранении страницы увеличивается версия в кэше.
+    Сразу изменения видят только процессы с этим же кэшем: с
+    LocMemCache это один процесс, с общим бэкендом (memcached, Redis) —
+    все. Остальные получат новую страницу, когда истечёт
+    FLATPAGES_CACHE_TIME, и для LocMemCache он должен быть коротким.
+    """
+    key = PAGE_KEY.format(version=version, site_id=site_id, url=url)
+    expires, entry = _pages.get(key, (0, None))
+    if entry is None or expires < time.monotonic():
+        entry = cache.get(key)
+        if entry is None:
+            page = FlatPage.objects.filter(url=url, sites=site_id).first()
+            entry = {"page": page}
+            cache.set(key, entry, settings.FLATPAGES_CACHE_TIME)
+        _remember(key, entry)
+    return key, entry
+
+
+def _remember(key, entry):
+    with _lock:
+        if len(_pages) >= settings.FLATPAGES_MAX_ENTRIES:
+            _pages.clear()
+        _pages[key] = (time.monotonic() + settings.FLATPAGES_CACHE_TIME,
+                       entry)
+
+
+def _render_anonymous(request, key, entry):
+    if "body" not in entry:
+        response = render_flatpage(request, copy.copy(entry["page"]))
+        body = response.content
+        entry = dict(entry, body=body, gzip=gzip.compress(body),
+                     etag='"%s"' % hashlib.md5(body).hexdigest())
+        cache.set(key, entry, settings.FLATPAGES_CACHE_TIME)
+        _remember(key, entry)
+    return entry
+
+
+def accepts_gzip(header):
+    """Разрешает ли Accept-Encoding gzip: с учётом q-значений, так что
+    "gzip;q=0" — это отказ.
+    """
+    weights = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
+
+
+def flatpage(request, url):
+    """Замена django.contrib.flatpages.views.flatpage с кэшированием.
+
+    Анонимам отдаётся заранее отрендеренное и сжатое тело с ETag;
+    вошедшим пользователям страница рендерится заново (в шапке их имя),
+    но без запросов к базе за FlatPage.
+    """
+    if not url.startswith("/"):
+        url = "/" + url
+    site_id = get_current_site(request).id
+    version = _version()
+    key, entry = _get_page(url, site_id, version)
+    if entry["page"] is None:
+        if not url.endswith("/") and settings.APPEND_SLASH:
+            if _get_page(url + "/", site_id, version)[1]["page"]:
+                return HttpResponsePermanentRedirect(f"{request.path}/")
+        raise Http404
+    if request.user.is_authenticated or entry["page"].registration_required:
+        return render_flatpage(request, copy.copy(entry["page"]))
+    entry = _render_anonymous(request, key, entry)
+    # У сжатого тела свой ETag: это другое представление ресурса
+    compressed = accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    etag = (entry["etag"][:-1] + '-gzip"' if compressed
+            else entry["etag"])
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if compressed:
+            response = HttpResponse(entry["gzip"])
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(entry["body"])
+        response["Content-Length"] = len(response.content)
+    response["ETag"] = etag
+    patch_vary_headers(response, ("Accept-Encoding", "Cookie"))
+    return response
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+    with _lock:
+        _pages.clear()
+
+
+@receiver(post_save, sender=FlatPage)
+@receiver(post_delete, sender=FlatPage)
+def flatpage_changed(sender, **kwargs):
+    invalidate()
+
+
+@receiver(m2m_changed, sender=FlatPage.sites.through)
+def flatpage_sites_changed(sender, **kwargs):
+    invalidate()
@@ -0,0 +1,191 @@
+import io
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from django.template.base import Template
+
+PROFILE_PARAM = "__profile"
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+OTHER = "(other)"
+
+
+def profile_response(request, get_response):
+    """Выполняет запрос под cProfile и вместо страницы отдаёт отчёт
+    pstats (?__profile=1, =tottime, =ncalls) или сырые данные для
+    snakeviz и pstats.Stats (?__profile=raw).
+    """
+    import cProfile
+    import pstats
+
+    mode = request.GET[PROFILE_PARAM]
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = get_response(request)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+    finally:
+        profiler.disable()
+    if mode == "raw":
+        profiler.create_stats()
+        response = HttpResponse(marshal.dumps(profiler.stats),
+                                content_type="application/octet-stream")
+        response["Content-Disposition"] = (
+            'attachment; filename="request.prof"')
+        return response
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(mode if mode in SORT_KEYS
+                                  else "cumulative")
+    stats.print_stats(settings.PROFILER_TOP_FUNCTIONS)
+    return HttpResponse(output.getvalue(), content_type="text/plain")
+
+
+def _frame_name(frame):
+    if frame.f_code is Template.render.__code__:
+        origin = getattr(frame.f_locals.get("self"), "origin", None)
+        if origin is not None and origin.template_name:
+            return f"template:{origin.template_name}"
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+class Sampler:
+    """Фоновый сэмплер стеков: раз в PROFILER_INTERVAL секунд снимает
+    стеки потоков, которые сейчас обрабатывают запрос, и считает их в
+    формате collapsed stacks («view;модуль:функция;... число»), который
+    понимают flamegraph.pl и speedscope.
+
+    Поток сэмплера не трогает обработку запросов, кроме записи в
+    словарь активных потоков в начале и конце запроса; стоимость —
+    время, пока сэмплер держит GIL, разбирая стеки.
+    """
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="profiling-sampler", daemon=True)
+                self._thread.start()
+
+    def enter(self, request):
+        self._active[threading.get_ident()] = request
+
+    def leave(self):
+        self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while settings.PROFILER_SAMPLING:
+            time.sleep(settings.PROFILER_INTERVAL)
+            self.sample()
+
+    def sample(self):
+        frames = sys._current_frames()
+        collected = []
+        for ident, request in list(self._active.items()):
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            match = getattr(request, "resolver_match", None)
+            names.append(match.view_name if match else request.path)
+            collected.append(";".join(reversed(names)))
+        with self._lock:
+            self.samples += 1
+            for stack in collected:
+                if (stack not in self.stacks and len(self.stacks)
+                        >= settings.PROFILER_MAX_STACKS):
+                    stack = OTHER
+                self.stacks[stack] += 1
+
+    def collapsed(self):
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count
+                           in self.stacks.most_common())
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+
+sampler = Sampler()
+
+
+class ProfilingMiddleware:
+    """Профилирование для сотрудников: ?__profile=1 в адресе отдаёт
+    отчёт cProfile вместо страницы, а при PROFILER_SAMPLING запросы
+    попадают в фоновый сэмплер (см. Sampler и view samples).
+
+    Ставится после AuthenticationMiddleware. Пока параметра нет,
+    сессия не читается, так что общие страницы остаются общими.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROFILE_PARAM in request.GET and request.user.is_staff:
+            return profile_response(request, self.get_response)
+        if not settings.PROFILER_SAMPLING:
+            return self.get_response(request)
+        sampler.start()
+        sampler.enter(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.leave()
+        if response.streaming:
+            response.streaming_content = self.streamed(
+                response.streaming_content, request)
+        return response
+
+    @staticmethod
+    def streamed(content, request):
+        """Потоковый ответ (posts.streaming) рендерит списки и читает
+        их из базы уже при отправке: сэмплер следит за потоком, пока
+        готовится каждый кусок, но не пока сервер его отправляет.
+        """
+        content = iter(content)
+        try:
+            while True:
+                sampler.enter(request)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    sampler.leave()
+                yield chunk
+        finally:
+            if hasattr(content, "close"):
+                content.close()
+
+
+@staff_member_required
+def samples(request):
+    """Накопленные сэмплером стеки в формате collapsed stacks;
+    ?reset=1 обнуляет их после выдачи.
+    """
+    response = HttpResponse(sampler.collapsed(), content_type="text/plain")
+    response["X-Samples"] = sampler.samples
+    if request.GET.get("reset"):
+        sampler.reset()
+    return response
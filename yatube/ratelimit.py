@@ -0,0 +1,134 @@
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+
+class TokenBucket:
+    """Корзина токенов в памяти процесса: rate токенов в секунду,
+    не больше capacity подряд. Проверка стоит O(1) и не ходит в базу.
+    """
+
+    def __init__(self, rate, capacity, max_keys=100000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.clear()
+            self._buckets[key] = (tokens, now)
+            return allowed
+
+
+class SlidingWindow:
+    """Скользящее окно в кэше Django: не больше limit событий за period
+    секунд на ключ. Общим для всех процессов окно становится только с
+    общим бэкендом кэша; с LocMemCache у каждого процесса свои счётчики.
+
+    Хранятся только счётчики текущего и предыдущего окна; число событий
+    за последние period секунд оценивается как счётчик текущего окна
+    плюс доля предыдущего. Проверка — два-три обращения к кэшу, без
+    запросов к базе.
+
+    Событие сначала атомарно учитывается (cache.add или cache.incr), и
+    с лимитом сравнивается уже полученный счётчик: одновременные
+    запросы не проскочат все вместе. Отклонённое событие вычитается
+    обратно через release().
+    """
+
+    def __init__(self, name, limit, period):
+        self.name = name
+        self.limit = limit
+        self.period = period
+
+    def _key(self, key, window):
+        return f"ratelimit:{self.name}:{key}:{int(window)}"
+
+    def acquire(self, key, cost=1):
+        """Учитывает событие; возвращает ключ счётчика, если лимит не
+        превышен, иначе отменяет учёт и возвращает None.
+        """
+        window, elapsed = divmod(time.time(), self.period)
+        current = self._key(key, window)
+        if cache.add(current, cost, self.period * 2):
+            count = cost
+        else:
+            try:
+                count = cache.incr(current, cost)
+            except ValueError:
+                cache.add(current, cost, self.period * 2)
+                count = cost
+        previous = cache.get(self._key(key, window - 1), 0)
+        if count + previous * (1 - elapsed / self.period) > self.limit:
+            self.release(current, cost)
+            return None
+        return current
+
+    def release(self, counter, cost=1):
+        try:
+            cache.decr(counter, cost)
+        except ValueError:
+            pass
+
+
+def client_ip(request):
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def too_many_requests(request, retry_after=None):
+    response = render(request, "misc/429.html", status=429)
+    if retry_after:
+        response["Retry-After"] = retry_after
+    return response
+
+
+def check(name, request):
+    """Проверяет лимиты RATE_LIMITS[name] для пользователя и для IP.
+
+    Если запрос отклоняет одно из окон, его учёт в остальных окнах
+    отменяется.
+    Возвращает None, если запрос разрешён, иначе число секунд, через
+    которое стоит повторить запрос.
+    """
+    limits = settings.RATE_LIMITS.get(name, {})
+    keys = {"ip": client_ip(request)}
+    if request.user.is_authenticated:
+        keys["user"] = request.user.pk
+    acquired = []
+    for scope, key in keys.items():
+        if scope in limits:
+            window = SlidingWindow(f"{name}:{scope}", *limits[scope])
+            counter = window.acquire(key)
+            if counter is None:
+                for other, other_counter in acquired:
+                    other.release(other_counter)
+                return window.period
+            acquired.append((window, counter))
+    return None
+
+
+def ratelimit(name, methods=("POST",)):
+    """Ограничивает запросы methods к view по RATE_LIMITS[name]."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = check(name, request)
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
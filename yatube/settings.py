@@ -29,14 +29,17 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "sorl.thumbnail",
+    "tasks",
 ]
 
 MIDDLEWARE = [
+    "yatube.slowqueries.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "yatube.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -117,10 +120,44 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+PASSWORD_HASHERS = [
+    "users.hashers.ScryptPasswordHasher",
+    "users.hashers.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+# Хэширование паролей в отдельных процессах (0 — в потоке запроса)
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_QUEUE = 4
+# Входов с одного IP: токенов в секунду, максимум подряд (регистрации
+# ограничены RATE_LIMITS["signup"])
+AUTH_RATE_LIMIT = (0.2, 10)
+# Лимиты запросов на запись (yatube.ratelimit): для каждого вида —
+# (событий, за секунд) на пользователя и на IP. Счётчики хранятся в
+# CACHES; с LocMemCache они свои у каждого процесса, и общими для всех
+# процессов лимиты становятся только с общим бэкендом кэша
+RATE_LIMITS = {
+    "new_post": {"user": (10, 60), "ip": (30, 60)},
+    "add_comment": {"user": (30, 60), "ip": (90, 60)},
+    "follow": {"user": (60, 60), "ip": (180, 60)},
+    "signup": {"ip": (5, 60 * 60)},
+}
+
+AUTHENTICATION_BACKENDS = [
+    "users.backends.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+USER_CACHE_TIMEOUT = 30
+USER_CACHE_MAX_ENTRIES = 10000
+
+# Сессии читаются из кэша и только при промахе из базы. Без обращений
+# к хранилищу вовсе: "django.contrib.sessions.backends.signed_cookies"
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_BACKEND = "tasks.mail.QueuedEmailBackend"
+TASKS_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 SITE_ID = 1
@@ -131,3 +168,83 @@ CACHES = {
     }
 }
 CACHE_TIME = 20
+# Сколько процесс отдаёт старую версию flatpage после правки в другом
+# процессе: с LocMemCache версия в кэше у каждого процесса своя
+FLATPAGES_CACHE_TIME = 60
+FLATPAGES_MAX_ENTRIES = 1000
+GRAPH_CACHE_TIME = 60 * 60
+
+# Популярные посты: вес событий и время затухания счёта в e раз
+TRENDING_WEIGHTS = {"post": 1.0, "comment": 1.0, "follow": 0.5}
+TRENDING_DECAY = 12 * 60 * 60
+TRENDING_FOLLOW_POSTS = 3
+TRENDING_SIZE = 100
+
+# Отложенная запись постов и комментариев через локальную очередь
+WRITE_BEHIND = False
+WRITE_BEHIND_QUEUE = os.path.join(BASE_DIR, "write_behind.sqlite3")
+WRITE_BEHIND_WORKER = True
+WRITE_BEHIND_BATCH = 200
+WRITE_BEHIND_INTERVAL = 1.0
+WRITE_BEHIND_LEASE = 60
+# После стольких неудачных попыток запись уходит в таблицу dead очереди
+WRITE_BEHIND_MAX_ATTEMPTS = 5
+
+# Персональные части страниц отдаются как <esi:include> фрагменты,
+# а сами страницы кэшируются прокси (posts.fragments)
+EDGE_FRAGMENTS = False
+
+# Обновления лент через Server-Sent Events (/events/, yatube.asgi)
+ASGI_THREADS = 16
+SSE_HEARTBEAT = 15
+SSE_RETRY = 5000
+SSE_QUEUE_SIZE = 100
+
+# Журнал медленных запросов (yatube.slowqueries, manage.py slowqueries):
+# порог в миллисекундах (None — выключено), файл JSON-строк и его ротация
+SLOW_QUERY_THRESHOLD = 100
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, "logs", "slow_queries.jsonl")
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Профилирование для сотрудников (yatube.profiling): ?__profile=1 и
+# фоновый сэмплер стеков с отчётом в /__profile__/samples/
+PROFILER_TOP_FUNCTIONS = 60
+PROFILER_SAMPLING = False
+PROFILER_INTERVAL = 0.01
+PROFILER_MAX_STACKS = 10000
+
+# Счётчик непрочитанных уведомлений в шапке кэшируется (posts.notifications)
+NOTIFICATIONS_CACHE_TIME = 24 * 60 * 60
+
+# Группы по slug кэшируются в памяти процесса (posts.groups)
+GROUP_CACHE_TIME = 60
+GROUP_CACHE_MAX_ENTRIES = 1000
+
+# Посты старше этого числа дней переносятся в архивные таблицы
+# (manage.py archive_posts или задача posts.archive_posts)
+ARCHIVE_AFTER_DAYS = 365
+
+# Лента / читается по месячным партициям постов (posts.partitions);
+# каталог закрытых месяцев пересчитывает задача posts.refresh_partitions
+POST_PARTITIONS = False
+PARTITIONS_CACHE_TIME = 60 * 60
+
+# В лентах текст поста обрезается в базе до этой длины (QuerySet.cards),
+# а комментарии под постом читаются из базы пачками по столько строк
+POST_PREVIEW_LENGTH = 500
+COMMENTS_CHUNK_SIZE = 500
+
+# Страницы поста и лент отдаются потоком (posts.streaming): каркас
+# страницы уходит сразу, а списки рендерятся во время отправки
+STREAMING_PAGES = True
+
+# Фоновые задачи (приложение tasks, воркер: manage.py runtasks)
+TASKS_ALWAYS_EAGER = False
+TASKS_WORKERS = 4
+TASKS_BATCH = 50
+# Сколько объектов обрабатывает одна пачка пакетной задачи
+TASKS_CHUNK_SIZE = 500
+TASKS_POLL_INTERVAL = 1.0
+TASKS_RETRY_BACKOFF = 5
+TASKS_TIMEOUT = 15 * 60
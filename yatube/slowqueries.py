@@ -0,0 +1,164 @@
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from logging import Formatter, LogRecord
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+MAX_SQL_LENGTH = 4000
+MAX_PARAMS_LENGTH = 500
+STACK_DEPTH = 5
+
+_handlers = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """SQL без значений: запросы, отличающиеся только параметрами и
+    длиной списков IN (...), попадают в одну строку отчёта.
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"%s", "?", sql)
+    sql = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(...)", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def _stack():
+    """Последние кадры стека из кода проекта (без Django и библиотек)."""
+    frames = [frame for frame in traceback.extract_stack()
+              if frame.filename.startswith(settings.BASE_DIR)
+              and frame.filename != __file__
+              and "site-packages" not in frame.filename]
+    return [f"{os.path.relpath(frame.filename, settings.BASE_DIR)}:"
+            f"{frame.lineno} in {frame.name}"
+            for frame in frames[-STACK_DEPTH:]]
+
+
+def _explain(db, sql, params):
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    _local.explaining = True
+    try:
+        with db.cursor() as cursor:
+            cursor.execute(f"{db.ops.explain_query_prefix()} {sql}", params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except (DatabaseError, NotImplementedError):
+        return None
+    finally:
+        _local.explaining = False
+
+
+def _handler(path):
+    handler = _handlers.get(path)
+    if handler is None:
+        with _lock:
+            handler = _handlers.get(path)
+            if handler is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = RotatingFileHandler(
+                    path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+                    encoding="utf-8")
+                handler.setFormatter(Formatter("%(message)s"))
+                _handlers[path] = handler
+    return handler
+
+
+def write(entry):
+    """Дописывает запись строкой JSON; файл ротируется по размеру, так
+    что на диске не больше (SLOW_QUERY_LOG_BACKUPS + 1) файлов.
+    """
+    message = json.dumps(entry, ensure_ascii=False, default=str)
+    _handler(settings.SLOW_QUERY_LOG).handle(LogRecord(
+        __name__, 0, "", 0, message, None, None))
+
+
+class QueryLogger:
+    """Обёртка execute_wrapper: запросы дольше SLOW_QUERY_THRESHOLD
+    миллисекунд пишутся в журнал вместе с планом (EXPLAIN), view,
+    из которого они выполнены, и кратким стеком.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+
+    def view(self):
+        match = getattr(self.request, "resolver_match", None)
+        return match.view_name if match else None
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "explaining", False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= settings.SLOW_QUERY_THRESHOLD:
+                db = context["connection"]
+                write({
+                    "time": timezone.now().isoformat(),
+                    "ms": round(elapsed, 3),
+                    "db": db.alias,
+                    "view": self.view(),
+                    "path": getattr(self.request, "path", None),
+                    "fingerprint": fingerprint(sql)[:MAX_SQL_LENGTH],
+                    "sql": sql[:MAX_SQL_LENGTH],
+                    "params": repr(params)[:MAX_PARAMS_LENGTH],
+                    "many": many,
+                    "plan": None if many else _explain(db, sql, params),
+                    "stack": _stack(),
+                })
+
+
+class SlowQueryMiddleware:
+    """Включает QueryLogger на время обработки запроса; при
+    SLOW_QUERY_THRESHOLD = None ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            return self.get_response(request)
+        logger = QueryLogger(request)
+        with connection.execute_wrapper(logger):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.streamed(
+                response.streaming_content, logger)
+        return response
+
+    @staticmethod
+    def streamed(content, logger):
+        """Запросы потокового ответа (posts.streaming) выполняются уже
+        при отправке, после возврата из view.
+        """
+        with connection.execute_wrapper(logger):
+            yield from content
+
+
+def read(path):
+    """Записи журнала со всеми ротированными файлами, от старых к новым;
+    обрезанные и повреждённые строки пропускаются.
+    """
+    paths = [f"{path}.{number}" for number
+             in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)] + [path]
+    for name in paths:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,113 @@
+"""
+Замер холодного старта процесса: python -m yatube.startup
+
+Печатает JSON со временем этапов (настройки, django.setup(), создание
+WSGI-обработчика, прогрев, первый и второй запрос) и списком тяжёлых
+модулей из DEFERRED, которые оказались загружены. До начала замера
+импортируется только стандартная библиотека.
+"""
+
+import time
+
+STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+from io import BytesIO  # noqa: E402
+
+# Модули, которые не должны загружаться при старте: они импортируются
+# при первом использовании (SSE, профилирование, обработка картинок).
+DEFERRED = ("asyncio", "cProfile", "pstats", "PIL",
+            "sorl.thumbnail.engines")
+# Бюджет на собственное время импорта модулей проекта при старте.
+PROJECT_PACKAGES = ("posts", "users", "tasks", "yatube")
+IMPORT_BUDGET_MS = 30
+
+
+def import_costs(stderr):
+    """Собственное время импорта по пакетам верхнего уровня (мс) из
+    вывода python -X importtime.
+    """
+    costs = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            package = name.strip().split(".")[0]
+            costs[package] = costs.get(package, 0) + int(own) / 1000
+    return costs
+
+
+def project_cost(costs):
+    return sum(costs.get(package, 0) for package in PROJECT_PACKAGES)
+
+
+def request(application, path):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.input": BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+    }
+    status = []
+    b"".join(application(environ, lambda value, headers, exc_info=None:
+                         status.append(value)))
+    return status[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="файл базы SQLite вместо "
+                                           "настроенной")
+    parser.add_argument("--path", default="/",
+                        help="адрес первого запроса; пустой — без запроса")
+    parser.add_argument("--warm", action="store_true",
+                        help="прогреть процесс, как это делает "
+                             "gunicorn.conf.py до fork")
+    options = parser.parse_args()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+    timings = {}
+    mark = STARTED
+
+    def step(name):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = round((now - mark) * 1000, 3)
+        mark = now
+
+    import django
+    from django.conf import settings
+    if options.database:
+        settings.DATABASES["default"]["NAME"] = options.database
+    step("settings")
+    django.setup(set_prefix=False)
+    step("setup")
+    from django.core.handlers.wsgi import WSGIHandler
+    application = WSGIHandler()
+    step("handler")
+    if options.warm:
+        from yatube.warmup import warm
+        warm()
+        step("warm")
+    statuses = []
+    if options.path:
+        statuses.append(request(application, options.path))
+        step("first request")
+        statuses.append(request(application, options.path))
+        step("second request")
+    print(json.dumps({
+        "timings": timings,
+        "statuses": statuses,
+        "loaded": [name for name in DEFERRED if name in sys.modules],
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import threading
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+
+
+@deconstructible
+class MemoryStorage(Storage):
+    """Файлы в памяти процесса вместо MEDIA_ROOT, для тестов (см.
+    yatube.test_settings): картинки постов и миниатюры sorl.thumbnail
+    не пишутся на диск и не остаются после прогона.
+
+    Содержимое общее для всех экземпляров: sorl.thumbnail создаёт своё
+    хранилище, а читать ему нужно то, что сохранила модель.
+    """
+
+    _files = {}
+    _lock = threading.Lock()
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url
+
+    def _open(self, name, mode="rb"):
+        try:
+            content, _ = self._files[name]
+        except KeyError:
+            raise FileNotFoundError(name) from None
+        return ContentFile(content, name=name)
+
+    def _save(self, name, content):
+        if hasattr(content, "seek"):
+            content.seek(0)
+        data = b"".join(content.chunks())
+        with self._lock:
+            self._files[name] = (data, timezone.now())
+        return name
+
+    def delete(self, name):
+        self._files.pop(name, None)
+
+    def exists(self, name):
+        return name in self._files
+
+    def size(self, name):
+        return len(self._files[name][0])
+
+    def listdir(self, path):
+        prefix = path.rstrip("/") + "/" if path else ""
+        directories, files = set(), []
+        for name in list(self._files):
+            if name.startswith(prefix):
+                head, _, tail = name[len(prefix):].partition("/")
+                if tail:
+                    directories.add(head)
+                else:
+                    files.append(head)
+        return sorted(directories), sorted(files)
+
+    def url(self, name):
+        return urljoin(self.base_url or settings.MEDIA_URL,
+                       filepath_to_uri(name))
+
+    def get_modified_time(self, name):
+        return self._files[name][1]
+
+    get_created_time = get_accessed_time = get_modified_time
@@ -0,0 +1,16 @@
+"""Настройки для тестов: pytest.ini и
+python manage.py test --settings=yatube.test_settings.
+
+Тестовая база SQLite — в памяти, у каждого воркера pytest-xdist своя
+(см. tests/conftest.py).
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# Быстрый хэшер вместо scrypt и хэширование без пула процессов
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+PASSWORD_HASHING_WORKERS = 0
+
+# Картинки постов и миниатюры — в памяти процесса, а не в MEDIA_ROOT
+DEFAULT_FILE_STORAGE = "yatube.storage.MemoryStorage"
+THUMBNAIL_STORAGE = DEFAULT_FILE_STORAGE
@@ -2,9 +2,11 @@ from django.conf import settings
 from django.conf.urls import handler404, handler500
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.contrib.flatpages import views
 from django.urls import include, path
 
+from . import profiling
+from .flatpages import flatpage
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
@@ -12,17 +14,16 @@ urlpatterns = [
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
     path("admin/", admin.site.urls),
-    path("", include("posts.urls")),
-]
-
-urlpatterns += [
-    path("about-us/", views.flatpage, {"url": "/about-us/"}, name="about"),
-    path("terms/", views.flatpage, {"url": "/terms/"}, name="terms"),
-    path("about-author/", views.flatpage, {"url": "/about-author/"},
+    path("__profile__/samples/", profiling.samples, name="profile_samples"),
+    path("about-us/", flatpage, {"url": "/about-us/"}, name="about"),
+    path("terms/", flatpage, {"url": "/terms/"}, name="terms"),
+    path("about-author/", flatpage, {"url": "/about-author/"},
          name="about-author"),
-    path("about-spec/", views.flatpage,
+    path("about-spec/", flatpage,
          {"url": "/about-spec/"}, name="about-spec"),
-    path("about/", include("django.contrib.flatpages.urls")),
+    path("about/<path:url>", flatpage,
+         name="django.contrib.flatpages.views.flatpage"),
+    path("", include("posts.urls")),
 ]
 
 if settings.DEBUG:
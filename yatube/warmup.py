@@ -0,0 +1,45 @@
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.urls import resolve, reverse
+from django.utils import translation
+
+
+def template_names():
+    """Имена шаблонов проекта (TEMPLATES DIRS), без шаблонов приложений:
+    шаблоны админки нужны немногим воркерам и не стоят памяти мастера.
+    """
+    for directory in engines["django"].engine.dirs:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(".html"):
+                    yield os.path.relpath(os.path.join(root, name),
+                                          directory)
+
+
+def warm():
+    """Делает заранее то, что иначе делал бы первый запрос каждого
+    воркера: импорт URLconf со всеми view и контекстных процессоров,
+    загрузку переводов и компиляцию шаблонов (их хранит cached.Loader).
+
+    Вызывается в мастер-процессе gunicorn при preload_app (см.
+    gunicorn.conf.py) до fork, так что воркеры получают всё это готовым
+    и общим в памяти (copy-on-write). Соединения с базой не остаются
+    открытыми: их нельзя делить между процессами.
+    """
+    # Запросы идут через get_resolver(ROOT_URLCONF), а в Django 2.2 он
+    # кэшируется отдельно от get_resolver(None), поэтому urlconf явный.
+    reverse("index", urlconf=settings.ROOT_URLCONF)
+    resolve("/", urlconf=settings.ROOT_URLCONF)
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext("Error")
+    translation.deactivate()
+    engine = engines["django"]
+    engine.engine.template_context_processors
+    names = sorted(template_names())
+    for name in names:
+        engine.get_template(name)
+    connections.close_all()
+    return names